@@ -1,15 +1,16 @@
 # Standard libraries
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 
 # FastAPI libraries
 from fastapi import Request, Response, status, APIRouter, Depends, HTTPException
 from fastapi import Form
 
 # MongoDB
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 
-from crud.user import get_user_by_username
 from db.mongodb import get_mongo_db, set_namespace
+from db.indexes import USERNAME_INDEX, wait_for_namespace_indexes
 from schemas.auth import User, LoginRequest, TokenResponse, RegisterRequest, SetRoleRequest
 from crud import user as crud_user
 
@@ -20,7 +21,8 @@ from services.auth_service import (check_login, handle_logout,
                                    )
 
 # Utils
-from utils import func
+from utils import func, pagination
+from utils.pagination import NEXT_CURSOR_HEADER
 
 # Core
 from core.config import KEY_TOKEN_TYPE, KEY_ACCESS_TOKEN, KEY_REFRESH_TOKEN, ROLE_ADMIN
@@ -33,26 +35,29 @@ router = APIRouter()
 
 
 @router.post("/{namespace}/register", response_model=User, status_code=status.HTTP_201_CREATED)
-def user_register(
+async def user_register(
     namespace: str,
     form_data: Annotated[RegisterRequest, Form()],
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> User:
   db = set_namespace(db, namespace)
 
   username = form_data.username
   password = form_data.password
 
-  user_exists = get_user_by_username(db, username)
-  if user_exists:
-    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
+  # The unique username index rejects duplicates, registering without it would let them in
+  if not await wait_for_namespace_indexes(db, [USERNAME_INDEX]):
+    raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Registration is temporarily unavailable")
 
-  new_item = crud_user.create_user(db=db, username=username, password=password)
+  try:
+    new_item = await crud_user.create_user(db=db, username=username, password=password)
+  except DuplicateKeyError:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
   return new_item
 
 
 @router.post("/{namespace}/login", response_model=TokenResponse)
-def user_login(
+async def user_login(
     namespace: str,
     form_data: Annotated[LoginRequest, Form()],
     request: Request,
@@ -71,7 +76,7 @@ def user_login(
     **device
   }
 
-  access_token, refresh_access_token = create_access_token_by_username_password(db, username, password,
+  access_token, refresh_access_token = await create_access_token_by_username_password(db, username, password,
                                                                                 info_login=info_login)
 
   response.set_cookie(
@@ -95,13 +100,13 @@ async def user_logout(
     request: Request,
     response: Response,
     namespace: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ):
-  set_namespace(db, namespace)
+  db = set_namespace(db, namespace)
 
-  check_login(request, db, namespace)
+  await check_login(request, db, namespace)
 
-  handle_logout(request, db)
+  await handle_logout(request, db)
 
   response.delete_cookie(KEY_REFRESH_TOKEN)
 
@@ -116,7 +121,7 @@ async def user_refresh_token(
     request: Request,
     response: Response,
     namespace: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ):
   db = set_namespace(db, namespace)
 
@@ -132,7 +137,7 @@ async def user_refresh_token(
   }
 
   refresh_access_token = decrypt_access_token(refresh_access_token_raw)
-  access_token, refresh_access_token = create_access_token_by_refresh_access_token(db, refresh_access_token, info_login)
+  access_token, refresh_access_token = await create_access_token_by_refresh_access_token(db, refresh_access_token, info_login)
 
   response.set_cookie(
     key=KEY_REFRESH_TOKEN,
@@ -151,64 +156,67 @@ async def user_refresh_token(
 
 
 @router.put("/{namespace}/set-role", response_model=User, status_code=status.HTTP_200_OK)
-def user_set_role(
+async def user_set_role(
     namespace: str,
     request: Request,
     response: Response,
     form_data: Annotated[SetRoleRequest, Form()],
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> User:
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
   role = form_data.target_role
   user_id = form_data.user_id
 
-  # Check user exists
-  user_item = crud_user.get_user(db, user_id)
-  if not user_item:
+  user = await crud_user.set_role_for_user(db, user_id, role)
+  if not user:
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-  crud_user.set_role_for_user(db, user_id, role)
-
-  user = crud_user.get_user(db, user_id)
   return user
 
 
 @router.get("/{namespace}/me", response_model=User, status_code=status.HTTP_200_OK)
-def user_get_me(
+async def user_get_me(
     request: Request,
     namespace: str,
-    db: Database = Depends(get_mongo_db),
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db),
 ) -> User:
   # Check if the user is logged in
-  check_login(request, db, namespace)
+  await check_login(request, db, namespace)
 
   auth = request.state.auth
   return auth
 
 
 @router.get("/{namespace}/users", response_model=List[User], status_code=status.HTTP_200_OK)
-def get_users(
+async def get_users(
     namespace: str,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Database = Depends(get_mongo_db)
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> List[User]:
   """
   Retrieve a list of users from the specified namespace.
 
   Args:
       namespace (str): The namespace to set for the database.
+      response (Response): The FastAPI response object.
       skip (int): The number of items to skip. Defaults to 0.
       limit (int): The maximum number of items to return. Defaults to 100.
-      db (Database): The MongoDB database instance.
+      cursor (Optional[str]): The X-Next-Cursor value of the previous page, resumes right after it.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       List[User]: A list of users.
   """
   db = set_namespace(db, namespace)
-  users = crud_user.get_users(db=db, skip=skip, limit=limit)
+  users = await crud_user.get_users(db=db, skip=skip, limit=limit, cursor=cursor)
+  next_cursor = pagination.next_cursor(users, limit)
+  if next_cursor:
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
   return users
@@ -1,25 +1,31 @@
 # Standard libraries
-from typing import List, Annotated
+from typing import List, Annotated, Optional, Union
 
 # FastAPI libraries
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi import Request, Response, status
-from fastapi import Form
+from fastapi import Form, BackgroundTasks
 
 # MongoDB
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from starlette.responses import JSONResponse
 
 from db.mongodb import get_mongo_db, set_namespace
-from schemas.blog import BlogCreate, Blog
+from db.indexes import TEXT_SEARCH_INDEX, is_known_namespace, wait_for_namespace_indexes
+from schemas.bulk import BulkResponse, BulkDeleteRequest
+from schemas.blog import BlogBase, BlogCreate, Blog, BlogSummary, BlogSearchResult, BlogFacets, BLOG_SUMMARY_FIELDS
 from crud import blog as crud_blog
 from services.auth_service import check_login
+from services import image_store
+from services.response_cache import response_cache
 
 # Utils
-from utils import func
+from utils import bulk, func, pagination
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.responses import MongoJSONResponse
 
 # Core
-from core.config import ROLE_ADMIN, ROLE_USER
+from core.config import ROLE_ADMIN, ROLE_USER, FACET_MAX_TAGS, BULK_CHUNK_SIZE, BULK_MAX_ITEMS
 from core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -28,12 +34,13 @@ router = APIRouter()
 
 
 @router.post("/{namespace}/blogs/create", response_model=Blog, status_code=status.HTTP_201_CREATED)
-def create_new_blog(
+async def create_new_blog(
     namespace: str,
     request: Request,
     response: Response,
     form_data: Annotated[BlogCreate, Form()],
-    db: Database = Depends(get_mongo_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Blog:
   """
   Create a new blog in the specified namespace.
@@ -43,7 +50,8 @@ def create_new_blog(
       request (Request): The FastAPI request object.
       response (Response): The FastAPI response object.
       form_data (BlogCreate): The blog data to create.
-      db (Database): The MongoDB database instance.
+      background_tasks (BackgroundTasks): Renders the responsive image variants.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Blog: The newly created blog.
@@ -51,28 +59,25 @@ def create_new_blog(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
-
-  storage_dir = func.get_root_path_project() / "storage" / namespace / 'blogs'
-  storage_dir.mkdir(parents=True, exist_ok=True)
-
-  filename = f'{func.random_string(10)}-{func.convert_filename(form_data.image.filename)}'
-  file_path = storage_dir / filename
-  with open(file_path, "wb") as f:
-    f.write(form_data.image.file.read())
-
-  form_data.image_url = f'{namespace}/images/blogs/{filename}'
-  new_blog = crud_blog.create_blog(db=db, blog=form_data)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  form_data.image_url = await image_store.store_blog_image(db, namespace, form_data.image, background_tasks)
+  try:
+    new_blog = await crud_blog.create_blog(db=db, blog=form_data)
+  except Exception:
+    await image_store.release_blog_image(db, namespace, form_data.image_url)
+    raise
   return new_blog
 
 @router.put("/{namespace}/blogs/{blog_id}/update", response_model=Blog, status_code=status.HTTP_201_CREATED)
-def update_blog(
+async def update_blog(
     namespace: str,
     request: Request,
     response: Response,
     blog_id: str,
     form_data: Annotated[BlogCreate, Form()],
-    db: Database = Depends(get_mongo_db)
+    background_tasks: BackgroundTasks,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Blog:
   """
   Update an existing blog in the specified namespace.
@@ -83,7 +88,8 @@ def update_blog(
       response (Response): The FastAPI response object.
       blog_id (str): The ID of the blog to update.
       form_data (BlogCreate): The updated blog data.
-      db (Database): The MongoDB database instance.
+      background_tasks (BackgroundTasks): Renders the responsive image variants.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Blog: The updated blog.
@@ -91,40 +97,33 @@ def update_blog(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
   # Check if blog exists
-  blog_row = crud_blog.get_blog(db=db, blog_id=blog_id)
+  blog_row = await crud_blog.get_blog(db=db, blog_id=blog_id)
   if not blog_row:
     raise HTTPException(status_code=404, detail="Blog not found")
 
-  storage_dir = func.get_root_path_project() / "storage" / namespace / 'blogs'
-  storage_dir.mkdir(parents=True, exist_ok=True)
+  # Store the new image first, the old one is kept if the upload is rejected
+  form_data.image_url = await image_store.store_blog_image(db, namespace, form_data.image, background_tasks)
 
-  # Delete old image
-  old_image_url = blog_row.image_url
-  if old_image_url:
-    old_image_path = storage_dir / old_image_url.split('/')[-1]
-    if old_image_path.exists():
-      old_image_path.unlink()
-
-  # Upload new image
-  filename = f'{func.random_string(10)}-{func.convert_filename(form_data.image.filename)}'
-  file_path = storage_dir / filename
-  with open(file_path, "wb") as f:
-    f.write(form_data.image.file.read())
+  updated_blog = await crud_blog.update_blog(db=db, blog_id=blog_id, blog=form_data)
+  if updated_blog is None:
+    # Deleted meanwhile, drop the reference taken by the upload
+    await image_store.release_blog_image(db, namespace, form_data.image_url)
+    raise HTTPException(status_code=404, detail="Blog not found")
 
-  form_data.image_url = f'{namespace}/images/blogs/{filename}'
-  updated_blog = crud_blog.update_blog(db=db, blog_id=blog_id, blog=form_data)
+  # Release old image, removed with its last reference
+  await image_store.release_blog_image(db, namespace, blog_row.image_url)
   return updated_blog
 
 @router.delete("/{namespace}/blogs/{blog_id}/delete", status_code=status.HTTP_204_NO_CONTENT)
-def delete_blog(
+async def delete_blog(
     namespace: str,
     request: Request,
     response: Response,
     blog_id: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> JSONResponse:
   """
   Delete an existing blog in the specified namespace.
@@ -134,7 +133,7 @@ def delete_blog(
       request (Request): The FastAPI request object.
       response (Response): The FastAPI response object.
       blog_id (str): The ID of the blog to delete.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       dict[str, str]: An empty dictionary.
@@ -142,37 +141,127 @@ def delete_blog(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
   # Check if blog exists
-  blog_row = crud_blog.get_blog(db=db, blog_id=blog_id)
+  blog_row = await crud_blog.get_blog(db=db, blog_id=blog_id)
   if not blog_row:
     raise HTTPException(status_code=404, detail="Blog not found")
 
-  # Delete old image
-  old_image_url = blog_row.image_url
-  if old_image_url:
-    storage_dir = func.get_root_path_project() / "storage" / namespace / 'blogs'
-    old_image_path = storage_dir / old_image_url.split('/')[-1]
-    if old_image_path.exists():
-      old_image_path.unlink()
-
-  crud_blog.delete_blog(db=db, blog_id=blog_id)
+  if await crud_blog.delete_blog(db=db, blog_id=blog_id):
+    # Release image, removed with its last reference
+    await image_store.release_blog_image(db, namespace, blog_row.image_url)
 
   return JSONResponse({
     "status": "success",
     "message": "Blog deleted successfully"
   })
 
-@router.get("/{namespace}/blogs/list", response_model=List[Blog], status_code=status.HTTP_200_OK)
-def get_blogs(
+@router.post("/{namespace}/blogs/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def create_blogs_bulk(
+    namespace: str,
+    request: Request,
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Create many blogs in the specified namespace from a JSON array, or from NDJSON with
+  an application/x-ndjson content type.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      ordered (bool): Stop at the first failing element, the next ones are skipped. Defaults to True.
+      chunk_size (int): The number of blogs per insert_many. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each element, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {BULK_MAX_ITEMS}")
+
+  elements = await bulk.read_bulk_elements(request)
+  blogs, results = bulk.validate_bulk_elements(elements, BlogBase, ordered)
+
+  # Images are not uploaded in bulk, a blog can only point to a stored content addressed
+  # image. Images stored before content addressing belong to a single blog.
+  for index, blog in enumerate(blogs):
+    if blog is not None and blog.image_url and not image_store.is_content_addressed(blog.image_url.split('/')[-1]):
+      bulk.reject_bulk_element(blogs, results, index, "Image must be a content addressed blog image", ordered)
+
+  # Count the image references before the insert, so the images cannot be removed meanwhile
+  acquired = {index: blog.image_url for index, blog in enumerate(blogs) if blog is not None and blog.image_url}
+  rejected = await image_store.acquire_blog_images(db, namespace, acquired.values())
+  for index, image_url in acquired.items():
+    if image_url in rejected:
+      bulk.reject_bulk_element(blogs, results, index, "Image not found", ordered)
+
+  await crud_blog.create_blogs(db=db, blogs=blogs, results=results, ordered=ordered, chunk_size=chunk_size)
+
+  # Drop the references counted for blogs that were not inserted
+  await image_store.release_blog_images(db, namespace, [
+    image_url for index, image_url in acquired.items()
+    if image_url not in rejected and results[index].status != bulk.BULK_CREATED
+  ])
+  return bulk.summarize_bulk(results)
+
+
+@router.post("/{namespace}/blogs/bulk-delete", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def delete_blogs_bulk(
+    namespace: str,
+    request: Request,
+    body: BulkDeleteRequest,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Delete many blogs of the specified namespace by id.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      body (BulkDeleteRequest): The ids of the blogs to delete.
+      chunk_size (int): The number of deletes running at once. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each id, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS or len(body.ids) > BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size and the number of ids must be between 1 and {BULK_MAX_ITEMS}")
+
+  results, deleted = await crud_blog.delete_blogs(db=db, blog_ids=body.ids, chunk_size=chunk_size)
+
+  # Release images, removed with their last reference
+  for blog_data in deleted:
+    await image_store.release_blog_image(db, namespace, blog_data.get("image_url"))
+  return bulk.summarize_bulk(results)
+
+
+@router.get("/{namespace}/blogs/list", response_model=List[Union[Blog, BlogSummary]], response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def get_blogs(
     namespace: str,
     request: Request,
     response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Database = Depends(get_mongo_db)
-) -> List[Blog]:
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    fields: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> List[Union[Blog, BlogSummary]]:
   """
   Retrieve a list of blogs from the specified namespace.
 
@@ -182,23 +271,113 @@ def get_blogs(
       response (Response): The FastAPI response object.
       skip (int): The number of blogs to skip. Defaults to 0.
       limit (int): The maximum number of blogs to return. Defaults to 100.
-      db (Database): The MongoDB database instance.
+      cursor (Optional[str]): The X-Next-Cursor value of the previous page, resumes right after it.
+      summary (bool): Return BlogSummary items, without content and comments. Defaults to False.
+      fields (Optional[str]): Comma separated subset of the summary fields to return, implies summary.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
-      List[Blog]: A list of blogs.
+      List[Union[Blog, BlogSummary]]: A list of blogs, or of blog summaries. Sent with an
+      ETag, 304 Not Modified when it matches If-None-Match.
   """
   db = set_namespace(db, namespace)
 
-  blogs = crud_blog.get_blogs(db=db, skip=skip, limit=limit)
-  return blogs
+  field_list = None
+  if fields:
+    field_list = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown_fields = set(field_list) - set(BLOG_SUMMARY_FIELDS)
+    if unknown_fields:
+      raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+
+  async def build():
+    if summary or fields:
+      blogs = await crud_blog.get_blog_summary_documents(db=db, fields=field_list, skip=skip, limit=limit, cursor=cursor)
+    else:
+      blogs = await crud_blog.get_blog_documents(db=db, skip=skip, limit=limit, cursor=cursor)
+
+    next_cursor = pagination.next_cursor(blogs, limit)
+    return blogs, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+
+  # 304 or cached body while no blog was written since
+  version = await crud_blog.get_blogs_version(db)
+  return await response_cache.respond(request, version, build)
 
-@router.get("/{namespace}/blogs/{blog_id}", response_model=Blog, status_code=status.HTTP_200_OK)
-def get_blog(
+@router.get("/{namespace}/blogs/search", response_model=List[BlogSearchResult], status_code=status.HTTP_200_OK)
+async def search_blogs(
+    namespace: str,
+    request: Request,
+    response: Response,
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> List[BlogSearchResult]:
+  """
+  Search the blogs of the specified namespace by title, tags and content.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      response (Response): The FastAPI response object.
+      q (str): The search string: words, "quoted phrases" and -excluded words.
+      skip (int): The number of results to skip. Defaults to 0.
+      limit (int): The maximum number of results to return, at most 100. Defaults to 20.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      List[BlogSearchResult]: The matching blog summaries, best matches first.
+  """
+  db = set_namespace(db, namespace)
+
+  q = q.strip()
+  if not q or len(q) > 200:
+    raise HTTPException(status_code=400, detail="Search query must be between 1 and 200 characters")
+  if skip < 0 or not 0 < limit <= 100:
+    raise HTTPException(status_code=400, detail="Invalid skip or limit")
+
+  # $text needs the text index, only provision it for a namespace that is in use
+  if not await is_known_namespace(db):
+    return []
+  if not await wait_for_namespace_indexes(db, [TEXT_SEARCH_INDEX]):
+    raise HTTPException(status_code=503, detail="Search is temporarily unavailable")
+
+  return await crud_blog.search_blogs(db=db, query=q, skip=skip, limit=limit)
+
+@router.get("/{namespace}/blogs/facets", response_model=BlogFacets, status_code=status.HTTP_200_OK)
+async def get_blog_facets(
+    namespace: str,
+    request: Request,
+    response: Response,
+    top_tags: int = 20,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BlogFacets:
+  """
+  Count the blogs of the specified namespace by category and by tag.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      response (Response): The FastAPI response object.
+      top_tags (int): The number of most used tags to return. Defaults to 20.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BlogFacets: The category counts and the top tags.
+  """
+  db = set_namespace(db, namespace)
+
+  if not 0 <= top_tags <= FACET_MAX_TAGS:
+    raise HTTPException(status_code=400, detail=f"top_tags must be between 0 and {FACET_MAX_TAGS}")
+
+  return await crud_blog.get_blog_facets(db=db, top_tags=top_tags)
+
+@router.get("/{namespace}/blogs/{blog_id}", response_model=Blog, response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def get_blog(
     namespace: str,
     request: Request,
     response: Response,
     blog_id: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Blog:
   """
   Retrieve an existing blog from the specified namespace.
@@ -208,16 +387,20 @@ def get_blog(
       request (Request): The FastAPI request object.
       response (Response): The FastAPI response object.
       blog_id (str): The ID of the blog to retrieve.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
-      Blog: The blog.
+      Blog: The blog. Sent with an ETag, 304 Not Modified when it matches If-None-Match.
   """
   db = set_namespace(db, namespace)
 
-  # Check blog exists
-  blog_row = crud_blog.get_blog(db=db, blog_id=blog_id)
-  if not blog_row:
-    raise HTTPException(status_code=404, detail="Collection not found")
+  async def build():
+    # Check blog exists
+    blog_row = await crud_blog.get_blog_document(db=db, blog_id=blog_id)
+    if not blog_row:
+      raise HTTPException(status_code=404, detail="Collection not found")
+    return blog_row, {}
 
-  return blog_row
+  # 304 or cached body while no blog was written since
+  version = await crud_blog.get_blogs_version(db)
+  return await response_cache.respond(request, version, build)
@@ -1,5 +1,5 @@
 # Standard libraries
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 from starlette.responses import JSONResponse
 
 # FastAPI libraries
@@ -8,17 +8,20 @@ from fastapi import Request, Response, status
 from fastapi import Form
 
 # MongoDB
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from db.mongodb import get_mongo_db, set_namespace
+from schemas.bulk import BulkResponse, BulkDeleteRequest
 from schemas.category import CategoryCreate, Category
 from crud import category as crud_category
 from services.auth_service import check_login
 
 # Utils
-from utils import func
+from utils import bulk, func, pagination
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.responses import MongoJSONResponse
 
 # Core
-from core.config import ROLE_ADMIN, ROLE_USER
+from core.config import ROLE_ADMIN, ROLE_USER, BULK_CHUNK_SIZE, BULK_MAX_ITEMS
 from core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -27,12 +30,12 @@ router = APIRouter()
 
 
 @router.post("/{namespace}/categories/create", response_model=Category, status_code=status.HTTP_201_CREATED)
-def create_new_category(
+async def create_new_category(
     namespace: str,
     request: Request,
     response: Response,
     form_data: Annotated[CategoryCreate, Form()],
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Category:
   """
   Create a new category in the specified namespace.
@@ -42,7 +45,7 @@ def create_new_category(
       request (Request): The FastAPI request object.
       response (Response): The FastAPI response object.
       form_data (CategoryCreate): The category data to create.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Category: The newly created category.
@@ -50,20 +53,20 @@ def create_new_category(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
-  new_category = crud_category.create_category(db=db, category=form_data)
+  new_category = await crud_category.create_category(db=db, category=form_data)
   return new_category
 
 
 @router.put("/{namespace}/categories/{category_id}/update", response_model=Category, status_code=status.HTTP_201_CREATED)
-def update_category(
+async def update_category(
     namespace: str,
     request: Request,
     response: Response,
     category_id: str,
     form_data: Annotated[CategoryCreate, Form()],
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Category:
   """
   Update an existing category in the specified namespace.
@@ -74,7 +77,7 @@ def update_category(
       response (Response): The FastAPI response object.
       category_id (str): The ID of the category to update.
       form_data (CategoryCreate): The updated category data.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Category: The updated category.
@@ -82,23 +85,22 @@ def update_category(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
-  # Check if category exists
-  if crud_category.get_category(db=db, category_id=category_id) is None:
+  updated_category = await crud_category.update_category(db=db, category_id=category_id, category=form_data)
+  if updated_category is None:
     raise HTTPException(status_code=404, detail="Category not found")
 
-  updated_category = crud_category.update_category(db=db, category_id=category_id, category=form_data)
   return updated_category
 
 
 @router.delete("/{namespace}/categories/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
     namespace: str,
     request: Request,
     response: Response,
     category_id: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> JSONResponse:
   """
   Delete an existing category in the specified namespace.
@@ -108,7 +110,7 @@ def delete_category(
       request (Request): The FastAPI request object.
       response (Response): The FastAPI response object.
       category_id (str): The ID of the category to delete.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       dict[str, str]: An empty dictionary.
@@ -116,13 +118,13 @@ def delete_category(
   db = set_namespace(db, namespace)
 
   # Check login
-  check_login(request, db, namespace, target_role=ROLE_ADMIN)
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
 
   # Check if category exists
-  if crud_category.get_category(db=db, category_id=category_id) is None:
+  if await crud_category.get_category(db=db, category_id=category_id) is None:
     raise HTTPException(status_code=404, detail="Category not found")
 
-  crud_category.delete_category(db=db, category_id=category_id)
+  await crud_category.delete_category(db=db, category_id=category_id)
 
   return JSONResponse({
     "status": "success",
@@ -130,14 +132,85 @@ def delete_category(
   })
 
 
-@router.get("/{namespace}/categories/list", response_model=List[Category], status_code=status.HTTP_200_OK)
-def get_categories(
+@router.post("/{namespace}/categories/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def create_categories_bulk(
+    namespace: str,
+    request: Request,
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Create many categories in the specified namespace from a JSON array, or from NDJSON with
+  an application/x-ndjson content type.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      ordered (bool): Stop at the first failing element, the next ones are skipped. Defaults to True.
+      chunk_size (int): The number of categories per insert_many. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each element, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {BULK_MAX_ITEMS}")
+
+  elements = await bulk.read_bulk_elements(request)
+  categories, results = bulk.validate_bulk_elements(elements, CategoryCreate, ordered)
+
+  await crud_category.create_categories(db=db, categories=categories, results=results, ordered=ordered, chunk_size=chunk_size)
+  return bulk.summarize_bulk(results)
+
+
+@router.post("/{namespace}/categories/bulk-delete", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def delete_categories_bulk(
+    namespace: str,
+    request: Request,
+    body: BulkDeleteRequest,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Delete many categories of the specified namespace by id.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      body (BulkDeleteRequest): The ids of the categories to delete.
+      chunk_size (int): The number of deletes running at once. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each id, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS or len(body.ids) > BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size and the number of ids must be between 1 and {BULK_MAX_ITEMS}")
+
+  results = await crud_category.delete_categories(db=db, category_ids=body.ids, chunk_size=chunk_size)
+  return bulk.summarize_bulk(results)
+
+
+@router.get("/{namespace}/categories/list", response_model=List[Category], response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def get_categories(
     namespace: str,
     request: Request,
     response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Database = Depends(get_mongo_db)
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> List[Category]:
   """
   Retrieve a list of categories from the specified namespace.
@@ -148,22 +221,24 @@ def get_categories(
       response (Response): The FastAPI response object.
       skip (int): The number of categories to skip. Defaults to 0.
       limit (int): The maximum number of categories to return. Defaults to 100.
-      db (Database): The MongoDB database instance.
+      cursor (Optional[str]): The X-Next-Cursor value of the previous page, resumes right after it.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       List[Category]: A list of categories.
   """
   db = set_namespace(db, namespace)
 
-  categories = crud_category.get_categories(db=db, skip=skip, limit=limit)
-  return categories
+  categories = await crud_category.get_category_documents(db=db, skip=skip, limit=limit, cursor=cursor)
+  next_cursor = pagination.next_cursor(categories, limit)
+  return MongoJSONResponse(categories, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 
-@router.get("/{namespace}/categories/{category_id}", response_model=Category, status_code=status.HTTP_200_OK)
-def get_category(
+@router.get("/{namespace}/categories/{category_id}", response_model=Category, response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def get_category(
     namespace: str,
     category_id: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Category:
   """
   Retrieve a specific category by its ID from the specified namespace.
@@ -171,7 +246,7 @@ def get_category(
   Args:
       namespace (str): The namespace to set for the database.
       category_id (str): The ID of the category to retrieve.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Category: The requested category.
@@ -180,7 +255,7 @@ def get_category(
       HTTPException: If the Category is not found.
   """
   db = set_namespace(db, namespace)
-  category = crud_category.get_category(db=db, category_id=category_id)
+  category = await crud_category.get_category_document(db=db, category_id=category_id)
   if category is None:
     raise HTTPException(status_code=404, detail="Category not found")
-  return category
+  return MongoJSONResponse(category)
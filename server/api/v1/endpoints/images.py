@@ -4,14 +4,18 @@ from typing import List, Annotated
 from bson import Binary
 # FastAPI libraries
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi import Request, Response, status
+from fastapi import Request, Response, status, BackgroundTasks
 from starlette.responses import StreamingResponse, FileResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 # MongoDB
 from pymongo.database import Database
 
 from db.mongodb import get_mongo_db, set_namespace
 from services.auth_service import check_login
+from services.image_cache import image_cache
+from services.image_pool import image_pool
+from services import image_store, image_variants
 
 # Utils
 from utils import func
@@ -25,9 +29,11 @@ router = APIRouter()
 
 
 @router.get("/{namespace}/images/blogs/{filename}", status_code=status.HTTP_200_OK)
-def get_image_blog(
+async def get_image_blog(
     namespace: str,
     filename: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
     w: int = None,
     h: int = None 
 ):
@@ -36,22 +42,26 @@ def get_image_blog(
   Args:
       filename (str): Name of the file
       namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object, its Accept header picks the variant format.
+      background_tasks (BackgroundTasks): Renders missing responsive variants.
       w (int): The width of the image
       h (int): The height of the image
   Returns:
       FileResponse: The image
   """
 
-  storage_dir = func.get_root_path_project() / "storage" / namespace / 'blogs'
-  file_path = storage_dir / filename
+  file_path = image_store.get_blog_images_dir(namespace) / filename
 
   # Check if file exists
-  if not file_path.exists():
+  if not await run_in_threadpool(file_path.exists):
     raise HTTPException(status_code=404, detail="File not found")
 
-  # Set headers for cache for 5 minutes
+  # Content addressed images never change, older ones are cached for 5 minutes
   response = Response()
-  response.headers['Cache-Control'] = 'max-age=300'
+  if image_store.is_content_addressed(filename):
+    response.headers['Cache-Control'] = image_store.IMMUTABLE_CACHE_CONTROL
+  else:
+    response.headers['Cache-Control'] = 'max-age=300'
 
   if w or h:
     width = w
@@ -62,11 +72,39 @@ def get_image_blog(
     if not height and width:
       height = width
 
-    image_io_resized, format_save = func.resize_image(file_path, width, height)
+    # The body depends on the Accept header once variants are rendered
+    response.headers['Vary'] = 'Accept'
+    file_headers = {'Cache-Control': response.headers['Cache-Control'], 'Vary': response.headers['Vary']}
+
+    # Serve the nearest pre-rendered bucket in the best format the client accepts
+    variants_dir = image_variants.get_variants_dir(namespace, filename)
+    variant = await run_in_threadpool(
+      image_variants.find_variant, request.headers.get('Accept'), variants_dir, max(width, height)
+    )
+    if variant:
+      variant_format, variant_path = variant
+      return FileResponse(variant_path, headers=file_headers, media_type=f"image/{variant_format.lower()}")
+
+    format_save = await run_in_threadpool(func.get_image_format, file_path)
+
+    # Images uploaded before variants existed get them rendered on first use, unless it failed lately
+    if image_variants.should_generate_variants(variants_dir):
+      background_tasks.add_task(image_variants.generate_blog_image_variants, file_path, variants_dir, format_save)
+
+    media_type = f"image/{format_save.lower()}"
+
+    # Serve repeat requests straight from the derivative cache, the lookup stats files
+    cache_key, cached_path = await run_in_threadpool(image_cache.lookup, file_path, width, height, format_save)
+    if cached_path:
+      return FileResponse(cached_path, headers=file_headers, media_type=media_type)
+
+    # Decode/resize/encode in the image process pool, 503 when it is saturated
+    image_bytes, format_save = await image_pool.run(func.resize_image_bytes, file_path, width, height, format_save)
+    await run_in_threadpool(image_cache.put, cache_key, image_bytes)
 
     # Content length
-    response.headers['Content-Length'] = str(len(image_io_resized.getvalue()))
+    response.headers['Content-Length'] = str(len(image_bytes))
 
-    return StreamingResponse(image_io_resized, headers=response.headers, media_type=f"image/{format_save.lower()}")
+    return Response(image_bytes, headers=response.headers, media_type=media_type)
 
-  return FileResponse(file_path)
+  return FileResponse(file_path, headers={'Cache-Control': response.headers['Cache-Control']})
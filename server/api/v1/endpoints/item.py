@@ -1,23 +1,30 @@
-from typing import List, Annotated
+from typing import List, Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi import File, UploadFile, status
+from fastapi import File, UploadFile, Request, Response, status
 
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from starlette.concurrency import run_in_threadpool
+from schemas.bulk import BulkResponse, BulkDeleteRequest
 from schemas.item import ItemCreate, Item
 from crud import item as crud_item
 from db.mongodb import get_mongo_db, set_namespace
+from services.auth_service import check_login
 
-from utils import func
+from utils import bulk, func, pagination
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.responses import MongoJSONResponse
+
+from core.config import ROLE_ADMIN, BULK_CHUNK_SIZE, BULK_MAX_ITEMS
 
 router = APIRouter()
 
 
 @router.post("/{namespace}/items", response_model=Item, status_code=status.HTTP_201_CREATED)
-def create_new_item(
+async def create_new_item(
     namespace: str,
     item: ItemCreate,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Item:
   """
   Create a new item in the specified namespace.
@@ -25,45 +32,120 @@ def create_new_item(
   Args:
       namespace (str): The namespace to set for the database.
       item (ItemCreate): The item data to create.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Item: The newly created item.
   """
   db = set_namespace(db, namespace)
-  new_item = crud_item.create_item(db=db, item=item)
+  new_item = await crud_item.create_item(db=db, item=item)
   return new_item
 
 
-@router.get("/{namespace}/items/", response_model=List[Item], status_code=status.HTTP_200_OK)
-def read_items(
+@router.post("/{namespace}/items/bulk", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def create_items_bulk(
+    namespace: str,
+    request: Request,
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Create many items in the specified namespace from a JSON array, or from NDJSON with
+  an application/x-ndjson content type.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      ordered (bool): Stop at the first failing element, the next ones are skipped. Defaults to True.
+      chunk_size (int): The number of items per insert_many. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each element, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {BULK_MAX_ITEMS}")
+
+  elements = await bulk.read_bulk_elements(request)
+  items, results = bulk.validate_bulk_elements(elements, ItemCreate, ordered)
+
+  await crud_item.create_items(db=db, items=items, results=results, ordered=ordered, chunk_size=chunk_size)
+  return bulk.summarize_bulk(results)
+
+
+@router.post("/{namespace}/items/bulk-delete", response_model=BulkResponse, status_code=status.HTTP_200_OK)
+async def delete_items_bulk(
+    namespace: str,
+    request: Request,
+    body: BulkDeleteRequest,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> BulkResponse:
+  """
+  Delete many items of the specified namespace by id.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      body (BulkDeleteRequest): The ids of the items to delete.
+      chunk_size (int): The number of deletes running at once. Defaults to BULK_CHUNK_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      BulkResponse: The outcome of each id, by position in the request.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if not 0 < chunk_size <= BULK_MAX_ITEMS or len(body.ids) > BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"chunk_size and the number of ids must be between 1 and {BULK_MAX_ITEMS}")
+
+  results = await crud_item.delete_items(db=db, item_ids=body.ids, chunk_size=chunk_size)
+  return bulk.summarize_bulk(results)
+
+
+@router.get("/{namespace}/items/", response_model=List[Item], response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def read_items(
     namespace: str,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    db: Database = Depends(get_mongo_db)
+    cursor: Optional[str] = None,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> List[Item]:
   """
   Retrieve a list of items from the specified namespace.
 
   Args:
       namespace (str): The namespace to set for the database.
+      response (Response): The FastAPI response object.
       skip (int): The number of items to skip. Defaults to 0.
       limit (int): The maximum number of items to return. Defaults to 100.
-      db (Database): The MongoDB database instance.
+      cursor (Optional[str]): The X-Next-Cursor value of the previous page, resumes right after it.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       List[Item]: A list of items.
   """
   db = set_namespace(db, namespace)
-  items = crud_item.get_items(db=db, skip=skip, limit=limit)
-  return items
+  items = await crud_item.get_item_documents(db=db, skip=skip, limit=limit, cursor=cursor)
+  next_cursor = pagination.next_cursor(items, limit)
+  return MongoJSONResponse(items, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
 
 
-@router.get("/{namespace}/items/{item_id}", response_model=Item, status_code=status.HTTP_200_OK)
-def read_item(
+@router.get("/{namespace}/items/{item_id}", response_model=Item, response_class=MongoJSONResponse, status_code=status.HTTP_200_OK)
+async def read_item(
     namespace: str,
     item_id: str,
-    db: Database = Depends(get_mongo_db)
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
 ) -> Item:
   """
   Retrieve a specific item by its ID from the specified namespace.
@@ -71,7 +153,7 @@ def read_item(
   Args:
       namespace (str): The namespace to set for the database.
       item_id (str): The ID of the item to retrieve.
-      db (Database): The MongoDB database instance.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
 
   Returns:
       Item: The requested item.
@@ -80,10 +162,10 @@ def read_item(
       HTTPException: If the item is not found.
   """
   db = set_namespace(db, namespace)
-  item = crud_item.get_item(db=db, item_id=item_id)
+  item = await crud_item.get_item_document(db=db, item_id=item_id)
   if item is None:
     raise HTTPException(status_code=404, detail="Item not found")
-  return item
+  return MongoJSONResponse(item)
 
 
 @router.post("/{namespace}/uploadfile")
@@ -98,7 +180,6 @@ async def create_upload_file(
 
   for file in files:
     file_path = storage_dir / file.filename
-    with open(file_path, "wb") as f:
-      f.write(file.file.read())
+    await run_in_threadpool(func.save_upload_file, file, file_path)
 
   return {"filenames": [file.filename for file in files]}
@@ -0,0 +1,45 @@
+# FastAPI libraries
+from fastapi import APIRouter, Depends
+from fastapi import Request, status
+
+# MongoDB
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from db.mongodb import get_mongo_db, set_namespace
+from services.auth_service import check_login
+from services.image_cache import image_cache
+
+# Core
+from core.config import ROLE_ADMIN
+from core.logger import log_queue_stats
+
+router = APIRouter()
+
+
+@router.get("/{namespace}/stats", status_code=status.HTTP_200_OK)
+async def get_stats(
+    namespace: str,
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> dict:
+  """
+  Runtime counters of the worker that serves the request, for admins: the log queue,
+  with the records dropped because it was full, and the resized image cache.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      request (Request): The FastAPI request object.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      dict: The log_queue and image_cache counters.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  return {
+    "log_queue": log_queue_stats(),
+    "image_cache": image_cache.stats(),
+  }
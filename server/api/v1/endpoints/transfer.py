@@ -0,0 +1,149 @@
+# Standard libraries
+from typing import Optional
+
+# FastAPI libraries
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi import File, UploadFile, Request, status, BackgroundTasks
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+
+# MongoDB
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from db.mongodb import get_mongo_db, set_namespace
+from crud.blog import blog_repository
+from crud.category import category_repository
+from crud.item import item_repository
+from crud.repository import to_object_id
+from services.auth_service import check_login
+from services import export, importer
+
+# Utils
+from utils.bulk import NDJSON_MEDIA_TYPES
+
+# Core
+from core.config import ROLE_ADMIN, BULK_MAX_ITEMS, EXPORT_BATCH_SIZE, EXPORT_MAX_BATCH_SIZE, IMPORT_BATCH_SIZE
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+# Collections of a namespace that can be exported, users are left out with their password hashes
+TRANSFER_REPOSITORIES = {
+  "blogs": blog_repository,
+  "categories": category_repository,
+  "items": item_repository,
+}
+
+
+@router.get("/{namespace}/export/{collection}", status_code=status.HTTP_200_OK)
+async def export_collection(
+    namespace: str,
+    collection: str,
+    request: Request,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    after_id: Optional[str] = None,
+    gzip: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> StreamingResponse:
+  """
+  Stream every document of a collection of the specified namespace as NDJSON, in _id
+  order. The export reads one batch at a time and never holds the collection in memory.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      collection (str): blogs, categories or items.
+      request (Request): The FastAPI request object.
+      batch_size (int): The number of documents read from Mongo per batch. Defaults to EXPORT_BATCH_SIZE.
+      after_id (Optional[str]): Resume an export after this _id, the last one received.
+      gzip (bool): Send the NDJSON as a .ndjson.gz file. Defaults to False.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      StreamingResponse: The NDJSON documents, one per line.
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  repository = TRANSFER_REPOSITORIES.get(collection)
+  if repository is None:
+    raise HTTPException(status_code=404, detail=f"Unknown collection, expected one of: {', '.join(TRANSFER_REPOSITORIES)}")
+
+  if not 0 < batch_size <= EXPORT_MAX_BATCH_SIZE:
+    raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {EXPORT_MAX_BATCH_SIZE}")
+
+  after_object_id = None
+  if after_id:
+    after_object_id = to_object_id(after_id)
+    if after_object_id is None:
+      raise HTTPException(status_code=400, detail="Invalid after_id")
+
+  chunks = export.export_documents(repository.collection(db), after_object_id, batch_size)
+  filename = f"{namespace}-{collection}.ndjson"
+  media_type = NDJSON_MEDIA_TYPES[0]
+  if gzip:
+    chunks = export.gzip_chunks(chunks)
+    filename += ".gz"
+    media_type = "application/gzip"
+
+  return StreamingResponse(
+    chunks,
+    media_type=media_type,
+    headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+  )
+
+
+@router.post("/{namespace}/import/{collection}", status_code=status.HTTP_200_OK)
+async def import_collection(
+    namespace: str,
+    collection: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    documents: UploadFile = File(...),
+    images: Optional[UploadFile] = File(None),
+    batch_size: int = IMPORT_BATCH_SIZE,
+    db: AsyncIOMotorDatabase = Depends(get_mongo_db)
+) -> StreamingResponse:
+  """
+  Import NDJSON records, such as an export, into a collection of the specified namespace.
+  Records keep their _id and timestamps and replace the documents with the same _id.
+  Blogs may come with a zip or tar archive of their images. Progress is streamed back as
+  NDJSON events while the import runs, see services.importer.import_documents.
+
+  Args:
+      namespace (str): The namespace to set for the database.
+      collection (str): blogs, categories or items.
+      request (Request): The FastAPI request object.
+      background_tasks (BackgroundTasks): Renders the variants of the imported images after the import.
+      documents (UploadFile): The NDJSON records, optionally gzip compressed.
+      images (Optional[UploadFile]): The archive of the blog images.
+      batch_size (int): The number of records per batch. Defaults to IMPORT_BATCH_SIZE.
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+
+  Returns:
+      StreamingResponse: The progress events, one per line, the last one is "done".
+  """
+  db = set_namespace(db, namespace)
+
+  # Check login
+  await check_login(request, db, namespace, target_role=ROLE_ADMIN)
+
+  if collection not in importer.IMPORT_TARGETS:
+    raise HTTPException(status_code=404, detail=f"Unknown collection, expected one of: {', '.join(importer.IMPORT_TARGETS)}")
+
+  if not 0 < batch_size <= BULK_MAX_ITEMS:
+    raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {BULK_MAX_ITEMS}")
+
+  archive_kind = None
+  if images is not None:
+    if collection != "blogs":
+      raise HTTPException(status_code=400, detail="Only blogs have images")
+    archive_kind = await run_in_threadpool(importer.detect_archive, images)
+
+  return StreamingResponse(
+    importer.import_documents(db, namespace, collection, documents, images, archive_kind, batch_size, background_tasks),
+    media_type=NDJSON_MEDIA_TYPES[0],
+  )
@@ -1,25 +1,178 @@
 import json
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from services.websocket_manager import ConnectionManager
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from jose import JWTError
+from services.websocket_manager import Client, is_event_room, manager
+
+from core.config import KEY_ACCESS_TOKEN
+from core.middleware import get_jwt_payload
 
 router = APIRouter()
-manager = ConnectionManager()
+
+
+def parse_command(data: str) -> Optional[dict]:
+  """
+  Room commands are JSON objects with an "action", anything else is a chat message
+  sent to the chat rooms of the client.
+  """
+  try:
+    command = json.loads(data)
+  except ValueError:
+    return None
+  if isinstance(command, dict) and "action" in command:
+    return command
+  return None
+
+
+def parse_init_payload(data: str) -> dict:
+  """
+  The first frame of a socket: {"username": "...", "rooms": ["blog:<id>", ...],
+  "access_token": "..."}, every key is optional.
+
+  Raises:
+      ValueError: If the frame is not such an object.
+  """
+  init_payload = json.loads(data)
+  if not isinstance(init_payload, dict):
+    raise ValueError("Expected a JSON object")
+
+  rooms = init_payload.get("rooms", [])
+  if not isinstance(rooms, list) or not all(isinstance(room, str) for room in rooms):
+    raise ValueError("rooms must be a list of room names")
+  for key in ("username", "access_token"):
+    if not isinstance(init_payload.get(key, ""), str):
+      raise ValueError(f"{key} must be a string")
+  return init_payload
+
+
+def authenticate_websocket(websocket: WebSocket, init_payload: dict) -> Optional[str]:
+  """
+  The username of the access token sent with the socket, in the access_token query
+  parameter, the access token cookie or the first frame.
+
+  Returns:
+      Optional[str]: The verified username, None for an anonymous client.
+
+  Raises:
+      ValueError: If a token is sent and is not valid.
+  """
+  token = (
+    websocket.query_params.get(KEY_ACCESS_TOKEN)
+    or websocket.cookies.get(KEY_ACCESS_TOKEN)
+    or init_payload.get("access_token")
+  )
+  if not token:
+    return None
+
+  try:
+    return get_jwt_payload(token)["username"]
+  except (JWTError, KeyError) as e:
+    raise ValueError(f"Invalid access token: {e}")
+
+
+def chat_message(client: Client, room: str, message) -> dict:
+  """
+  A chat message as relayed to a room. Anonymous clients pick their own name, so only
+  the sender of a signed in client is verified.
+  """
+  return {"type": "message", "room": room, "sender": client.username, "verified": client.user is not None, "message": message}
+
+
+async def handle_command(client: Client, command: dict):
+  """
+  Args:
+      client (Client): The client that sent the command.
+      command (dict): One of
+          {"action": "subscribe", "room": "blog:<id>"},
+          {"action": "unsubscribe", "room": "blog:<id>"},
+          {"action": "send", "room": "chat:<name>", "message": "..."}.
+          Blog event rooms are receive-only.
+  """
+  action = command.get("action")
+  room = str(command.get("room", ""))
+
+  try:
+    if action == "subscribe":
+      manager.subscribe(client, room)
+      reply = {"type": "subscribed", "room": room, "members": manager.member_count(room)}
+    elif action == "unsubscribe":
+      manager.unsubscribe(client, room)
+      reply = {"type": "unsubscribed", "room": room, "members": manager.member_count(room)}
+    elif action == "send":
+      if is_event_room(room):
+        raise ValueError(f"{room} is receive-only")
+      if room not in client.rooms:
+        raise ValueError(f"Not subscribed to {room}")
+      await manager.send_to_room(room, chat_message(client, room, command.get("message")))
+      return
+    else:
+      raise ValueError(f"Unknown action: {action}")
+  except ValueError as e:
+    reply = {"type": "error", "error": str(e)}
+
+  manager.send(client, json.dumps(reply))
+
+
+async def send_chat_message(client: Client, message: str):
+  """
+  Send a plain text frame to every chat room the client joined, blog event rooms are
+  receive-only.
+  """
+  rooms = sorted(room for room in client.rooms if not is_event_room(room))
+  if not rooms:
+    manager.send(client, json.dumps({"type": "error", "error": "Join a chat room before sending messages"}))
+    return
+
+  for room in rooms:
+    await manager.send_to_room(room, chat_message(client, room, message))
 
 
 @router.websocket("/ws/socket")
 async def websocket_endpoint(websocket: WebSocket):
   await websocket.accept()
 
-  init_data = await websocket.receive_text()
-  init_payload = json.loads(init_data)
-  username = init_payload.get("username", "Anonymous")
+  try:
+    init_payload = parse_init_payload(await websocket.receive_text())
+    user = authenticate_websocket(websocket, init_payload)
+  except ValueError as e:
+    await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+    return
+  except WebSocketDisconnect:
+    return
+
+  # A signed in client is always named after its account
+  username = user or init_payload.get("username") or "Anonymous"
 
-  await manager.connect(websocket, username)
+  client = await manager.connect(websocket, username, user)
 
   try:
+    for room in init_payload.get("rooms", []):
+      await handle_command(client, {"action": "subscribe", "room": room})
+
     while True:
       data = await websocket.receive_text()
-      await manager.broadcast(data, sender=username)
+      command = parse_command(data)
+      if command is None:
+        await send_chat_message(client, data)
+      else:
+        await handle_command(client, command)
   except WebSocketDisconnect:
+    pass
+  finally:
     manager.disconnect(websocket)
+
+
+@router.get("/ws/rooms")
+async def get_room_counts(request: Request) -> dict[str, int]:
+  """
+  Number of clients subscribed to each room on this worker, for signed in users. User
+  rooms are left out, except the one of the caller.
+  """
+  jwt_payload = request.state.jwt_payload
+  if not jwt_payload:
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated or token expired")
+
+  return manager.room_counts(user=jwt_payload.get("username"))
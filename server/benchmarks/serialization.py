@@ -0,0 +1,86 @@
+"""
+Per-document cost of serializing blogs read from Mongo, before and after the trusted
+read path. Run from the server directory:
+
+    python -m benchmarks.serialization --docs 100 --repeat 200
+"""
+import argparse
+import datetime
+import json
+import timeit
+
+from typing import List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from crud.blog import blog_repository
+from schemas.blog import Blog
+from utils.func import convert_object_id_of_item
+from utils.responses import dumps
+
+
+def make_documents(count: int) -> list[dict]:
+  now = datetime.datetime.now()
+  return [
+    {
+      "_id": ObjectId(),
+      "title": f"Blog {index}",
+      "content": "Lorem ipsum dolor sit amet. " * 40,
+      "author": "author",
+      "category": "category",
+      "tags": ["python", "mongo", "fastapi"],
+      "image_url": f"ns/images/blogs/{index:064x}.png",
+      "comments": [],
+      "created_at": now,
+      "updated_at": now,
+    }
+    for index in range(count)
+  ]
+
+
+def validated_models(documents: list[dict]) -> bytes:
+  # Models built by the crud layer, then encoded like ResponseCache did
+  blogs = [Blog(**convert_object_id_of_item(dict(document))) for document in documents]
+  return json.dumps(jsonable_encoder(blogs)).encode()
+
+
+def response_model(documents: list[dict], adapter: TypeAdapter) -> bytes:
+  # Models returned from an endpoint, validated again against response_model
+  blogs = [Blog(**convert_object_id_of_item(dict(document))) for document in documents]
+  content = adapter.validate_python([blog.model_dump(by_alias=True) for blog in blogs])
+  return json.dumps(adapter.dump_python(content, mode="json", by_alias=True)).encode()
+
+
+def trusted_documents(documents: list[dict]) -> bytes:
+  return dumps([blog_repository.to_document(document) for document in documents])
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument("--docs", type=int, default=100, help="Documents per response")
+  parser.add_argument("--repeat", type=int, default=200, help="Responses per measure")
+  args = parser.parse_args()
+
+  documents = make_documents(args.docs)
+  adapter = TypeAdapter(List[Blog])
+
+  assert json.loads(validated_models(documents)) == json.loads(trusted_documents(documents))
+
+  cases = [
+    ("models + jsonable_encoder", lambda: validated_models(documents)),
+    ("models + response_model", lambda: response_model(documents, adapter)),
+    ("trusted documents + orjson", lambda: trusted_documents(documents)),
+  ]
+
+  baseline = None
+  for name, case in cases:
+    seconds = min(timeit.repeat(case, number=args.repeat, repeat=3))
+    per_document = seconds / (args.repeat * args.docs) * 1e6
+    baseline = baseline or per_document
+    print(f"{name:<28} {per_document:8.2f} us/doc  x{baseline / per_document:.1f}")
+
+
+if __name__ == "__main__":
+  main()
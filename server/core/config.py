@@ -21,6 +21,77 @@ class Settings(BaseSettings):
 
   fernet_key: str
 
+  log_level: str = "INFO"
+  log_format: str = "text"
+  log_levels: dict[str, str] = {}
+  log_sample_rates: dict[str, float] = {}
+  log_queue_size: int = 10000
+  log_rotate_max_bytes: int = 10 * 1024 * 1024
+  log_rotate_when: str = ""
+  log_rotate_backup_count: int = 5
+
+  bcrypt_rounds: int = 0
+  password_hash_target_ms: float = 250.0
+  password_pool_workers: int = 4
+  password_pool_max_pending: int = 64
+  password_pool_timeout_seconds: float = 5.0
+
+  token_cache_max_size: int = 10000
+
+  user_cache_ttl_seconds: float = 30.0
+  user_cache_max_size: int = 10000
+
+  search_cache_ttl_seconds: float = 60.0
+  search_cache_max_size: int = 1000
+  search_snippet_length: int = 160
+
+  facet_cache_ttl_seconds: float = 300.0
+  facet_max_tags: int = 100
+
+  content_version_ttl_seconds: float = 1.0
+  response_cache_max_size: int = 1000
+  response_cache_max_body_bytes: int = 1024 * 1024
+
+  ws_send_queue_size: int = 256
+  ws_send_timeout_seconds: float = 10.0
+  ws_slow_consumer_policy: str = "drop"
+  ws_max_rooms_per_client: int = 100
+  ws_pubsub_backend: str = "memory"
+  ws_pubsub_url: str = "redis://localhost:6379/0"
+  ws_pubsub_channel: str = "ws:broadcast"
+
+  blog_change_stream: bool = False
+
+  index_retry_seconds: float = 30.0
+  index_retry_max_seconds: float = 3600.0
+  index_max_namespaces: int = 10000
+
+  bulk_chunk_size: int = 500
+  bulk_max_items: int = 10000
+  bulk_max_bytes: int = 256 * 1024 * 1024
+
+  export_batch_size: int = 1000
+  export_max_batch_size: int = 10000
+  export_gzip_level: int = 6
+
+  import_batch_size: int = 1000
+  import_image_workers: int = 4
+  import_max_bytes: int = 2 * 1024 * 1024 * 1024
+
+  upload_max_bytes: int = 10 * 1024 * 1024
+  upload_chunk_size: int = 1024 * 1024
+
+  image_cache_dir: str = "cache/images"
+  image_cache_max_bytes: int = 512 * 1024 * 1024
+
+  image_pool_workers: int = 2
+  image_pool_max_pending: int = 32
+  image_pool_timeout_seconds: float = 10.0
+
+  image_variant_widths: list[int] = [320, 640, 960, 1280, 1920]
+  image_variant_timeout_seconds: float = 120.0
+  image_variant_retry_seconds: float = 600.0
+
   model_config = SettingsConfigDict(env_file=".env")
 
 all_config = Settings()
@@ -45,6 +116,77 @@ JWT_ALGORITHM = all_config.jwt_algorithm
 
 FERNET_KEY = all_config.fernet_key
 
+LOG_LEVEL = all_config.log_level
+LOG_FORMAT = all_config.log_format
+LOG_LEVELS = all_config.log_levels
+LOG_SAMPLE_RATES = all_config.log_sample_rates
+LOG_QUEUE_SIZE = all_config.log_queue_size
+LOG_ROTATE_MAX_BYTES = all_config.log_rotate_max_bytes
+LOG_ROTATE_WHEN = all_config.log_rotate_when
+LOG_ROTATE_BACKUP_COUNT = all_config.log_rotate_backup_count
+
+BCRYPT_ROUNDS = all_config.bcrypt_rounds
+PASSWORD_HASH_TARGET_MS = all_config.password_hash_target_ms
+PASSWORD_POOL_WORKERS = all_config.password_pool_workers
+PASSWORD_POOL_MAX_PENDING = all_config.password_pool_max_pending
+PASSWORD_POOL_TIMEOUT_SECONDS = all_config.password_pool_timeout_seconds
+
+TOKEN_CACHE_MAX_SIZE = all_config.token_cache_max_size
+
+USER_CACHE_TTL_SECONDS = all_config.user_cache_ttl_seconds
+USER_CACHE_MAX_SIZE = all_config.user_cache_max_size
+
+SEARCH_CACHE_TTL_SECONDS = all_config.search_cache_ttl_seconds
+SEARCH_CACHE_MAX_SIZE = all_config.search_cache_max_size
+SEARCH_SNIPPET_LENGTH = all_config.search_snippet_length
+
+FACET_CACHE_TTL_SECONDS = all_config.facet_cache_ttl_seconds
+FACET_MAX_TAGS = all_config.facet_max_tags
+
+CONTENT_VERSION_TTL_SECONDS = all_config.content_version_ttl_seconds
+RESPONSE_CACHE_MAX_SIZE = all_config.response_cache_max_size
+RESPONSE_CACHE_MAX_BODY_BYTES = all_config.response_cache_max_body_bytes
+
+WS_SEND_QUEUE_SIZE = all_config.ws_send_queue_size
+WS_SEND_TIMEOUT_SECONDS = all_config.ws_send_timeout_seconds
+WS_SLOW_CONSUMER_POLICY = all_config.ws_slow_consumer_policy
+WS_MAX_ROOMS_PER_CLIENT = all_config.ws_max_rooms_per_client
+WS_PUBSUB_BACKEND = all_config.ws_pubsub_backend
+WS_PUBSUB_URL = all_config.ws_pubsub_url
+WS_PUBSUB_CHANNEL = all_config.ws_pubsub_channel
+
+BLOG_CHANGE_STREAM = all_config.blog_change_stream
+
+INDEX_RETRY_SECONDS = all_config.index_retry_seconds
+INDEX_RETRY_MAX_SECONDS = all_config.index_retry_max_seconds
+INDEX_MAX_NAMESPACES = all_config.index_max_namespaces
+
+BULK_CHUNK_SIZE = all_config.bulk_chunk_size
+BULK_MAX_ITEMS = all_config.bulk_max_items
+BULK_MAX_BYTES = all_config.bulk_max_bytes
+
+EXPORT_BATCH_SIZE = all_config.export_batch_size
+EXPORT_MAX_BATCH_SIZE = all_config.export_max_batch_size
+EXPORT_GZIP_LEVEL = all_config.export_gzip_level
+
+IMPORT_BATCH_SIZE = all_config.import_batch_size
+IMPORT_IMAGE_WORKERS = all_config.import_image_workers
+IMPORT_MAX_BYTES = all_config.import_max_bytes
+
+UPLOAD_MAX_BYTES = all_config.upload_max_bytes
+UPLOAD_CHUNK_SIZE = all_config.upload_chunk_size
+
+IMAGE_CACHE_DIR = all_config.image_cache_dir
+IMAGE_CACHE_MAX_BYTES = all_config.image_cache_max_bytes
+
+IMAGE_POOL_WORKERS = all_config.image_pool_workers
+IMAGE_POOL_MAX_PENDING = all_config.image_pool_max_pending
+IMAGE_POOL_TIMEOUT_SECONDS = all_config.image_pool_timeout_seconds
+
+IMAGE_VARIANT_WIDTHS = sorted(all_config.image_variant_widths)
+IMAGE_VARIANT_TIMEOUT_SECONDS = all_config.image_variant_timeout_seconds
+IMAGE_VARIANT_RETRY_SECONDS = all_config.image_variant_retry_seconds
+
 # Roles
 ROLE_USER = "user"
 ROLE_ADMIN = "admin"
@@ -1,20 +1,183 @@
 import os
+import json
+import queue
+import atexit
+import random
 import logging
+import logging.handlers
 
+from datetime import datetime, timezone
 
-def logging_config():
-  log_path = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'server.log'))
-
-  logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-      logging.FileHandler(log_path),
-      logging.StreamHandler()
-    ]
+from core.config import (
+  LOG_LEVEL, LOG_FORMAT, LOG_LEVELS, LOG_SAMPLE_RATES, LOG_QUEUE_SIZE,
+  LOG_ROTATE_MAX_BYTES, LOG_ROTATE_WHEN, LOG_ROTATE_BACKUP_COUNT,
+)
+
+# Loggers uvicorn sets up with handlers of their own, routed through the queue instead
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# Background writer of the log queue and the handler feeding it, set by logging_config
+_listener: logging.handlers.QueueListener = None
+_queue_handler: "DroppingQueueHandler" = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+  """
+  Queue handler that never blocks the caller: records are dropped when the queue is full,
+  and a warning with the number of dropped records is queued once there is room again.
+  """
+
+  def __init__(self, log_queue: queue.Queue):
+    super().__init__(log_queue)
+    self.dropped = 0
+    self.reported = 0
+
+  def enqueue(self, record: logging.LogRecord):
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+      return
+
+    if self.dropped > self.reported:
+      missed = self.dropped - self.reported
+      try:
+        self.queue.put_nowait(self.dropped_record(missed))
+        self.reported += missed
+      except queue.Full:
+        pass
+
+  @staticmethod
+  def dropped_record(count: int) -> logging.LogRecord:
+    return logging.LogRecord(
+      __name__, logging.WARNING, __file__, 0, f"Dropped {count} log records, the log queue was full", None, None
+    )
+
+
+class SamplingFilter(logging.Filter):
+  """
+  Keeps only a fraction of the records below WARNING of high volume loggers. Rates are
+  given by logger name and apply to its children, the most specific name wins. Attached
+  to the queue handler, it sees the records of every logger, uvicorn.access included.
+  """
+
+  def __init__(self, rates: dict[str, float]):
+    super().__init__()
+    self.rates = rates
+    self._rate_by_logger: dict[str, float] = {}
+
+  def _rate(self, name: str) -> float:
+    rate = self._rate_by_logger.get(name)
+    if rate is None:
+      rate = 1.0
+      parts = name.split(".")
+      for end in range(len(parts), 0, -1):
+        prefix = ".".join(parts[:end])
+        if prefix in self.rates:
+          rate = self.rates[prefix]
+          break
+      self._rate_by_logger[name] = rate
+    return rate
+
+  def filter(self, record: logging.LogRecord) -> bool:
+    if record.levelno >= logging.WARNING:
+      return True
+    rate = self._rate(record.name)
+    return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+  """
+  One JSON object per line.
+  """
+
+  def format(self, record: logging.LogRecord) -> str:
+    data = {
+      "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage(),
+    }
+    if record.exc_info:
+      data["exc_info"] = self.formatException(record.exc_info)
+    return json.dumps(data, default=str)
+
+
+def _build_file_handler(log_path: str) -> logging.Handler:
+  if LOG_ROTATE_WHEN:
+    return logging.handlers.TimedRotatingFileHandler(
+      log_path, when=LOG_ROTATE_WHEN, backupCount=LOG_ROTATE_BACKUP_COUNT, encoding="utf-8"
+    )
+
+  return logging.handlers.RotatingFileHandler(
+    log_path, maxBytes=LOG_ROTATE_MAX_BYTES, backupCount=LOG_ROTATE_BACKUP_COUNT, encoding="utf-8"
   )
 
 
+def logging_config():
+  """
+  Route every log record through a bounded queue to a background writer thread, which
+  owns the rotating log file and stderr. Callers only pay for an enqueue. The uvicorn
+  loggers lose their own handlers and go through the queue too.
+  """
+  global _listener, _queue_handler
+  if _listener is not None:
+    return
+
+  log_dir = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'logs'))
+  os.makedirs(log_dir, exist_ok=True)
+  log_path = os.path.join(log_dir, 'server.log')
+
+  if LOG_FORMAT == "json":
+    formatter = JsonFormatter()
+  else:
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+  handlers = [_build_file_handler(log_path), logging.StreamHandler()]
+  for handler in handlers:
+    handler.setFormatter(formatter)
+
+  log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+  _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+  _listener.start()
+  atexit.register(_stop_listener)
+
+  _queue_handler = DroppingQueueHandler(log_queue)
+  if LOG_SAMPLE_RATES:
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+  root = logging.getLogger()
+  root.handlers = [_queue_handler]
+  root.setLevel(LOG_LEVEL.upper())
+
+  for name in UVICORN_LOGGERS:
+    uvicorn_logger = logging.getLogger(name)
+    uvicorn_logger.handlers = []
+    uvicorn_logger.propagate = True
+
+  for name, level in LOG_LEVELS.items():
+    logging.getLogger(name).setLevel(level.upper())
+
+
+def _stop_listener():
+  # Records dropped since the last report would otherwise go unnoticed
+  if _queue_handler is not None and _queue_handler.dropped > _queue_handler.reported:
+    try:
+      _queue_handler.queue.put_nowait(_queue_handler.dropped_record(_queue_handler.dropped - _queue_handler.reported))
+    except queue.Full:
+      pass
+  _listener.stop()
+
+
+def log_queue_stats() -> dict:
+  """
+  Records waiting in the log queue, and dropped because it was full, since startup.
+  """
+  if _queue_handler is None:
+    return {"queued": 0, "dropped": 0}
+  return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
 def get_logger(name: str) -> logging.Logger:
   logger = logging.getLogger(name)
   return logger
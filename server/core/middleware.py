@@ -1,8 +1,12 @@
 # server/core/middleware.py
 
-from starlette.middleware.base import BaseHTTPMiddleware
+import hashlib
+import re
+import time
+
 from starlette.requests import Request
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
 from jose import jwt, JWTError, ExpiredSignatureError
 from fastapi import status
 
@@ -10,12 +14,57 @@ from core.security import decrypt_access_token, verify_access_token
 from core.config import (
   KEY_ACCESS_TOKEN, INVALID_ACCESS_TOKEN_ERROR_CODE,
   EXPIRED_ACCESS_TOKEN_ERROR_CODE, BAD_REQUEST_ERROR_CODE, KEY_REFRESH_TOKEN,
+  TOKEN_CACHE_MAX_SIZE, UPLOAD_MAX_BYTES, IMPORT_MAX_BYTES, BULK_MAX_BYTES,
 )
+from utils.cache import TTLCache
 
 from core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Paths served without looking at the credentials: static files and blog images
+PUBLIC_PATH_PATTERN = re.compile(r"^/(static/|[^/]+/images/)")
+
+# Room left for the other form fields of an upload request
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Imports upload a whole namespace, they get IMPORT_MAX_BYTES instead of the upload limit
+IMPORT_PATH_PATTERN = re.compile(r"^/api/v1/[^/]+/import/")
+
+# Bulk writes carry up to BULK_MAX_ITEMS documents, they get BULK_MAX_BYTES instead of the upload limit
+BULK_PATH_PATTERN = re.compile(r"^/api/v1/[^/]+/[^/]+/bulk$")
+
+# Verified JWT payloads by digest of the encrypted token, each entry expires with its token
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_MAX_SIZE, ttl=0)
+
+
+def get_jwt_payload(encrypted_token: str) -> dict:
+  """
+  Decrypt and verify an access token, memoized until the token expires.
+
+  Args:
+      encrypted_token (str): The Fernet encrypted access token sent by the client.
+
+  Returns:
+      dict: The JWT payload.
+
+  Raises:
+      JWTError: If the token is invalid or expired.
+  """
+  token_digest = hashlib.sha256(encrypted_token.encode()).digest()
+  payload = _token_cache.get(token_digest)
+  if payload is not None:
+    return payload
+
+  access_token = decrypt_access_token(encrypted_token)
+  payload = verify_access_token(access_token)
+
+  ttl = payload.get("exp", 0) - time.time()
+  if ttl > 0:
+    _token_cache.set(token_digest, payload, ttl=ttl)
+
+  return payload
+
 
 def process_response(request) -> Request:
   # Auth by access token bearer
@@ -23,43 +72,84 @@ def process_response(request) -> Request:
   # Auth by cookie
   encrypt_access_token_raw = request.cookies.get(KEY_ACCESS_TOKEN)
 
-  access_token = None
   payload = None
 
-  logger.info(auth_header)
   if auth_header:
     scheme, access_token_raw = auth_header.split()
-    logger.info(scheme)
-    logger.info(access_token_raw)
     if scheme.lower() != "bearer":
       raise ValueError("Invalid scheme")
     if not access_token_raw:
       raise ValueError("Invalid access token")
-    access_token = decrypt_access_token(access_token_raw)
+    payload = get_jwt_payload(access_token_raw)
   elif encrypt_access_token_raw:
-    access_token = decrypt_access_token(encrypt_access_token_raw)
-
-  if access_token is not None:
-    payload = verify_access_token(access_token)
+    payload = get_jwt_payload(encrypt_access_token_raw)
 
-  logger.info(access_token)
-  logger.info(payload)
   request.state.jwt_payload = payload
 
   return request
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-  async def dispatch(self, request: Request, call_next):
+class AuthMiddleware:
+  """
+  Pure ASGI middleware that puts the verified JWT payload in `request.state.jwt_payload`.
+  Unlike BaseHTTPMiddleware it does not wrap the response body, and public paths skip it.
+  """
 
+  def __init__(self, app: ASGIApp):
+    self.app = app
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] != "http" or PUBLIC_PATH_PATTERN.match(scope["path"]):
+      await self.app(scope, receive, send)
+      return
+
+    request = Request(scope)
     try:
       process_response(request)
     except (ValueError, ExpiredSignatureError) as e:
-      return JSONResponse({"error_code": EXPIRED_ACCESS_TOKEN_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_401_UNAUTHORIZED)
+      response = JSONResponse({"error_code": EXPIRED_ACCESS_TOKEN_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_401_UNAUTHORIZED)
     except (ValueError, JWTError) as e:
-      return JSONResponse({"error_code": INVALID_ACCESS_TOKEN_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_401_UNAUTHORIZED)
+      response = JSONResponse({"error_code": INVALID_ACCESS_TOKEN_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_401_UNAUTHORIZED)
     except Exception as e:
-      return JSONResponse({"error_code": BAD_REQUEST_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
-
-    return await call_next(request)
-
+      response = JSONResponse({"error_code": BAD_REQUEST_ERROR_CODE, "error": str(e)}, status_code=status.HTTP_400_BAD_REQUEST)
+    else:
+      await self.app(scope, receive, send)
+      return
+
+    await response(scope, receive, send)
+
+
+class BodySizeLimitMiddleware:
+  """
+  Pure ASGI middleware that rejects requests declaring a body larger than their path
+  allows, an upload, an import or a bulk write, with 413 before the body is read.
+  """
+
+  def __init__(
+      self,
+      app: ASGIApp,
+      max_bytes: int = UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES,
+      import_max_bytes: int = IMPORT_MAX_BYTES,
+      bulk_max_bytes: int = BULK_MAX_BYTES
+  ):
+    self.app = app
+    self.max_bytes = max_bytes
+    self.import_max_bytes = import_max_bytes
+    self.bulk_max_bytes = bulk_max_bytes
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send):
+    if scope["type"] == "http":
+      max_bytes = self.max_bytes
+      if IMPORT_PATH_PATTERN.match(scope["path"]):
+        max_bytes = self.import_max_bytes
+      elif BULK_PATH_PATTERN.match(scope["path"]):
+        max_bytes = self.bulk_max_bytes
+      for name, value in scope["headers"]:
+        if name == b"content-length":
+          if value.isdigit() and int(value) > max_bytes:
+            response = JSONResponse({"detail": "Request body is too large"}, status_code=status.HTTP_413_CONTENT_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+          break
+
+    await self.app(scope, receive, send)
@@ -1,10 +1,18 @@
+import math
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional
 from jose import jwt
 from passlib.context import CryptContext
 from cryptography.fernet import Fernet
 
 from core.config import FERNET_KEY, JWT_SECRET_KEY, JWT_ALGORITHM, JWT_ACCESS_TOKEN_EXPIRE_MINUTES
 from core.config import JWT_REFRESH_SECRET_KEY, JWT_REFRESH_TOKEN_EXPIRE_MINUTES
+from core.config import (BCRYPT_ROUNDS, PASSWORD_HASH_TARGET_MS, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_PENDING,
+                         PASSWORD_POOL_TIMEOUT_SECONDS)
+from utils.executor import BoundedExecutor
 
 from core.logger import get_logger
 
@@ -12,11 +20,95 @@ logger = get_logger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Cost of new hashes, see configure_bcrypt_rounds
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+bcrypt_rounds = 12
+
+# bcrypt releases the GIL, so threads are enough. Separate from the shared AnyIO threads
+# so a burst of logins cannot stall the other endpoints.
+password_pool = BoundedExecutor(
+  "Password",
+  lambda: ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="bcrypt"),
+  PASSWORD_POOL_MAX_PENDING,
+  PASSWORD_POOL_TIMEOUT_SECONDS,
+)
+
+# Reuse one Fernet instead of decoding the key on every call
+fernet = Fernet(FERNET_KEY)
+
 
 def verify_password(plain_password, hashed_password):
   return pwd_context.verify(plain_password, hashed_password)
 
 
+def get_bcrypt_rounds(hashed_password: str) -> int:
+  # "$2b$12$<salt+hash>"
+  return int(hashed_password.split("$")[2])
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+  """
+  Verify a password and rehash it when the stored hash is cheaper than the current cost.
+
+  Args:
+      plain_password (str): The password to check.
+      hashed_password (str): The stored hash.
+
+  Returns:
+      tuple[bool, Optional[str]]: Whether the password matches, and the new hash to store if any.
+  """
+  if not verify_password(plain_password, hashed_password):
+    return False, None
+
+  # Only ever raise the cost, workers calibrated slightly differently must not flip-flop hashes
+  if get_bcrypt_rounds(hashed_password) < bcrypt_rounds:
+    return True, hash_password(plain_password)
+
+  return True, None
+
+
+def calibrate_bcrypt_rounds(target_ms: float) -> int:
+  """
+  Pick the highest bcrypt cost whose hash takes at most `target_ms` on this machine.
+  Each extra round doubles the work, so one cheap sample is enough to extrapolate.
+
+  Args:
+      target_ms (float): The wanted hashing latency, in milliseconds.
+
+  Returns:
+      int: The cost, clamped to [BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS].
+  """
+  sample_rounds = 8
+  handler = pwd_context.handler("bcrypt").using(rounds=sample_rounds)
+
+  sample_ms = math.inf
+  for _ in range(3):
+    start = time.perf_counter()
+    handler.hash("calibration")
+    sample_ms = min(sample_ms, (time.perf_counter() - start) * 1000)
+
+  rounds = sample_rounds + math.floor(math.log2(target_ms / sample_ms))
+  return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+
+
+def configure_bcrypt_rounds() -> int:
+  """
+  Set the cost of new hashes from BCRYPT_ROUNDS, or calibrate it against
+  PASSWORD_HASH_TARGET_MS when BCRYPT_ROUNDS is 0. Call once at startup.
+
+  Returns:
+      int: The cost in use.
+  """
+  global bcrypt_rounds
+
+  bcrypt_rounds = BCRYPT_ROUNDS or calibrate_bcrypt_rounds(PASSWORD_HASH_TARGET_MS)
+  pwd_context.update(bcrypt__rounds=bcrypt_rounds)
+
+  logger.info(f"bcrypt cost set to {bcrypt_rounds} rounds")
+  return bcrypt_rounds
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
   to_encode = data.copy()
   expire = datetime.utcnow() + (expires_delta or timedelta(seconds=JWT_ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -54,16 +146,12 @@ def hash_password(password: str) -> str:
 
 
 def encrypt_access_token(access_token: str) -> str:
-  fernet = Fernet(FERNET_KEY)
-
   encrypted_token = fernet.encrypt(access_token.encode()).decode()
 
   return encrypted_token
 
 
 def decrypt_access_token(encrypted_token: str) -> str:
-  fernet = Fernet(FERNET_KEY)
-
   # Check encrypted_token is valid
   try:
     decrypted_token = fernet.decrypt(encrypted_token.encode()).decode()
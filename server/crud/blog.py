@@ -1,85 +1,289 @@
-import datetime
-
 from typing import List, Optional
-from pymongo.database import Database
-from pymongo.collection import Collection
-from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 
-from schemas.blog import BlogCreate, Blog
+from crud.repository import Repository
+from services.blog_events import publish_blog_event, publish_blog_events, BLOG_CREATED, BLOG_UPDATED, BLOG_DELETED
+from crud.content_version import get_content_version, bump_content_version
+from schemas.bulk import BulkItemResult
+from schemas.blog import BlogBase, BlogCreate, Blog, BlogSummary, BlogSearchResult, BlogFacets, BLOG_SUMMARY_FIELDS
+from utils.cache import TTLCache
 from utils.func import convert_object_id_of_item
+from utils.search import TEXT_SCORE, TEXT_SCORE_SORT, normalize_query, get_query_terms, highlight_snippet
+
+from core.config import BULK_CHUNK_SIZE, SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_MAX_SIZE, FACET_CACHE_TTL_SECONDS, FACET_MAX_TAGS
 
 from core.logger import get_logger
 
 logger = get_logger(__name__)
 
+BLOG_COLLECTION_NAME = "blogs"
 
-def get_blog_collection(db: Database) -> Collection:
-  return db.get_collection("blogs")
+blog_repository = Repository(BLOG_COLLECTION_NAME, Blog)
 
+# Result pages of recent searches by (namespace, normalized query, skip, limit)
+_search_cache = TTLCache(maxsize=SEARCH_CACHE_MAX_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
 
-def create_blog(db: Database, blog: BlogCreate) -> Blog:
-  collection = get_blog_collection(db)
+# Facet counts by namespace. The ttl bounds staleness from writes made by other workers
+_facet_cache = TTLCache(maxsize=1000, ttl=FACET_CACHE_TTL_SECONDS)
+
+
+def get_blog_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+  return blog_repository.collection(db)
+
+
+async def create_blog(db: AsyncIOMotorDatabase, blog: BlogCreate) -> Blog:
   blog_dict = blog.model_dump()
 
   del blog_dict['image']
 
-  now = datetime.datetime.now()
-  blog_dict["created_at"] = now
-  blog_dict["updated_at"] = now
+  created_blog = await blog_repository.insert(db, blog_dict)
+  await invalidate_blog_caches(db)
 
-  result = collection.insert_one(blog_dict)
+  publish_blog_event(db, BLOG_CREATED, created_blog.id, created_blog.model_dump())
+  return created_blog
 
-  created_blog_data = collection.find_one({"_id": result.inserted_id})
-  if created_blog_data:
-    created_blog_data = convert_object_id_of_item(created_blog_data)
 
-  return Blog(**created_blog_data)
+async def delete_blog(db: AsyncIOMotorDatabase, blog_id: str) -> bool:
+  deleted = await blog_repository.delete(db, blog_id)
 
-
-def delete_blog(db: Database, blog_id: str) -> bool:
-  collection = get_blog_collection(db)
-  result = collection.delete_one({"_id": ObjectId(blog_id)})
-  return result.deleted_count > 0
+  if deleted:
+    await invalidate_blog_caches(db)
+    publish_blog_event(db, BLOG_DELETED, blog_id)
+  return deleted
 
 
-def update_blog(db: Database, blog_id: str, blog: BlogCreate) -> Blog:
-  collection = get_blog_collection(db)
+async def update_blog(db: AsyncIOMotorDatabase, blog_id: str, blog: BlogCreate) -> Optional[Blog]:
   blog_dict = blog.model_dump()
 
   del blog_dict['image']
 
-  now = datetime.datetime.now()
-  blog_dict["updated_at"] = now
+  updated_blog = await blog_repository.update(db, blog_id, blog_dict)
 
-  result = collection.update_one({"_id": ObjectId(blog_id)}, {"$set": blog_dict})
+  if updated_blog is not None:
+    await invalidate_blog_caches(db)
+    publish_blog_event(db, BLOG_UPDATED, blog_id, updated_blog.model_dump())
+  return updated_blog
 
-  updated_blog_data = collection.find_one({"_id": ObjectId(blog_id)})
-  if updated_blog_data:
-    updated_blog_data = convert_object_id_of_item(updated_blog_data)
 
-  return Blog(**updated_blog_data)
+async def create_blogs(
+    db: AsyncIOMotorDatabase,
+    blogs: List[Optional[BlogBase]],
+    results: List[BulkItemResult],
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[dict]:
+  """
+  Insert many blogs with insert_many in chunks, see utils.bulk.insert_bulk. Their
+  image_url must already point to a stored image.
+  """
+  documents = [None if blog is None else blog.model_dump() for blog in blogs]
+  inserted = await blog_repository.insert_many(db, documents, results, ordered, chunk_size)
 
+  if inserted:
+    await invalidate_blog_caches(db)
+    publish_blog_events(db, [(BLOG_CREATED, blog_data["_id"], blog_data) for blog_data in inserted])
+
+  return inserted
+
+
+async def import_blogs(
+    db: AsyncIOMotorDatabase,
+    documents: List[Optional[dict]],
+    results: List[BulkItemResult],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[tuple[dict, Optional[dict]]]:
+  """
+  Write blogs that keep their _id and timestamps, such as an export, replacing the blogs
+  with the same _id, see utils.bulk.upsert_bulk. Their image_url must already point to
+  a stored image.
+
+  Returns:
+      List[tuple[dict, Optional[dict]]]: The written blogs, with the _id and image_url of
+      the blog each one replaced.
+  """
+  written = await blog_repository.upsert_many(db, documents, results, chunk_size, projection={"image_url": 1})
+
+  if written:
+    await invalidate_blog_caches(db)
+    publish_blog_events(db, [
+      (BLOG_CREATED if previous is None else BLOG_UPDATED, blog_data["_id"], blog_data) for blog_data, previous in written
+    ])
+
+  return written
+
+
+async def delete_blogs(db: AsyncIOMotorDatabase, blog_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> tuple[List[BulkItemResult], List[dict]]:
+  """
+  Delete many blogs by id, see utils.bulk.delete_bulk.
+
+  Returns:
+      tuple: The results, and the _id and image_url of the deleted blogs.
+  """
+  results, deleted = await blog_repository.delete_many(db, blog_ids, chunk_size, projection={"image_url": 1})
+
+  if deleted:
+    await invalidate_blog_caches(db)
+    publish_blog_events(db, [(BLOG_DELETED, blog_data["_id"], None) for blog_data in deleted])
+
+  return results, deleted
+
+
+async def get_blog(db: AsyncIOMotorDatabase, blog_id: str) -> Optional[Blog]:
+  return await blog_repository.get(db, blog_id)
+
+
+async def get_blog_document(db: AsyncIOMotorDatabase, blog_id: str) -> Optional[dict]:
+  return await blog_repository.get_document(db, blog_id)
+
+
+async def get_blogs(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Blog]:
+  return await blog_repository.find(db, skip, limit, cursor)
+
+
+async def get_blog_documents(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[dict]:
+  return await blog_repository.find_documents(db, skip, limit, cursor)
+
+
+def _summary_projection(fields: Optional[List[str]]) -> dict:
+  # created_at is always needed to build the next cursor
+  projection = {field: 1 for field in (fields or BLOG_SUMMARY_FIELDS)}
+  projection["created_at"] = 1
+  return projection
+
+
+async def get_blog_summaries(
+    db: AsyncIOMotorDatabase,
+    fields: Optional[List[str]] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[BlogSummary]:
+  """
+  Same listing as get_blogs, but only the requested summary fields are read from Mongo.
+
+  Args:
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+      fields (Optional[List[str]]): Subset of BLOG_SUMMARY_FIELDS, all of them if None.
+      skip (int): The number of blogs to skip.
+      limit (int): The maximum number of blogs to return.
+      cursor (Optional[str]): The cursor of the previous page.
+
+  Returns:
+      List[BlogSummary]: The blog summaries.
+  """
+  return await blog_repository.find(db, skip, limit, cursor, _summary_projection(fields), model=BlogSummary)
+
+
+async def get_blog_summary_documents(
+    db: AsyncIOMotorDatabase,
+    fields: Optional[List[str]] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[dict]:
+  """
+  Same listing as get_blog_summaries, as documents shaped like BlogSummary.
+  """
+  return await blog_repository.find_documents(db, skip, limit, cursor, _summary_projection(fields), model=BlogSummary)
+
+
+async def search_blogs(db: AsyncIOMotorDatabase, query: str, skip: int = 0, limit: int = 20) -> List[BlogSearchResult]:
+  """
+  Full-text search over title, tags and content, best matches first. Pages of popular
+  queries are served from an in-process cache until a blog is written.
+
+  Args:
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+      query (str): The search string, in $text syntax: words, "quoted phrases" and -excluded words.
+      skip (int): The number of results to skip.
+      limit (int): The maximum number of results to return.
+
+  Returns:
+      List[BlogSearchResult]: The matching blog summaries with their score and highlight.
+  """
+  cache_key = (db.name, normalize_query(query), skip, limit)
+  result = _search_cache.get(cache_key)
+  if result is not None:
+    return result
 
-def get_blog(db: Database, blog_id: str) -> Optional[Blog]:
-  collection = get_blog_collection(db)
-  try:
-    blog_data = collection.find_one({"_id": ObjectId(blog_id)})
-    if blog_data:
-      blog_data = convert_object_id_of_item(blog_data)
-      return Blog(**blog_data)
-    return None
-  except Exception as e:
-    print(f"Error fetching blog by id: {e}")
-    return None
-
-
-def get_blogs(db: Database, skip: int = 0, limit: int = 100) -> List[Blog]:
   collection = get_blog_collection(db)
-  blogs_cursor = collection.find().skip(skip).limit(limit)
 
+  # content is only read to build the highlight
+  projection = {field: 1 for field in BLOG_SUMMARY_FIELDS}
+  projection["content"] = 1
+  projection["score"] = TEXT_SCORE
+
+  blogs_cursor = collection.find({"$text": {"$search": query}}, projection).sort(TEXT_SCORE_SORT).skip(skip).limit(limit)
+
+  terms = get_query_terms(query)
   result = []
-  for blog_data in blogs_cursor:
+  async for blog_data in blogs_cursor:
     blog_data = convert_object_id_of_item(blog_data)
-    result.append(Blog(**blog_data))
+    blog_data["highlight"] = highlight_snippet(blog_data.pop("content", ""), terms)
+    result.append(BlogSearchResult(**blog_data))
 
+  _search_cache.set(cache_key, result)
   return result
+
+
+async def get_blog_facets(db: AsyncIOMotorDatabase, top_tags: int = 20) -> BlogFacets:
+  """
+  Category counts and the most used tags, from one aggregation over the blogs. The
+  result is cached per namespace until a blog is written.
+
+  Args:
+      db (AsyncIOMotorDatabase): The MongoDB database instance.
+      top_tags (int): The number of tags to return, at most FACET_MAX_TAGS.
+
+  Returns:
+      BlogFacets: The category and tag counts, most used first.
+  """
+  facets = _facet_cache.get(db.name)
+  if facets is None:
+    collection = get_blog_collection(db)
+    pipeline = [
+      {"$facet": {
+        "categories": [
+          {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+          {"$sort": {"count": -1, "_id": 1}},
+        ],
+        "tags": [
+          {"$unwind": "$tags"},
+          {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+          {"$sort": {"count": -1, "_id": 1}},
+          {"$limit": FACET_MAX_TAGS},
+        ],
+      }},
+    ]
+
+    result = await collection.aggregate(pipeline).to_list(length=1)
+    buckets = result[0] if result else {}
+    facets = BlogFacets(
+      categories=[{"value": bucket["_id"], "count": bucket["count"]} for bucket in buckets.get("categories", [])],
+      tags=[{"value": bucket["_id"], "count": bucket["count"]} for bucket in buckets.get("tags", [])],
+    )
+    _facet_cache.set(db.name, facets)
+
+  return BlogFacets(categories=facets.categories, tags=facets.tags[:top_tags])
+
+
+async def get_blogs_version(db: AsyncIOMotorDatabase) -> int:
+  """
+  Version of the blogs of a namespace, bumped by every blog write. Responses built from
+  the same version are identical, see services.response_cache.
+  """
+  return await get_content_version(db, BLOG_COLLECTION_NAME)
+
+
+async def invalidate_blog_caches(db: AsyncIOMotorDatabase):
+  """
+  Bump the blogs content version and drop the cached search results and facet counts
+  after a blog write. Writes are rare next to reads, so the whole search cache is
+  cleared rather than tracking which pages a blog appears in.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database that was written.
+  """
+  await bump_content_version(db, BLOG_COLLECTION_NAME)
+  _search_cache.clear()
+  _facet_cache.pop(db.name)
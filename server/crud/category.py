@@ -1,79 +1,78 @@
-import datetime
-
 from typing import List, Optional
-from pymongo.database import Database
-from pymongo.collection import Collection
-from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 
+from crud.repository import Repository
+from schemas.bulk import BulkItemResult
 from schemas.category import CategoryCreate, Category
-from utils.func import convert_object_id_of_item
+
+from core.config import BULK_CHUNK_SIZE
 
 from core.logger import get_logger
 
 logger = get_logger(__name__)
 
-def get_category_collection(db: Database) -> Collection:
-  return db.get_collection("categories")
+category_repository = Repository("categories", Category)
+
 
+def get_category_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+  return category_repository.collection(db)
 
-def create_category(db: Database, category: CategoryCreate) -> Category:
-  collection = get_category_collection(db)
+
+async def create_category(db: AsyncIOMotorDatabase, category: CategoryCreate) -> Category:
   category_dict = category.model_dump()
 
   logger.info(category_dict)
 
-  now = datetime.datetime.now()
-  category_dict["created_at"] = now
-  category_dict["updated_at"] = now
+  return await category_repository.insert(db, category_dict)
 
-  result = collection.insert_one(category_dict)
+async def delete_category(db: AsyncIOMotorDatabase, category_id: str) -> bool:
+  return await category_repository.delete(db, category_id)
 
-  created_category_data = collection.find_one({"_id": result.inserted_id})
-  if created_category_data:
-    created_category_data = convert_object_id_of_item(created_category_data)
+async def update_category(db: AsyncIOMotorDatabase, category_id: str, category: CategoryCreate) -> Optional[Category]:
+  return await category_repository.update(db, category_id, category.model_dump())
 
-  return Category(**created_category_data)
+async def get_category(db: AsyncIOMotorDatabase, category_id: str) -> Optional[Category]:
+  return await category_repository.get(db, category_id)
 
-def delete_category(db: Database, category_id: str) -> bool:
-  collection = get_category_collection(db)
-  result = collection.delete_one({"_id": ObjectId(category_id)})
-  return result.deleted_count > 0
 
-def update_category(db: Database, category_id: str, category: CategoryCreate) -> Category:
-  collection = get_category_collection(db)
-  category_dict = category.model_dump()
+async def get_category_document(db: AsyncIOMotorDatabase, category_id: str) -> Optional[dict]:
+  return await category_repository.get_document(db, category_id)
+
 
-  now = datetime.datetime.now()
-  category_dict["updated_at"] = now
+async def get_categories(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Category]:
+  return await category_repository.find(db, skip, limit, cursor)
 
-  result = collection.update_one({"_id": ObjectId(category_id)}, {"$set": category_dict})
 
-  updated_category_data = collection.find_one({"_id": ObjectId(category_id)})
-  if updated_category_data:
-    updated_category_data = convert_object_id_of_item(updated_category_data)
+async def get_category_documents(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[dict]:
+  return await category_repository.find_documents(db, skip, limit, cursor)
 
-  return Category(**updated_category_data)
 
-def get_category(db: Database, category_id: str) -> Optional[Category]:
-  collection = get_category_collection(db)
-  try:
-    category_data = collection.find_one({"_id": ObjectId(category_id)})
-    if category_data:
-      category_data = convert_object_id_of_item(category_data)
-      return Category(**category_data)
-    return None
-  except Exception as e:
-    print(f"Error fetching category by id: {e}")
-    return None
+async def create_categories(
+    db: AsyncIOMotorDatabase,
+    categories: List[Optional[CategoryCreate]],
+    results: List[BulkItemResult],
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[dict]:
+  """
+  Insert many categories with insert_many in chunks, see utils.bulk.insert_bulk.
+  """
+  documents = [None if category is None else category.model_dump() for category in categories]
+  return await category_repository.insert_many(db, documents, results, ordered, chunk_size)
 
 
-def get_categories(db: Database, skip: int = 0, limit: int = 100) -> List[Category]:
-  collection = get_category_collection(db)
-  categories_cursor = collection.find().skip(skip).limit(limit)
+async def import_categories(
+    db: AsyncIOMotorDatabase,
+    documents: List[Optional[dict]],
+    results: List[BulkItemResult],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[tuple[dict, Optional[dict]]]:
+  """
+  Write categories that keep their _id and timestamps, see utils.bulk.upsert_bulk.
+  """
+  return await category_repository.upsert_many(db, documents, results, chunk_size)
 
-  result = []
-  for category_data in categories_cursor:
-    category_data = convert_object_id_of_item(category_data)
-    result.append(Category(**category_data))
 
-  return result
+async def delete_categories(db: AsyncIOMotorDatabase, category_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkItemResult]:
+  results, _ = await category_repository.delete_many(db, category_ids, chunk_size)
+  return results
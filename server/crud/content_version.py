@@ -0,0 +1,58 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+from utils.cache import TTLCache
+
+from core.config import CONTENT_VERSION_TTL_SECONDS
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Last known version by (namespace, collection name). Writes of this worker update it
+# right away, the ttl bounds how long writes of other workers go unnoticed.
+_version_cache = TTLCache(maxsize=10000, ttl=CONTENT_VERSION_TTL_SECONDS)
+
+
+def get_content_version_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+  return db.get_collection("content_versions")
+
+
+async def get_content_version(db: AsyncIOMotorDatabase, name: str) -> int:
+  """
+  Current version of a collection's content, it changes with every write.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      name (str): The collection name.
+
+  Returns:
+      int: The version, 0 if the collection was never written since versions exist.
+  """
+  version = _version_cache.get((db.name, name))
+  if version is None:
+    version_data = await get_content_version_collection(db).find_one({"_id": name})
+    version = version_data["version"] if version_data else 0
+    _version_cache.set((db.name, name), version)
+
+  return version
+
+
+async def bump_content_version(db: AsyncIOMotorDatabase, name: str) -> int:
+  """
+  Record a write to a collection.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      name (str): The collection name.
+
+  Returns:
+      int: The new version.
+  """
+  version_data = await get_content_version_collection(db).find_one_and_update(
+    {"_id": name},
+    {"$inc": {"version": 1}},
+    upsert=True,
+    return_document=ReturnDocument.AFTER,
+  )
+  _version_cache.set((db.name, name), version_data["version"])
+  return version_data["version"]
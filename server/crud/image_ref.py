@@ -0,0 +1,69 @@
+import datetime
+
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import ReturnDocument
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def get_image_ref_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+  return db.get_collection("image_refs")
+
+
+async def acquire_image_ref(db: AsyncIOMotorDatabase, filename: str, size: int, count: int = 1) -> int:
+  """
+  Count more references to a stored image, creating its entry on first use.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      filename (str): The content addressed file name of the image.
+      size (int): The size of the image in bytes.
+      count (int): The number of references to add. Defaults to 1.
+
+  Returns:
+      int: The number of references after the increment.
+  """
+  collection = get_image_ref_collection(db)
+  now = datetime.datetime.now()
+
+  image_ref = await collection.find_one_and_update(
+    {"_id": filename},
+    {"$inc": {"refs": count}, "$set": {"updated_at": now}, "$setOnInsert": {"size": size, "created_at": now}},
+    upsert=True,
+    return_document=ReturnDocument.AFTER,
+  )
+  return image_ref["refs"]
+
+
+async def release_image_ref(db: AsyncIOMotorDatabase, filename: str, count: int = 1) -> bool:
+  """
+  Drop references to a stored image, and its entry with the last one.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      filename (str): The content addressed file name of the image.
+      count (int): The number of references to drop. Defaults to 1.
+
+  Returns:
+      bool: True if that was the last reference and the image file can be removed.
+  """
+  collection = get_image_ref_collection(db)
+
+  image_ref = await collection.find_one_and_update(
+    {"_id": filename, "refs": {"$gt": 0}},
+    {"$inc": {"refs": -count}, "$set": {"updated_at": datetime.datetime.now()}},
+    return_document=ReturnDocument.AFTER,
+  )
+  if image_ref is None or image_ref["refs"] > 0:
+    return False
+
+  # Only the caller that deletes the entry removes the file, a concurrent upload may revive it
+  result = await collection.delete_one({"_id": filename, "refs": {"$lte": 0}})
+  return result.deleted_count > 0
+
+
+async def has_image_ref(db: AsyncIOMotorDatabase, filename: str) -> bool:
+  collection = get_image_ref_collection(db)
+  return await collection.count_documents({"_id": filename, "refs": {"$gt": 0}}, limit=1) > 0
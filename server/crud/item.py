@@ -1,50 +1,56 @@
-import datetime
-
 from typing import List, Optional
-from pymongo.database import Database
-from pymongo.collection import Collection
-from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 
+from crud.repository import Repository
+from schemas.bulk import BulkItemResult
 from schemas.item import ItemCreate, Item
-from utils.func import convert_object_id_to_str
-
-def get_item_collection(db: Database) -> Collection:
-    return db.get_collection("items")
-
-def create_item(db: Database, item: ItemCreate) -> Item:
-    collection = get_item_collection(db)
-    item_dict = item.model_dump()
-
-    now = datetime.datetime.now()
-    item_dict["created_at"] = now
-    item_dict["updated_at"] = now
-
-    result = collection.insert_one(item_dict)
-
-    created_item_data = collection.find_one({"_id": result.inserted_id})
-    created_item_data['_id'] = convert_object_id_to_str(created_item_data['_id'])
-
-    return Item(**created_item_data)
-
-def get_item(db: Database, item_id: str) -> Optional[Item]:
-    collection = get_item_collection(db)
-    try:
-        item_data = collection.find_one({"_id": ObjectId(item_id)})
-        if item_data:
-            item_data['_id'] = convert_object_id_to_str(item_data['_id'])
-            return Item(**item_data)
-        return None
-    except Exception as e:
-        print(f"Error fetching item by id: {e}")
-        return None
-
-def get_items(db: Database, skip: int = 0, limit: int = 100) -> List[Item]:
-    collection = get_item_collection(db)
-    items_cursor = collection.find().skip(skip).limit(limit)
-    
-    result = []
-    for item_data in items_cursor:
-        item_data['_id'] = convert_object_id_to_str(item_data['_id'])
-        result.append(Item(**item_data))
-    
-    return result
\ No newline at end of file
+
+from core.config import BULK_CHUNK_SIZE
+
+item_repository = Repository("items", Item)
+
+def get_item_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    return item_repository.collection(db)
+
+async def create_item(db: AsyncIOMotorDatabase, item: ItemCreate) -> Item:
+    return await item_repository.insert(db, item.model_dump())
+
+async def get_item(db: AsyncIOMotorDatabase, item_id: str) -> Optional[Item]:
+    return await item_repository.get(db, item_id)
+
+async def get_item_document(db: AsyncIOMotorDatabase, item_id: str) -> Optional[dict]:
+    return await item_repository.get_document(db, item_id)
+
+async def get_items(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Item]:
+    return await item_repository.find(db, skip, limit, cursor)
+
+async def get_item_documents(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[dict]:
+    return await item_repository.find_documents(db, skip, limit, cursor)
+
+async def create_items(
+    db: AsyncIOMotorDatabase,
+    items: List[Optional[ItemCreate]],
+    results: List[BulkItemResult],
+    ordered: bool = True,
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[dict]:
+    """
+    Insert many items with insert_many in chunks, see utils.bulk.insert_bulk.
+    """
+    documents = [None if item is None else item.model_dump() for item in items]
+    return await item_repository.insert_many(db, documents, results, ordered, chunk_size)
+
+async def import_items(
+    db: AsyncIOMotorDatabase,
+    documents: List[Optional[dict]],
+    results: List[BulkItemResult],
+    chunk_size: int = BULK_CHUNK_SIZE
+) -> List[tuple[dict, Optional[dict]]]:
+    """
+    Write items that keep their _id and timestamps, see utils.bulk.upsert_bulk.
+    """
+    return await item_repository.upsert_many(db, documents, results, chunk_size)
+
+async def delete_items(db: AsyncIOMotorDatabase, item_ids: List[str], chunk_size: int = BULK_CHUNK_SIZE) -> List[BulkItemResult]:
+    results, _ = await item_repository.delete_many(db, item_ids, chunk_size)
+    return results
@@ -0,0 +1,265 @@
+import datetime
+import functools
+import types
+
+from typing import Any, Generic, List, Optional, Type, TypeVar, Union, get_args, get_origin
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pydantic import BaseModel
+from pymongo import ReturnDocument
+
+from schemas.bulk import BulkItemResult
+from utils.bulk import insert_bulk, upsert_bulk, delete_bulk
+from utils.func import convert_object_id_of_item
+from utils.pagination import KEYSET_SORT, keyset_filter
+
+from core.config import BULK_CHUNK_SIZE
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def to_object_id(_id: str) -> Optional[ObjectId]:
+  try:
+    return ObjectId(_id)
+  except (InvalidId, TypeError):
+    return None
+
+
+def _field_types(annotation) -> Optional[tuple]:
+  # Python types a field accepts as is, None when the annotation is too loose to check
+  if annotation is Any:
+    return None
+  if get_origin(annotation) in (Union, types.UnionType):
+    accepted = [_field_types(arg) for arg in get_args(annotation)]
+    return None if None in accepted else tuple(t for group in accepted for t in group)
+  if annotation is type(None):
+    return (type(None),)
+  origin = get_origin(annotation) or annotation
+  if not isinstance(origin, type):
+    return None
+  return (int, float) if origin is float else (origin,)
+
+
+@functools.lru_cache(maxsize=None)
+def document_template(model: Type[BaseModel]) -> tuple[dict, frozenset, dict]:
+  """
+  The fields of `model` under their alias: their default value, the keys that are
+  required, and the Python types a stored value may have to be sent without
+  validation. Mutable defaults are shared, documents built from the template are only
+  meant to be serialized.
+  """
+  defaults, required, field_types = {}, set(), {}
+  for name, field in model.model_fields.items():
+    key = field.alias or name
+    if field.is_required():
+      required.add(key)
+      defaults[key] = None
+    else:
+      defaults[key] = field.get_default(call_default_factory=True)
+
+    accepted = _field_types(field.annotation)
+    if accepted is not None:
+      field_types[key] = accepted + (() if field.is_required() or defaults[key] is not None else (type(None),))
+  return defaults, frozenset(required), field_types
+
+
+class Repository(Generic[ModelT]):
+  """
+  Typed access to one collection of a namespace database. Writes build their result
+  from the written document, or get it back from find_one_and_update, instead of
+  reading it again.
+  """
+
+  def __init__(self, collection_name: str, model: Type[ModelT]):
+    self.collection_name = collection_name
+    self.model = model
+
+  def collection(self, db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+    return db.get_collection(self.collection_name)
+
+  def to_model(self, data: dict, model: Optional[Type[BaseModel]] = None) -> BaseModel:
+    return (model or self.model)(**convert_object_id_of_item(data))
+
+  def to_document(self, data: dict, model: Optional[Type[BaseModel]] = None) -> dict:
+    """
+    Trusted read path: shape a raw document like the model would dump it, without
+    validating it. Missing fields get their default and unknown fields are dropped,
+    _id stays an ObjectId, see utils.responses.MongoJSONResponse. A document missing a
+    required field, or with a value the model would have to coerce, goes through the
+    model instead.
+    """
+    defaults, required, field_types = document_template(model or self.model)
+    if not required.issubset(data.keys()):
+      return self.to_model(data, model).model_dump(by_alias=True)
+
+    document = {key: data.get(key, default) for key, default in defaults.items()}
+    for key, accepted in field_types.items():
+      if key != "_id" and not isinstance(document[key], accepted):
+        return self.to_model(data, model).model_dump(by_alias=True)
+    return document
+
+  async def insert(self, db: AsyncIOMotorDatabase, document: dict) -> ModelT:
+    """
+    Insert a document stamped with created_at/updated_at.
+
+    Returns:
+        ModelT: The inserted document.
+    """
+    now = datetime.datetime.now()
+    document = {**document, "created_at": now, "updated_at": now}
+
+    # insert_one sets the generated _id on the document
+    await self.collection(db).insert_one(document)
+    return self.to_model(document)
+
+  async def update(self, db: AsyncIOMotorDatabase, _id: str, fields: dict) -> Optional[ModelT]:
+    """
+    Set fields of a document and stamp updated_at.
+
+    Returns:
+        Optional[ModelT]: The document after the update, None if it does not exist.
+    """
+    object_id = to_object_id(_id)
+    if object_id is None:
+      return None
+
+    data = await self.collection(db).find_one_and_update(
+      {"_id": object_id},
+      {"$set": {**fields, "updated_at": datetime.datetime.now()}},
+      return_document=ReturnDocument.AFTER,
+    )
+    return self.to_model(data) if data else None
+
+  async def set_fields(self, db: AsyncIOMotorDatabase, _id: str, fields: dict) -> bool:
+    """
+    Set fields of a document when the caller does not need it back.
+
+    Returns:
+        bool: True if the document exists.
+    """
+    object_id = to_object_id(_id)
+    if object_id is None:
+      return False
+
+    result = await self.collection(db).update_one({"_id": object_id}, {"$set": fields})
+    return result.matched_count > 0
+
+  async def delete(self, db: AsyncIOMotorDatabase, _id: str) -> bool:
+    object_id = to_object_id(_id)
+    if object_id is None:
+      return False
+
+    result = await self.collection(db).delete_one({"_id": object_id})
+    return result.deleted_count > 0
+
+  async def get(self, db: AsyncIOMotorDatabase, _id: str) -> Optional[ModelT]:
+    object_id = to_object_id(_id)
+    if object_id is None:
+      return None
+
+    data = await self.collection(db).find_one({"_id": object_id})
+    return self.to_model(data) if data else None
+
+  async def get_document(self, db: AsyncIOMotorDatabase, _id: str, model: Optional[Type[BaseModel]] = None) -> Optional[dict]:
+    object_id = to_object_id(_id)
+    if object_id is None:
+      return None
+
+    data = await self.collection(db).find_one({"_id": object_id})
+    return self.to_document(data, model) if data else None
+
+  async def find_one(self, db: AsyncIOMotorDatabase, query: dict) -> Optional[ModelT]:
+    data = await self.collection(db).find_one(query)
+    return self.to_model(data) if data else None
+
+  async def find(
+      self,
+      db: AsyncIOMotorDatabase,
+      skip: int = 0,
+      limit: int = 100,
+      cursor: Optional[str] = None,
+      projection: Optional[dict] = None,
+      model: Optional[Type[BaseModel]] = None
+  ) -> List[BaseModel]:
+    """
+    One page of the collection in KEYSET_SORT order.
+
+    Args:
+        db (AsyncIOMotorDatabase): The namespace database.
+        skip (int): The number of documents to skip.
+        limit (int): The maximum number of documents to return.
+        cursor (Optional[str]): The cursor of the previous page.
+        projection (Optional[dict]): The fields to read, all of them if None.
+        model (Optional[Type[BaseModel]]): The model to build, the repository model if None.
+
+    Returns:
+        List[BaseModel]: The documents.
+    """
+    documents = self.collection(db).find(keyset_filter(cursor), projection).sort(KEYSET_SORT).skip(skip).limit(limit)
+    return [self.to_model(data, model) async for data in documents]
+
+  async def find_documents(
+      self,
+      db: AsyncIOMotorDatabase,
+      skip: int = 0,
+      limit: int = 100,
+      cursor: Optional[str] = None,
+      projection: Optional[dict] = None,
+      model: Optional[Type[BaseModel]] = None
+  ) -> List[dict]:
+    """
+    Same page as find, as documents shaped by to_document instead of models.
+    """
+    documents = self.collection(db).find(keyset_filter(cursor), projection).sort(KEYSET_SORT).skip(skip).limit(limit)
+    return [self.to_document(data, model) async for data in documents]
+
+  async def insert_many(
+      self,
+      db: AsyncIOMotorDatabase,
+      documents: List[Optional[dict]],
+      results: List[BulkItemResult],
+      ordered: bool = True,
+      chunk_size: int = BULK_CHUNK_SIZE
+  ) -> List[dict]:
+    """
+    Insert documents stamped with created_at/updated_at, see utils.bulk.insert_bulk.
+    """
+    now = datetime.datetime.now()
+    documents = [None if document is None else {**document, "created_at": now, "updated_at": now} for document in documents]
+    return await insert_bulk(self.collection(db), documents, results, ordered, chunk_size)
+
+  async def upsert_many(
+      self,
+      db: AsyncIOMotorDatabase,
+      documents: List[Optional[dict]],
+      results: List[BulkItemResult],
+      chunk_size: int = BULK_CHUNK_SIZE,
+      projection: Optional[dict] = None
+  ) -> List[tuple[dict, Optional[dict]]]:
+    """
+    Write documents that carry their _id, keeping their created_at/updated_at and
+    stamping the missing ones, see utils.bulk.upsert_bulk.
+    """
+    now = datetime.datetime.now()
+    documents = [
+      None if document is None else {"created_at": now, "updated_at": now, **document}
+      for document in documents
+    ]
+    return await upsert_bulk(self.collection(db), documents, results, chunk_size, projection)
+
+  async def delete_many(
+      self,
+      db: AsyncIOMotorDatabase,
+      ids: List[str],
+      chunk_size: int = BULK_CHUNK_SIZE,
+      projection: Optional[dict] = None
+  ) -> tuple[List[BulkItemResult], List[dict]]:
+    """
+    Delete documents by id, see utils.bulk.delete_bulk.
+    """
+    return await delete_bulk(self.collection(db), ids, chunk_size, projection)
@@ -1,108 +1,122 @@
-import datetime
-
 from typing import List, Optional
-from pymongo.database import Database
-from pymongo.collection import Collection
+from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 from bson import ObjectId
 
+from crud.repository import Repository
 from schemas.auth import UserCreate, User
-from utils.func import convert_object_id_of_item, convert_username
-from core.security import hash_password
+from utils.func import convert_username
+from utils.cache import TTLCache
+from core.security import hash_password, password_pool
+from core.config import USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_SIZE
 
+# Authenticated users by (namespace, username), and their usernames by (namespace, user id)
+# for invalidation. Other workers only see a change once the short TTL expires.
+_user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+_username_by_id = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
 
-def get_user_collection(db: Database) -> Collection:
-  return db.get_collection("users")
+user_repository = Repository("users", User)
 
 
-def create_user(db: Database, username: str, password: str) -> User:
-  collection = get_user_collection(db)
+def get_user_collection(db: AsyncIOMotorDatabase) -> AsyncIOMotorCollection:
+  return user_repository.collection(db)
+
+
+async def create_user(db: AsyncIOMotorDatabase, username: str, password: str) -> User:
+  # bcrypt is CPU bound, keep it off the event loop and the shared threadpool
+  hashed_password = await password_pool.run(hash_password, password)
 
-  now = datetime.datetime.now()
   user_dict = {
     "username": convert_username(username),
-    "hashed_password": hash_password(password),
-    "created_at": now,
-    "updated_at": now
+    "hashed_password": hashed_password,
   }
-  result = collection.insert_one(user_dict)
+  return await user_repository.insert(db, user_dict)
 
-  created_user_data = collection.find_one({"_id": result.inserted_id})
-  if created_user_data:
-    created_user_data = convert_object_id_of_item(created_user_data)
 
-  return User(**created_user_data)
+async def get_user(db: AsyncIOMotorDatabase, user_id: str) -> Optional[User]:
+  return await user_repository.get(db, user_id)
 
 
-def get_user(db: Database, user_id: str) -> Optional[User]:
-  collection = get_user_collection(db)
-  try:
-    user_data = collection.find_one({"_id": ObjectId(user_id)})
-    if user_data:
-      user_data = convert_object_id_of_item(user_data)
-      return User(**user_data)
-    return None
-  except Exception as e:
-    print(f"Error fetching user by id: {e}")
-    return None
-
-
-def get_users(db: Database, skip: int = 0, limit: int = 100) -> List[User]:
-  collection = get_user_collection(db)
-  users_cursor = collection.find().skip(skip).limit(limit)
+async def get_users(db: AsyncIOMotorDatabase, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[User]:
+  return await user_repository.find(db, skip, limit, cursor)
 
-  result = []
-  for user_data in users_cursor:
-    user_data = convert_object_id_of_item(user_data)
-    result.append(User(**user_data))
 
-  return result
+async def get_user_by_username(db: AsyncIOMotorDatabase, username: str) -> Optional[User]:
+  return await user_repository.find_one(db, {"username": convert_username(username)})
 
 
-def get_user_by_username(db: Database, username: str):
-  collection = get_user_collection(db)
-  try:
-    username = convert_username(username)
-    user_data = collection.find_one({"username": username})
-    if user_data:
-      user_data = convert_object_id_of_item(user_data)
-      return User(**user_data)
-    return None
-  except Exception as e:
-    print(f"Error fetching user by username: {e}")
-    return None
-
-
-def set_refresh_token_for_user(db: Database, user_id: str, refresh_token: str):
-  collection = get_user_collection(db)
-  collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"refresh_token": refresh_token}})
+async def get_cached_user_by_username(db: AsyncIOMotorDatabase, username: str) -> Optional[User]:
+  """
+  Same as get_user_by_username, served from a short lived per-namespace cache.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      username (str): The username.
+
+  Returns:
+      Optional[User]: The user, or None if it does not exist.
+  """
+  username = convert_username(username)
+  user = _user_cache.get((db.name, username))
+  if user is not None:
+    return user
+
+  user = await get_user_by_username(db, username)
+  if user is not None:
+    _user_cache.set((db.name, username), user)
+    _username_by_id.set((db.name, user.id), username)
 
+  return user
 
-def get_refresh_token_for_user(db: Database, user_id: str) -> Optional[str]:
+
+def invalidate_cached_user(db: AsyncIOMotorDatabase, user_id: str):
+  username = _username_by_id.pop((db.name, str(user_id)))
+  if username is not None:
+    _user_cache.pop((db.name, username))
+
+
+async def set_password_hash_for_user(db: AsyncIOMotorDatabase, user_id: str, hashed_password: str):
+  await user_repository.set_fields(db, user_id, {"hashed_password": hashed_password})
+  invalidate_cached_user(db, user_id)
+
+
+async def set_refresh_token_for_user(db: AsyncIOMotorDatabase, user_id: str, refresh_token: str):
+  await user_repository.set_fields(db, user_id, {"refresh_token": refresh_token})
+  invalidate_cached_user(db, user_id)
+
+
+async def get_refresh_token_for_user(db: AsyncIOMotorDatabase, user_id: str) -> Optional[str]:
   collection = get_user_collection(db)
-  user_data = collection.find_one({"_id": ObjectId(user_id)})
+  user_data = await collection.find_one({"_id": ObjectId(user_id)})
   if user_data:
     return user_data.get("refresh_token")
   return None
 
 
-def set_info_login(db: Database, user_id: str, device_info: dict):
-  collection = get_user_collection(db)
-  collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"device_info": device_info}})
+async def set_info_login(db: AsyncIOMotorDatabase, user_id: str, device_info: dict):
+  await user_repository.set_fields(db, user_id, {"device_info": device_info})
+  invalidate_cached_user(db, user_id)
 
 
-def get_info_login(db: Database, user_id: str) -> Optional[dict]:
+async def get_info_login(db: AsyncIOMotorDatabase, user_id: str) -> Optional[dict]:
   collection = get_user_collection(db)
-  user_data = collection.find_one({"_id": ObjectId(user_id)})
+  user_data = await collection.find_one({"_id": ObjectId(user_id)})
   if user_data:
     return user_data.get("device_info")
   return None
 
 
-def remove_info_login(db: Database, user_id: str):
-  collection = get_user_collection(db)
-  collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"refresh_token": None, "device_info": None}})
+async def remove_info_login(db: AsyncIOMotorDatabase, user_id: str):
+  await user_repository.set_fields(db, user_id, {"refresh_token": None, "device_info": None})
+  invalidate_cached_user(db, user_id)
 
 
-def set_role_for_user(db: Database, user_id: str, role: str):
-  collection = get_user_collection(db)
-  collection.update_one({"_id": ObjectId(user_id)}, {"$set": {"role": role}})
+async def set_role_for_user(db: AsyncIOMotorDatabase, user_id: str, role: str) -> Optional[User]:
+  """
+  Set the role of a user.
+
+  Returns:
+      Optional[User]: The user with the new role, or None if it does not exist.
+  """
+  user = await user_repository.update(db, user_id, {"role": role})
+  invalidate_cached_user(db, user_id)
+  return user
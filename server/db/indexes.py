@@ -0,0 +1,186 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, TEXT, IndexModel
+
+from utils.pagination import KEYSET_SORT
+
+from core.config import MONGO_NAMESPACE_DEFAULT, INDEX_RETRY_SECONDS, INDEX_RETRY_MAX_SECONDS, INDEX_MAX_NAMESPACES
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Indexes every namespace database must have, by collection
+INDEX_SPECS: dict[str, list[IndexModel]] = {
+  "users": [
+    IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+    IndexModel(KEYSET_SORT, name="created_at_id"),
+  ],
+  "blogs": [
+    IndexModel(KEYSET_SORT, name="created_at_id"),
+    IndexModel([("category", ASCENDING), *KEYSET_SORT], name="category_created_at_id"),
+    IndexModel([("tags", ASCENDING)], name="tags"),
+    # Serves /blogs/search, no stemming or stop words since posts are not only in English
+    IndexModel(
+      [("title", TEXT), ("tags", TEXT), ("content", TEXT)],
+      weights={"title": 10, "tags": 5, "content": 1},
+      default_language="none",
+      name="text_search",
+    ),
+  ],
+  "categories": [
+    IndexModel(KEYSET_SORT, name="created_at_id"),
+  ],
+  "items": [
+    IndexModel(KEYSET_SORT, name="created_at_id"),
+  ],
+}
+
+# Indexes requests wait for, as (collection, index name)
+USERNAME_INDEX = ("users", "username_unique")
+TEXT_SEARCH_INDEX = ("blogs", "text_search")
+
+# Provisioning task of each namespace touched by this worker, oldest first
+_namespace_tasks: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+# Namespaces whose provisioning failed: (monotonic time of the next attempt, failures, failed indexes)
+_namespace_failures: dict[str, tuple[float, int, frozenset]] = {}
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> frozenset[tuple[str, str]]:
+  '''
+  Creates the INDEX_SPECS indexes in a namespace database. Idempotent, existing
+  indexes with the same spec are left alone. Each collection is provisioned on its
+  own, and an index that cannot be built, such as a unique index over duplicates,
+  does not keep the others from being created.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+
+  Returns:
+      frozenset[tuple[str, str]]: The (collection, index name) of the indexes that
+      could not be created, empty if every index is in place.
+  '''
+  failed = set()
+  for collection_name, indexes in INDEX_SPECS.items():
+    collection = db.get_collection(collection_name)
+    try:
+      await collection.create_indexes(indexes)
+      continue
+    except Exception:
+      pass
+
+    # Find out which index failed, creating the others
+    for index in indexes:
+      name = index.document["name"]
+      try:
+        await collection.create_indexes([index])
+      except Exception as e:
+        logger.error(f"Error creating index {name} on {collection_name} for namespace {db.name}: {e}")
+        failed.add((collection_name, name))
+
+  if not failed:
+    logger.info(f"Indexes ready for namespace {db.name}")
+  return frozenset(failed)
+
+
+async def _provision_namespace(db: AsyncIOMotorDatabase) -> frozenset[tuple[str, str]]:
+  failed = await ensure_indexes(db)
+  if not failed:
+    _namespace_failures.pop(db.name, None)
+    return failed
+
+  # Retried once the backoff is over, not on every request to the namespace
+  _, failures, _ = _namespace_failures.get(db.name, (0.0, 0, failed))
+  delay = min(INDEX_RETRY_SECONDS * 2 ** failures, INDEX_RETRY_MAX_SECONDS)
+  _namespace_failures[db.name] = (time.monotonic() + delay, failures + 1, failed)
+  _namespace_tasks.pop(db.name, None)
+  return failed
+
+
+def schedule_namespace_indexes(db: AsyncIOMotorDatabase) -> Optional[asyncio.Task]:
+  '''
+  Starts index provisioning the first time a namespace is touched by this worker.
+  Only call it for namespaces that exist or are being created by an authorized
+  request, provisioning creates the database. Does nothing outside of a running
+  event loop, or while a failed provisioning is backing off.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+
+  Returns:
+      Optional[asyncio.Task]: The provisioning task, None if it is not running.
+  '''
+  task = _namespace_tasks.get(db.name)
+  if task is not None:
+    _namespace_tasks.move_to_end(db.name)
+    return task
+
+  failure = _namespace_failures.get(db.name)
+  if failure is not None and time.monotonic() < failure[0]:
+    return None
+
+  try:
+    loop = asyncio.get_running_loop()
+  except RuntimeError:
+    return None
+
+  task = loop.create_task(_provision_namespace(db))
+  _namespace_tasks[db.name] = task
+
+  # Forgetting a provisioned namespace only costs a create_indexes round trip the next time
+  while len(_namespace_tasks) > INDEX_MAX_NAMESPACES:
+    name, oldest = next(iter(_namespace_tasks.items()))
+    if not oldest.done():
+      break
+    del _namespace_tasks[name]
+
+  return task
+
+
+async def is_known_namespace(db: AsyncIOMotorDatabase) -> bool:
+  '''
+  Whether a namespace is in use: it is the default one, was provisioned by this
+  worker or has users. Public reads check it before provisioning a namespace.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+
+  Returns:
+      bool: True if the namespace is known.
+  '''
+  if db.name == MONGO_NAMESPACE_DEFAULT or db.name in _namespace_tasks:
+    return True
+  return await db.get_collection("users").find_one({}, {"_id": 1}) is not None
+
+
+async def wait_for_namespace_indexes(db: AsyncIOMotorDatabase, indexes: Iterable[tuple[str, str]]) -> bool:
+  '''
+  Waits until index provisioning of a namespace has finished, for requests that
+  rely on an index, such as the unique username index.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      indexes (Iterable[tuple[str, str]]): The (collection, index name) the request relies on.
+
+  Returns:
+      bool: True if those indexes are in place, False if they could not be created.
+  '''
+  task = schedule_namespace_indexes(db)
+  if task is not None:
+    failed = await asyncio.shield(task)
+  else:
+    failure = _namespace_failures.get(db.name)
+    if failure is None:
+      return False
+    failed = failure[2]
+
+  return failed.isdisjoint(indexes)
+
+
+def reset_namespace_indexes():
+  _namespace_tasks.clear()
+  _namespace_failures.clear()
@@ -1,14 +1,13 @@
-from pymongo.database import Database
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 from core.config import MONGO_DB_URL, MONGO_NAMESPACE_DEFAULT
-from motor.motor_asyncio import AsyncIOMotorClient
+from db.indexes import schedule_namespace_indexes, reset_namespace_indexes
 
 from core.logger import get_logger
 
 logger = get_logger(__name__)
 
-client: MongoClient = None
-db: Database = None
+client: AsyncIOMotorClient = None
+db: AsyncIOMotorDatabase = None
 
 
 async def connect_to_mongo() -> bool:
@@ -21,13 +20,15 @@ async def connect_to_mongo() -> bool:
   global client, db
   if client is None:
     try:
-      client = MongoClient(MONGO_DB_URL)
+      client = AsyncIOMotorClient(MONGO_DB_URL)
       db = client[MONGO_NAMESPACE_DEFAULT]
 
       logger.info(f'MONGO_DB_URL={MONGO_DB_URL}')
       logger.info(f'MONGO_NAMESPACE_DEFAULT={MONGO_NAMESPACE_DEFAULT}')
       logger.info("Connected to MongoDB!")
-      # client.admin.command('ping')
+      # await client.admin.command('ping')
+
+      schedule_namespace_indexes(db)
 
       return True
 
@@ -51,6 +52,7 @@ async def close_mongo_connection() -> bool:
     client.close()
     client = None
     db = None
+    reset_namespace_indexes()
 
     logger.info("MongoDB connection closed.")
     return True
@@ -59,12 +61,12 @@ async def close_mongo_connection() -> bool:
   return False
 
 
-def get_mongo_db() -> Database:
+async def get_mongo_db() -> AsyncIOMotorDatabase:
   '''
   Retrieves the current MongoDB database connection.
 
   Returns:
-      Database: The MongoDB database object.
+      AsyncIOMotorDatabase: The MongoDB database object.
 
   Raises:
       ConnectionError: If the MongoDB connection cannot be established.
@@ -72,7 +74,7 @@ def get_mongo_db() -> Database:
   global db
 
   if db is None:
-    connect_to_mongo()
+    await connect_to_mongo()
 
   if db is None:
     raise ConnectionError(f'MongoDB connection is not established. {MONGO_DB_URL} {MONGO_NAMESPACE_DEFAULT}')
@@ -80,16 +82,16 @@ def get_mongo_db() -> Database:
   return db
 
 
-def set_namespace(db_current: Database, namespace: str) -> Database:
+def set_namespace(db_current: AsyncIOMotorDatabase, namespace: str) -> AsyncIOMotorDatabase:
   '''
   Sets the namespace (database) for the current MongoDB connection.
 
   Args:
-      db_current (Database): The current MongoDB database object.
+      db_current (AsyncIOMotorDatabase): The current MongoDB database object.
       namespace (str): The name of the database to switch to.
 
   Returns:
-      Database: The MongoDB database object.
+      AsyncIOMotorDatabase: The MongoDB database object.
   '''
 
   global client
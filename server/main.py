@@ -8,10 +8,17 @@ from fastapi.staticfiles import StaticFiles
 from starlette.middleware import Middleware
 
 # ─── Local Imports ─────────────────────────────────────────────────
+from db import mongodb
 from db.mongodb import connect_to_mongo, close_mongo_connection
 from core.config import APP_NAME, APP_DESCRIPTION, APP_VERSION, DEBUG
 from core.logger import logging_config, get_logger
-from core.middleware import AuthMiddleware
+from core.middleware import AuthMiddleware, BodySizeLimitMiddleware
+from utils.pagination import NEXT_CURSOR_HEADER
+from core.security import configure_bcrypt_rounds, password_pool
+from services.image_pool import image_pool
+from services.pubsub import pubsub
+from services.websocket_manager import manager as ws_manager
+from services.blog_events import start_blog_events, stop_blog_events
 from api.v1.endpoints import (
   item as item_endpoints,
   websocket as websocket_endpoints,
@@ -19,6 +26,8 @@ from api.v1.endpoints import (
   category as category_endpoints,
   blog as blog_endpoints,
   images as images_endpoints,
+  transfer as transfer_endpoints,
+  stats as stats_endpoints,
 )
 
 # ─── Logger Setup ──────────────────────────────────────────────────
@@ -29,9 +38,17 @@ logger = get_logger(__name__)
 # ─── Application Lifespan ──────────────────────────────────────────
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+  configure_bcrypt_rounds()
   await connect_to_mongo()
+  await pubsub.start()
+  await ws_manager.start()
+  start_blog_events(mongodb.client)
   yield
+  stop_blog_events()
+  await pubsub.stop()
   await close_mongo_connection()
+  image_pool.shutdown()
+  password_pool.shutdown()
 
 origins = [
     "http://localhost",
@@ -47,7 +64,8 @@ app = FastAPI(
   lifespan=lifespan,
 
   middleware=[
-    Middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"]),
+    Middleware(CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"], expose_headers=[NEXT_CURSOR_HEADER, "ETag"]),
+    Middleware(BodySizeLimitMiddleware),
     Middleware(AuthMiddleware),
   ]
 )
@@ -62,3 +80,5 @@ app.include_router(websocket_endpoints.router, prefix="/api/v1", tags=["websocke
 app.include_router(auth_endpoints.router, prefix="/api/v1", tags=["auth"])
 app.include_router(category_endpoints.router, prefix="/api/v1", tags=["category"])
 app.include_router(blog_endpoints.router, prefix="/api/v1", tags=["blog"])
+app.include_router(transfer_endpoints.router, prefix="/api/v1", tags=["transfer"])
+app.include_router(stats_endpoints.router, prefix="/api/v1", tags=["stats"])
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import UploadFile
 from pydantic import BaseModel, Field
@@ -25,3 +25,47 @@ class Blog(BlogBase):
 
   class Config:
     populate_by_name = True
+
+
+# Fields a blog listing can be narrowed to, see BlogSummary
+BLOG_SUMMARY_FIELDS = ("title", "author", "category", "tags", "image_url", "created_at", "updated_at")
+
+
+class BlogSummary(BaseModel):
+  """
+  Blog without its content and comments, for list pages. With a sparse fieldset the
+  fields that were not requested are None.
+  """
+  id: str = Field(alias="_id")
+  title: Optional[str] = None
+  author: Optional[str] = None
+  category: Optional[str] = None
+  tags: Optional[list] = None
+  image_url: Optional[str] = None
+  created_at: Optional[datetime] = None
+  updated_at: Optional[datetime] = None
+
+  class Config:
+    populate_by_name = True
+
+
+class BlogSearchResult(BlogSummary):
+  """
+  Blog summary matched by a search, with its relevance and an excerpt of the content
+  where the matched terms are wrapped in <mark>.
+  """
+  score: float = 0
+  highlight: str = ''
+
+
+class FacetCount(BaseModel):
+  value: Optional[str] = None
+  count: int
+
+
+class BlogFacets(BaseModel):
+  """
+  How many blogs use each category, and the most used tags, most used first.
+  """
+  categories: List[FacetCount] = []
+  tags: List[FacetCount] = []
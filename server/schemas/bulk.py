@@ -0,0 +1,36 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from datetime import datetime
+
+
+class BulkItemResult(BaseModel):
+  """
+  Outcome of one element of a bulk request, `index` is its position in the request.
+  status is one of "created", "replaced", "deleted", "not_found", "error" or "skipped", skipped
+  elements were not attempted because an ordered request stopped at an earlier error.
+  """
+  index: int
+  status: str
+  id: Optional[str] = None
+  error: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+  succeeded: int = 0
+  failed: int = 0
+  skipped: int = 0
+  results: List[BulkItemResult] = []
+
+
+class BulkDeleteRequest(BaseModel):
+  ids: List[str]
+
+
+class ImportedRecord(BaseModel):
+  """
+  Identity and timestamps of an imported record, kept as they were exported.
+  """
+  id: Optional[str] = Field(None, alias="_id")
+  created_at: Optional[datetime] = None
+  updated_at: Optional[datetime] = None
@@ -3,42 +3,55 @@ from fastapi import Request
 from core import security
 from core.config import ROLE_ADMIN
 
-from crud.user import get_user, get_user_by_username, set_refresh_token_for_user, set_info_login, remove_info_login
+from crud.user import (get_user, get_user_by_username, get_cached_user_by_username, set_refresh_token_for_user,
+                       set_info_login, remove_info_login, set_password_hash_for_user)
 from fastapi import HTTPException, status
 
-from pymongo.database import Database
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from db.mongodb import set_namespace
+from db.indexes import schedule_namespace_indexes
 
 from core.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def authenticate_user(
-    db: Database,
+async def authenticate_user(
+    db: AsyncIOMotorDatabase,
     username: str,
     password: str
 ):
   """
   Get user by username and password
   Args:
-    db (Database): The MongoDB database instance.
+    db (AsyncIOMotorDatabase): The MongoDB database instance.
     username (str): Username of user
     password (str): Password of user
 
   Returns:
     User: User object
   """
-  user = get_user_by_username(db, username)
+  user = await get_user_by_username(db, username)
+  if not user:
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
-  if not user or not security.verify_password(password, user.hashed_password):
+  # bcrypt is CPU bound, keep it off the event loop and the shared threadpool
+  is_valid, new_hashed_password = await security.password_pool.run(
+    security.verify_and_update_password, password, user.hashed_password
+  )
+  if not is_valid:
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+  # Transparently move the stored hash to the current bcrypt cost
+  if new_hashed_password:
+    await set_password_hash_for_user(db, user.id, new_hashed_password)
+    user.hashed_password = new_hashed_password
+
   return user
 
 
-def create_access_token_by_username_password(
-    db: Database,
+async def create_access_token_by_username_password(
+    db: AsyncIOMotorDatabase,
     username: str,
     password: str,
     info_login: dict = None
@@ -46,7 +59,7 @@ def create_access_token_by_username_password(
   """
   Create access token and refresh token by username and password
   Args:
-    db (Database): The MongoDB database instance.
+    db (AsyncIOMotorDatabase): The MongoDB database instance.
     username (str): Username of user
     password (str): Password of user
     info_login (dict): Device info
@@ -54,30 +67,30 @@ def create_access_token_by_username_password(
   Returns:
     tuple[str, str]: Access token and refresh token
   """
-  user = authenticate_user(db, username, password)
+  user = await authenticate_user(db, username, password)
   payload = {"username": user.username}
 
   access_token = security.create_access_token(data=payload)
   refresh_token = security.create_refresh_token(data=payload)
 
   # Update refresh token
-  set_refresh_token_for_user(db, user.id, refresh_token)
+  await set_refresh_token_for_user(db, user.id, refresh_token)
 
   if info_login:
-    set_info_login(db, user.id, info_login)
+    await set_info_login(db, user.id, info_login)
 
   return access_token, refresh_token
 
 
-def create_access_token_by_refresh_access_token(
-    db: Database,
+async def create_access_token_by_refresh_access_token(
+    db: AsyncIOMotorDatabase,
     current_refresh_token: str,
     info_login: dict
 ) -> tuple[str, str]:
   """
   Create access token and refresh token by refresh token
   Args:
-    db (Database): The MongoDB database instance.
+    db (AsyncIOMotorDatabase): The MongoDB database instance.
     current_refresh_token (str): Current refresh token
     info_login (dict): Device info
 
@@ -91,7 +104,7 @@ def create_access_token_by_refresh_access_token(
   username = payload['username']
 
   # Check if user exists and then check refresh token and device info is valid
-  user = get_user_by_username(db, username)
+  user = await get_user_by_username(db, username)
   if not user:
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
   if user.refresh_token != current_refresh_token:
@@ -104,16 +117,16 @@ def create_access_token_by_refresh_access_token(
   refresh_token = security.create_refresh_token(data=payload)
 
   # Update refresh token
-  set_refresh_token_for_user(db, user.id, refresh_token)
+  await set_refresh_token_for_user(db, user.id, refresh_token)
   # Update device info
-  set_info_login(db, user.id, info_login)
+  await set_info_login(db, user.id, info_login)
 
   return access_token, refresh_token
 
 
-def check_login(
+async def check_login(
     request: Request,
-    db: Database,
+    db: AsyncIOMotorDatabase,
     namespace: str,
     target_role: str = None,
 ) -> bool:
@@ -121,7 +134,7 @@ def check_login(
   Check if user is logged in
   Args:
     request (Request): The FastAPI request object.
-    db (Database): The MongoDB database instance.
+    db (AsyncIOMotorDatabase): The MongoDB database instance.
     namespace (str): The namespace to set for the database.
     target_role (str, optional): The role to check. Defaults to None.
 
@@ -135,13 +148,17 @@ def check_login(
 
   db = set_namespace(db, namespace)
   username = jwt_payload['username']
-  user_item = get_user_by_username(db, username)
+  # The JWT is already verified by AuthMiddleware, a briefly cached user is enough here
+  user_item = await get_cached_user_by_username(db, username)
 
   if not user_item:
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
 
   request.state.auth = user_item
 
+  # The namespace has a signed in user, make sure its indexes exist
+  schedule_namespace_indexes(db)
+
   if target_role:
     if user_item.role != target_role:
       raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not allowed to perform this action")
@@ -149,9 +166,9 @@ def check_login(
   return True
 
 
-def handle_logout(
+async def handle_logout(
     request: Request,
-    db: Database,
+    db: AsyncIOMotorDatabase,
 ):
   auth = request.state.auth
-  remove_info_login(db, auth.id)
+  await remove_info_login(db, auth.id)
@@ -0,0 +1,164 @@
+import asyncio
+
+from datetime import datetime
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from services.event_bus import event_bus
+from services.websocket_manager import manager
+
+from core.config import BLOG_CHANGE_STREAM
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+BLOG_TOPIC = "blog"
+
+BLOG_CREATED = "blog.created"
+BLOG_UPDATED = "blog.updated"
+BLOG_DELETED = "blog.deleted"
+
+# Fields of the blog carried by an event, the content is left out to keep events small
+BLOG_EVENT_FIELDS = ("title", "author", "category", "tags", "image_url", "updated_at")
+
+_OPERATION_TYPES = {"insert": BLOG_CREATED, "update": BLOG_UPDATED, "replace": BLOG_UPDATED, "delete": BLOG_DELETED}
+
+_watcher: Optional[asyncio.Task] = None
+
+# Events waiting to be published, in write order, and the task publishing them
+BLOG_EVENT_QUEUE_SIZE = 10000
+_outbox: Optional[asyncio.Queue] = None
+_publisher: Optional[asyncio.Task] = None
+
+
+def make_blog_event(event_type: str, namespace: str, blog_id: str, blog_data: Optional[dict] = None, source: str = "app") -> dict:
+  event = {"type": event_type, "namespace": namespace, "id": str(blog_id), "source": source}
+  if blog_data:
+    for field in BLOG_EVENT_FIELDS:
+      value = blog_data.get(field)
+      event[field] = value.isoformat() if isinstance(value, datetime) else value
+  return event
+
+
+def publish_blog_events(db: AsyncIOMotorDatabase, events: list[tuple[str, str, Optional[dict]]]):
+  """
+  Announce blog writes made by this worker without holding up the request. The events
+  are queued and published in write order by a background task, which sends the events
+  queued meanwhile as one batch, failures are only logged. Skipped when the change
+  stream is the source of blog events, it reports the same writes.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      events (list[tuple[str, str, Optional[dict]]]): The event type (BLOG_CREATED,
+          BLOG_UPDATED or BLOG_DELETED), blog id and blog after the write of each write.
+  """
+  global _outbox, _publisher
+  if BLOG_CHANGE_STREAM or not events:
+    return
+
+  if _publisher is None or _publisher.done():
+    _outbox = asyncio.Queue(maxsize=BLOG_EVENT_QUEUE_SIZE)
+    _publisher = asyncio.create_task(_publish_events(_outbox))
+
+  try:
+    _outbox.put_nowait([make_blog_event(event_type, db.name, blog_id, blog_data) for event_type, blog_id, blog_data in events])
+  except asyncio.QueueFull:
+    logger.warning(f"Blog event queue is full, dropping {len(events)} events")
+
+
+def publish_blog_event(db: AsyncIOMotorDatabase, event_type: str, blog_id: str, blog_data: Optional[dict] = None):
+  """
+  Announce one blog write, see publish_blog_events.
+  """
+  publish_blog_events(db, [(event_type, blog_id, blog_data)])
+
+
+async def _publish_events(outbox: asyncio.Queue):
+  while True:
+    batch = await outbox.get()
+    while not outbox.empty():
+      batch.extend(outbox.get_nowait())
+
+    try:
+      await event_bus.publish(BLOG_TOPIC, {"events": batch})
+    except Exception as e:
+      logger.error(f"Could not publish {len(batch)} blog events: {e!r}")
+
+
+async def forward_blog_events(batch: dict):
+  """
+  Push a batch of blog events to the websocket clients subscribed to their namespace or
+  blog, in one pub/sub message. Events of this worker's writes go through pub/sub to
+  reach every worker, change stream events are seen by every worker already and are
+  only delivered to local sockets.
+  """
+  for local in (False, True):
+    messages = [
+      (room, event)
+      for event in batch["events"] if (event.get("source") == "change_stream") == local
+      for room in (f"namespace:{event['namespace']}", f"blog:{event['id']}")
+    ]
+    if messages:
+      await manager.send_to_rooms(messages, local=local)
+
+
+async def _watch_blog_changes(client: AsyncIOMotorClient):
+  pipeline = [{"$match": {"ns.coll": "blogs", "operationType": {"$in": list(_OPERATION_TYPES)}}}]
+  resume_token = None
+
+  while True:
+    try:
+      async with client.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+        logger.info("Watching blog changes")
+        async for change in stream:
+          resume_token = stream.resume_token
+          event = make_blog_event(
+            _OPERATION_TYPES[change["operationType"]],
+            change["ns"]["db"],
+            change["documentKey"]["_id"],
+            change.get("fullDocument"),
+            source="change_stream",
+          )
+          await event_bus.publish(BLOG_TOPIC, {"events": [event]})
+    except OperationFailure as e:
+      # 40573: change streams are only supported on replica sets
+      if e.code == 40573:
+        logger.warning("Blog change stream needs a replica set, blog events stop")
+        return
+      logger.error(f"Blog change stream failed, retrying: {e!r}")
+      resume_token = None
+      await asyncio.sleep(1)
+    except PyMongoError as e:
+      logger.error(f"Blog change stream failed, retrying: {e!r}")
+      await asyncio.sleep(1)
+
+
+def start_blog_events(client: Optional[AsyncIOMotorClient]):
+  """
+  Forward blog events to the websocket clients, and feed them from a Mongo change stream
+  when BLOG_CHANGE_STREAM is set. Change streams need a replica set.
+
+  Args:
+      client (Optional[AsyncIOMotorClient]): The Mongo client, the change stream watches
+          every namespace through it.
+  """
+  global _watcher
+  event_bus.subscribe(BLOG_TOPIC, forward_blog_events)
+
+  if BLOG_CHANGE_STREAM and client is not None and _watcher is None:
+    _watcher = asyncio.create_task(_watch_blog_changes(client))
+
+
+def stop_blog_events():
+  global _watcher, _publisher
+  event_bus.unsubscribe(BLOG_TOPIC, forward_blog_events)
+
+  if _publisher is not None:
+    _publisher.cancel()
+    _publisher = None
+
+  if _watcher is not None:
+    _watcher.cancel()
+    _watcher = None
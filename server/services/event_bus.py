@@ -0,0 +1,40 @@
+import asyncio
+
+from collections import defaultdict
+from typing import Awaitable, Callable
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+
+class EventBus:
+  """
+  In-app publish/subscribe of events by topic, within one worker. A failing handler is
+  logged and does not affect the publisher or the other handlers.
+  """
+
+  def __init__(self):
+    self._handlers: dict[str, list[EventHandler]] = defaultdict(list)
+
+  def subscribe(self, topic: str, handler: EventHandler):
+    self._handlers[topic].append(handler)
+
+  def unsubscribe(self, topic: str, handler: EventHandler):
+    if handler in self._handlers.get(topic, ()):
+      self._handlers[topic].remove(handler)
+
+  async def publish(self, topic: str, event: dict):
+    handlers = list(self._handlers.get(topic, ()))
+    if not handlers:
+      return
+
+    results = await asyncio.gather(*(handler(event) for handler in handlers), return_exceptions=True)
+    for result in results:
+      if isinstance(result, Exception):
+        logger.error(f"Error handling {topic} event: {result!r}")
+
+
+event_bus = EventBus()
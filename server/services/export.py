@@ -0,0 +1,67 @@
+import zlib
+
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING
+from starlette.concurrency import run_in_threadpool
+
+from utils.responses import dumps
+
+from core.config import EXPORT_BATCH_SIZE, EXPORT_GZIP_LEVEL
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def export_documents(
+    collection: AsyncIOMotorCollection,
+    after_id: Optional[ObjectId] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[bytes]:
+  """
+  Stream a collection as NDJSON in _id order, one chunk per cursor batch, so memory stays
+  bounded by the batch size whatever the size of the collection. A broken export resumes
+  with `after_id` set to the _id of the last complete line.
+
+  Args:
+      collection (AsyncIOMotorCollection): The collection to export.
+      after_id (Optional[ObjectId]): Only export the documents after this _id.
+      batch_size (int): The number of documents per cursor batch and per chunk.
+
+  Yields:
+      bytes: Complete NDJSON lines, ObjectId as its hex string and datetime in ISO 8601.
+  """
+  query = {"_id": {"$gt": after_id}} if after_id is not None else {}
+  cursor = collection.find(query).sort("_id", ASCENDING).batch_size(batch_size)
+
+  count = 0
+  lines = []
+  try:
+    async for document in cursor:
+      lines.append(dumps(document))
+      if len(lines) >= batch_size:
+        count += len(lines)
+        yield b"\n".join(lines) + b"\n"
+        lines = []
+
+    if lines:
+      count += len(lines)
+      yield b"\n".join(lines) + b"\n"
+  finally:
+    await cursor.close()
+    logger.info(f"Exported {count} documents of {collection.database.name}.{collection.name}")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+  """
+  Compress a stream of chunks into a single gzip stream. zlib releases the GIL, the
+  compression runs in the threadpool to keep the event loop free.
+  """
+  compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+  async for chunk in chunks:
+    data = await run_in_threadpool(compressor.compress, chunk)
+    if data:
+      yield data
+  yield compressor.flush()
@@ -0,0 +1,194 @@
+import os
+import hashlib
+import threading
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from core.config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES
+from utils import func
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ImageCache:
+  """
+  Disk-backed cache of resized image variants with LRU eviction.
+
+  Entries are keyed by source file, requested size, output format and source mtime,
+  so replacing an image invalidates its variants without any explicit purge.
+
+  Every method touches the disk, call them from a threadpool. The lock only guards the
+  in-memory index, files are touched and unlinked outside of it.
+  """
+
+  def __init__(self, cache_dir: Path, max_bytes: int):
+    self.cache_dir = cache_dir
+    self.max_bytes = max_bytes
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.current_bytes = 0
+
+    self._entries: OrderedDict[str, int] = OrderedDict()
+    self._lock = threading.Lock()
+    self._loaded = False
+
+  def _load(self):
+    """
+    Rebuild the LRU index from disk, oldest entries first, the first time it is needed.
+    The directory is scanned before taking the lock.
+    """
+    if self._loaded:
+      return
+
+    self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for entry in os.scandir(self.cache_dir):
+      if entry.is_file() and not entry.name.endswith('.tmp'):
+        stat = entry.stat()
+        files.append((stat.st_mtime, entry.name, stat.st_size))
+
+    with self._lock:
+      if self._loaded:
+        return
+      for _, name, size in sorted(files):
+        self._entries[name] = size
+        self.current_bytes += size
+      self._loaded = True
+      evicted = self._evict()
+
+    self._unlink(evicted)
+
+  def _evict(self) -> list[str]:
+    """
+    Drop least recently used entries until the cache fits the byte budget. Caller holds
+    the lock and unlinks the returned files once it is released.
+    """
+    evicted = []
+    while self.current_bytes > self.max_bytes and self._entries:
+      name, size = self._entries.popitem(last=False)
+      self.current_bytes -= size
+      self.evictions += 1
+      evicted.append(name)
+    return evicted
+
+  def _unlink(self, names: list[str]):
+    for name in names:
+      try:
+        (self.cache_dir / name).unlink()
+      except FileNotFoundError:
+        pass
+
+  @staticmethod
+  def make_key(source_path: Path, width: int, height: int, format_save: str) -> str:
+    """
+    Build the cache key (and file name) of a resized variant.
+
+    Args:
+        source_path (Path): The original image.
+        width (int): The requested width.
+        height (int): The requested height.
+        format_save (str): The output format, e.g. "JPEG".
+
+    Returns:
+        str: The cache key.
+    """
+    mtime_ns = source_path.stat().st_mtime_ns
+    raw = f'{source_path}|{width}x{height}|{format_save}|{mtime_ns}'
+    return f'{hashlib.sha256(raw.encode()).hexdigest()}.{format_save.lower()}'
+
+  def get(self, key: str) -> Optional[Path]:
+    """
+    Look up a cached variant and mark it as recently used.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        Optional[Path]: The cached file, or None on a miss.
+    """
+    self._load()
+
+    with self._lock:
+      cached = key in self._entries
+      if not cached:
+        self.misses += 1
+        return None
+
+    path = self.cache_dir / key
+    try:
+      os.utime(path)
+    except FileNotFoundError:
+      # Evicted by another worker sharing the directory
+      with self._lock:
+        self.current_bytes -= self._entries.pop(key, 0)
+        self.misses += 1
+      return None
+
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+      self.hits += 1
+    return path
+
+  def lookup(self, source_path: Path, width: int, height: int, format_save: str) -> tuple[str, Optional[Path]]:
+    """
+    Build the cache key of a resized variant and look it up, see make_key and get.
+
+    Returns:
+        tuple[str, Optional[Path]]: The cache key, and the cached file or None on a miss.
+    """
+    key = self.make_key(source_path, width, height, format_save)
+    return key, self.get(key)
+
+  def put(self, key: str, data: bytes) -> Optional[Path]:
+    """
+    Store a resized variant, evicting old entries when over budget.
+
+    Args:
+        key (str): The cache key.
+        data (bytes): The encoded image.
+
+    Returns:
+        Optional[Path]: The cached file, or None if it is larger than the whole budget.
+    """
+    size = len(data)
+    if size > self.max_bytes:
+      return None
+
+    self._load()
+
+    path = self.cache_dir / key
+    tmp_path = self.cache_dir / f'{key}.{func.random_string(8)}.tmp'
+    with open(tmp_path, 'wb') as f:
+      f.write(data)
+    os.replace(tmp_path, path)
+
+    with self._lock:
+      self.current_bytes -= self._entries.pop(key, 0)
+      self._entries[key] = size
+      self.current_bytes += size
+      evicted = self._evict()
+
+    self._unlink(evicted)
+    return path
+
+  def stats(self) -> dict:
+    with self._lock:
+      return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "entries": len(self._entries),
+        "bytes": self.current_bytes,
+        "max_bytes": self.max_bytes,
+      }
+
+
+image_cache = ImageCache(func.get_root_path_project() / IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES)
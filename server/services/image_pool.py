@@ -0,0 +1,12 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from core.config import IMAGE_POOL_WORKERS, IMAGE_POOL_MAX_PENDING, IMAGE_POOL_TIMEOUT_SECONDS
+from utils.executor import BoundedExecutor
+
+# Process pool for PIL decode/resize/encode, keeps image work out of the API workers
+image_pool = BoundedExecutor(
+  "Image",
+  lambda: ProcessPoolExecutor(max_workers=IMAGE_POOL_WORKERS),
+  IMAGE_POOL_MAX_PENDING,
+  IMAGE_POOL_TIMEOUT_SECONDS,
+)
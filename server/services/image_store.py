@@ -0,0 +1,197 @@
+import os
+import re
+
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+from fastapi import BackgroundTasks, UploadFile
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from starlette.concurrency import run_in_threadpool
+
+from crud import image_ref as crud_image_ref
+from services import image_variants
+from utils import func
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# File extension of each sniffed image type
+IMAGE_EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "webp": "webp", "avif": "avif"}
+
+# Name of a content addressed image: its SHA-256 digest and extension
+CONTENT_ADDRESSED_PATTERN = re.compile(r"^[0-9a-f]{64}\.[a-z]+$")
+
+# The bytes behind a content addressed URL never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def get_blog_images_dir(namespace: str) -> Path:
+  return func.get_root_path_project() / "storage" / namespace / "blogs"
+
+
+def _place_image(staging_path: Path, file_path: Path):
+  # A stored image already has these bytes, replacing it would only bump the mtime the
+  # image cache and the variants are keyed on. The staging file is dropped by the caller.
+  if not file_path.exists():
+    os.replace(staging_path, file_path)
+
+
+def is_content_addressed(filename: str) -> bool:
+  return CONTENT_ADDRESSED_PATTERN.match(filename) is not None
+
+
+async def store_blog_image(
+    db: AsyncIOMotorDatabase,
+    namespace: str,
+    upload_file: UploadFile,
+    background_tasks: BackgroundTasks,
+) -> str:
+  """
+  Store an uploaded blog image under its SHA-256 digest and count a reference to it.
+  Identical uploads share one file, and its variants are only rendered once.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      namespace (str): The namespace of the blog.
+      upload_file (UploadFile): The uploaded image.
+      background_tasks (BackgroundTasks): Renders the responsive variants of a new image.
+
+  Returns:
+      str: The image URL, relative to the server root.
+
+  Raises:
+      HTTPException: 413 if the upload is too large, 415 if it is not an image.
+  """
+  storage_dir = get_blog_images_dir(namespace)
+  await run_in_threadpool(storage_dir.mkdir, parents=True, exist_ok=True)
+
+  staging_path = storage_dir / f'.upload-{func.random_string(10)}'
+  try:
+    size, digest, image_type = await run_in_threadpool(func.save_upload_image, upload_file, staging_path)
+
+    filename = f'{digest}.{IMAGE_EXTENSIONS[image_type]}'
+    file_path = storage_dir / filename
+
+    # Count the reference before the file is in place, so a concurrent release of the
+    # last reference cannot remove it afterwards
+    await crud_image_ref.acquire_image_ref(db, filename, size)
+    await run_in_threadpool(_place_image, staging_path, file_path)
+  finally:
+    await run_in_threadpool(staging_path.unlink, missing_ok=True)
+
+  background_tasks.add_task(
+    image_variants.generate_blog_image_variants, file_path, image_variants.get_variants_dir(namespace, filename)
+  )
+
+  return f'{namespace}/images/blogs/{filename}'
+
+
+def get_blog_image_path(namespace: str, image_url: Optional[str]) -> Optional[Path]:
+  if not image_url:
+    return None
+  return get_blog_images_dir(namespace) / image_url.split('/')[-1]
+
+
+def _file_size(file_path: Path) -> Optional[int]:
+  try:
+    return file_path.stat().st_size
+  except FileNotFoundError:
+    return None
+
+
+async def acquire_blog_image(db: AsyncIOMotorDatabase, namespace: str, image_url: Optional[str], count: int = 1) -> bool:
+  """
+  Count references to an image that is already stored, for blogs written without an
+  upload such as bulk creates. Call it before writing the blogs. Only content addressed
+  images are shared, an image stored before content addressing belongs to its blog.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      namespace (str): The namespace of the blog.
+      image_url (Optional[str]): The image URL of the blog.
+      count (int): The number of blogs pointing to the image. Defaults to 1.
+
+  Returns:
+      bool: True if the references were counted, False if the image is not a stored
+      content addressed image.
+  """
+  file_path = get_blog_image_path(namespace, image_url)
+  if file_path is None or not is_content_addressed(file_path.name):
+    return False
+
+  size = await run_in_threadpool(_file_size, file_path)
+  if size is None:
+    return False
+
+  # The reference is counted first, a release of the last one racing with it either
+  # restores the file or removed it before, which the check below catches
+  await crud_image_ref.acquire_image_ref(db, file_path.name, size, count)
+  if await run_in_threadpool(file_path.exists):
+    return True
+
+  await crud_image_ref.release_image_ref(db, file_path.name, count)
+  return False
+
+
+async def acquire_blog_images(db: AsyncIOMotorDatabase, namespace: str, image_urls: Iterable[Optional[str]]) -> set[str]:
+  """
+  Count one reference per occurrence of each image URL, see acquire_blog_image.
+
+  Returns:
+      set[str]: The URLs that could not be counted, empty URLs are ignored.
+  """
+  rejected = set()
+  for image_url, count in Counter(url for url in image_urls if url).items():
+    if not await acquire_blog_image(db, namespace, image_url, count):
+      rejected.add(image_url)
+  return rejected
+
+
+async def release_blog_images(db: AsyncIOMotorDatabase, namespace: str, image_urls: Iterable[Optional[str]]):
+  """
+  Drop one reference per occurrence of each image URL, see release_blog_image.
+  """
+  for image_url, count in Counter(url for url in image_urls if url).items():
+    await release_blog_image(db, namespace, image_url, count)
+
+
+async def release_blog_image(db: AsyncIOMotorDatabase, namespace: str, image_url: Optional[str], count: int = 1) -> bool:
+  """
+  Drop the reference of a blog to its image. The file and its variants are removed with
+  the last reference. Images stored before content addressing belong to a single blog
+  and are removed right away.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      namespace (str): The namespace of the blog.
+      image_url (Optional[str]): The image URL of the blog.
+      count (int): The number of blogs that pointed to the image. Defaults to 1.
+
+  Returns:
+      bool: True if the image file was removed.
+  """
+  if not image_url:
+    return False
+
+  filename = image_url.split('/')[-1]
+  if is_content_addressed(filename) and not await crud_image_ref.release_image_ref(db, filename, count):
+    return False
+
+  file_path = get_blog_images_dir(namespace) / filename
+  trash_path = file_path.with_name(f'.{filename}.{func.random_string(8)}.deleted')
+  try:
+    await run_in_threadpool(os.replace, file_path, trash_path)
+  except FileNotFoundError:
+    return False
+
+  # An upload of the same bytes may have counted a new reference meanwhile
+  if is_content_addressed(filename) and await crud_image_ref.has_image_ref(db, filename):
+    await run_in_threadpool(os.replace, trash_path, file_path)
+    return False
+
+  await run_in_threadpool(trash_path.unlink, missing_ok=True)
+  await run_in_threadpool(image_variants.remove_blog_image_variants, image_variants.get_variants_dir(namespace, filename))
+  logger.info(f"Removed blog image {namespace}/{filename}")
+  return True
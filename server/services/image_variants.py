@@ -0,0 +1,187 @@
+import shutil
+
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+from starlette.concurrency import run_in_threadpool
+
+from core.config import IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_TIMEOUT_SECONDS, IMAGE_VARIANT_RETRY_SECONDS
+from services.image_pool import image_pool
+from utils import func
+from utils.cache import TTLCache
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+Image.init()
+AVIF_SUPPORTED = "AVIF" in Image.SAVE
+WEBP_SUPPORTED = "WEBP" in Image.SAVE
+
+# Variant directories currently being rendered by this worker
+_in_progress: set[str] = set()
+
+# Variant directories whose rendering failed, not tried again until their entry expires
+_failed = TTLCache(maxsize=10000, ttl=IMAGE_VARIANT_RETRY_SECONDS)
+
+
+def get_variants_dir(namespace: str, filename: str) -> Path:
+  return func.get_root_path_project() / "storage" / namespace / "blog_variants" / filename
+
+
+# Formats of the variants served to clients that accept neither AVIF nor WebP, one of
+# them is rendered per image, see get_fallback_format
+FALLBACK_FORMATS = ("PNG", "JPEG")
+
+
+def get_fallback_format(source_format: str) -> str:
+  """
+  Format served to clients that accept neither AVIF nor WebP. PNG/GIF sources stay PNG
+  to keep their transparency, everything else is JPEG.
+
+  Args:
+      source_format (str): The PIL format name of the original image.
+  """
+  return "PNG" if source_format in ("PNG", "GIF") else "JPEG"
+
+
+def get_variant_formats(source_format: str) -> list[str]:
+  formats = []
+  if AVIF_SUPPORTED:
+    formats.append("AVIF")
+  if WEBP_SUPPORTED:
+    formats.append("WEBP")
+  formats.append(get_fallback_format(source_format))
+  return formats
+
+
+def get_accepted_types(accept: Optional[str]) -> set[str]:
+  """
+  Media types listed in an Accept header, leaving out those refused with q=0.
+  """
+  accepted = set()
+  for media_range in (accept or "").lower().split(","):
+    media_type, *params = (part.strip() for part in media_range.split(";"))
+    quality = 1.0
+    for param in params:
+      name, _, value = param.partition("=")
+      if name.strip() == "q":
+        try:
+          quality = float(value)
+        except ValueError:
+          quality = 0.0
+    if media_type and quality > 0:
+      accepted.add(media_type)
+  return accepted
+
+
+def negotiate_formats(accept: Optional[str]) -> tuple[str, ...]:
+  """
+  Pick the smallest format the client accepts.
+
+  Args:
+      accept (Optional[str]): The Accept request header.
+
+  Returns:
+      tuple[str, ...]: The PIL format name, or FALLBACK_FORMATS since which one was
+      rendered depends on the original image.
+  """
+  accepted = get_accepted_types(accept)
+  if AVIF_SUPPORTED and "image/avif" in accepted:
+    return ("AVIF",)
+  if WEBP_SUPPORTED and "image/webp" in accepted:
+    return ("WEBP",)
+  return FALLBACK_FORMATS
+
+
+def pick_variant(variants_dir: Path, size: int, format_save: str) -> Optional[Path]:
+  """
+  Find the smallest pre-rendered bucket covering `size`, or the largest one available.
+
+  Buckets above the original size are not rendered, so walking down from the wanted
+  bucket lands on the full size variant.
+
+  Args:
+      variants_dir (Path): The variants directory of the image.
+      size (int): The requested longest edge.
+      format_save (str): The PIL format name.
+
+  Returns:
+      Optional[Path]: The variant, or None if the variants are not rendered yet.
+  """
+  if not variants_dir.exists():
+    return None
+
+  start = min(bisect_left(IMAGE_VARIANT_WIDTHS, size), len(IMAGE_VARIANT_WIDTHS) - 1)
+  for width in reversed(IMAGE_VARIANT_WIDTHS[:start + 1]):
+    path = variants_dir / f'{width}.{format_save.lower()}'
+    if path.exists():
+      return path
+
+  return None
+
+
+def find_variant(accept: Optional[str], variants_dir: Path, size: int) -> Optional[tuple[str, Path]]:
+  """
+  Negotiate the variant format and find the pre-rendered bucket, see negotiate_formats
+  and pick_variant. Only the variant files are looked at, the original image is not
+  opened. Touches the disk, run it in a threadpool.
+
+  Returns:
+      Optional[tuple[str, Path]]: The PIL format name and the variant, None if it is not rendered.
+  """
+  for variant_format in negotiate_formats(accept):
+    variant_path = pick_variant(variants_dir, size, variant_format)
+    if variant_path:
+      return variant_format, variant_path
+  return None
+
+
+def should_generate_variants(variants_dir: Path) -> bool:
+  """
+  Whether rendering the variants of an image is worth scheduling: it is not running
+  already and did not fail in the last IMAGE_VARIANT_RETRY_SECONDS.
+  """
+  key = str(variants_dir)
+  return key not in _in_progress and _failed.get(key) is None
+
+
+async def generate_blog_image_variants(image_path: Path, variants_dir: Path, source_format: Optional[str] = None):
+  """
+  Render the responsive variants of a blog image in the image process pool.
+  Meant to run as a background task, failures are only logged and remembered for
+  IMAGE_VARIANT_RETRY_SECONDS.
+
+  Args:
+      image_path (Path): The original image.
+      variants_dir (Path): The variants directory of the image.
+      source_format (Optional[str]): The PIL format name of the original image, read from it when not given.
+  """
+  key = str(variants_dir)
+  if not should_generate_variants(variants_dir):
+    return
+
+  _in_progress.add(key)
+  try:
+    if await run_in_threadpool(variants_dir.exists):
+      return
+
+    if source_format is None:
+      source_format = await run_in_threadpool(func.get_image_format, image_path)
+    formats = get_variant_formats(source_format)
+    await image_pool.run(
+      func.generate_image_variants, image_path, variants_dir, IMAGE_VARIANT_WIDTHS, formats,
+      timeout=IMAGE_VARIANT_TIMEOUT_SECONDS,
+    )
+    logger.info(f"Generated image variants for {image_path}")
+  except Exception as e:
+    _failed.set(key, True)
+    logger.warning(f"Could not generate image variants for {image_path}, retrying in {IMAGE_VARIANT_RETRY_SECONDS}s: {e}")
+  finally:
+    _in_progress.discard(key)
+
+
+def remove_blog_image_variants(variants_dir: Path):
+  shutil.rmtree(variants_dir, ignore_errors=True)
@@ -0,0 +1,434 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tarfile
+import zipfile
+
+from pathlib import Path
+from typing import IO, AsyncIterator, Iterator, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import BackgroundTasks, HTTPException, UploadFile, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo.errors import PyMongoError
+from starlette.concurrency import run_in_threadpool
+
+from crud import blog as crud_blog
+from crud import category as crud_category
+from crud import item as crud_item
+from crud import image_ref as crud_image_ref
+from schemas.blog import BlogBase
+from schemas.bulk import ImportedRecord
+from schemas.category import CategoryCreate
+from schemas.item import ItemCreate
+from services import image_store, image_variants
+from utils import bulk, func
+from utils.responses import dumps
+
+from core.config import IMPORT_BATCH_SIZE, IMPORT_IMAGE_WORKERS, UPLOAD_MAX_BYTES
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Model validating the records of each collection, and the bulk upsert writing them
+IMPORT_TARGETS = {
+  "blogs": (BlogBase, crud_blog.import_blogs),
+  "categories": (CategoryCreate, crud_category.import_categories),
+  "items": (ItemCreate, crud_item.import_items),
+}
+
+ARCHIVE_ZIP = "zip"
+ARCHIVE_TAR = "tar"
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def detect_archive(archive: UploadFile) -> str:
+  """
+  Tell a zip from a tar archive, compressed or not. Blocking, run it in a threadpool.
+
+  Returns:
+      str: ARCHIVE_ZIP or ARCHIVE_TAR.
+
+  Raises:
+      HTTPException: 400 if the file is neither.
+  """
+  archive.file.seek(0)
+  if zipfile.is_zipfile(archive.file):
+    return ARCHIVE_ZIP
+
+  archive.file.seek(0)
+  try:
+    with tarfile.open(fileobj=archive.file, mode="r:*") as tar:
+      tar.next()
+  except tarfile.TarError:
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="images must be a zip or tar archive")
+  return ARCHIVE_TAR
+
+
+def _read_archive(archive_file: IO[bytes], kind: str) -> Iterator[tuple[str, Optional[bytes], Optional[str]]]:
+  """
+  Read the files of an archive one at a time, as (name, data, error). Only one file is
+  held in memory, files larger than an upload may be are reported instead of read.
+  """
+  archive_file.seek(0)
+  if kind == ARCHIVE_ZIP:
+    with zipfile.ZipFile(archive_file) as archive:
+      for info in archive.infolist():
+        if info.is_dir() or Path(info.filename).name.startswith("."):
+          continue
+        if info.file_size > UPLOAD_MAX_BYTES:
+          yield info.filename, None, "Image is too large"
+          continue
+        yield info.filename, archive.read(info), None
+  else:
+    # Stream mode reads the tar front to back without seeking, compressed or not
+    with tarfile.open(fileobj=archive_file, mode="r|*") as archive:
+      for info in archive:
+        if not info.isfile() or Path(info.name).name.startswith("."):
+          continue
+        if info.size > UPLOAD_MAX_BYTES:
+          yield info.name, None, "Image is too large"
+          continue
+        yield info.name, archive.extractfile(info).read(), None
+
+
+def _image_filename(data: bytes) -> str:
+  """
+  Content addressed file name of an image.
+
+  Raises:
+      ValueError: If the data is not a supported image.
+  """
+  image_type = func.sniff_image_type(data[:16])
+  if image_type is None:
+    raise ValueError("Not a supported image")
+  return f'{hashlib.sha256(data).hexdigest()}.{image_store.IMAGE_EXTENSIONS[image_type]}'
+
+
+def _write_image(file_path: Path, data: bytes):
+  """
+  Write an image under its content addressed path, unless it is stored already. Only
+  call it once a reference to the image is held.
+  """
+  if file_path.exists():
+    return
+
+  staging_path = file_path.with_name(f'.import-{func.random_string(10)}')
+  try:
+    staging_path.write_bytes(data)
+    os.replace(staging_path, file_path)
+  finally:
+    staging_path.unlink(missing_ok=True)
+
+
+async def store_archive_images(
+    db: AsyncIOMotorDatabase,
+    namespace: str,
+    archive: UploadFile,
+    kind: str,
+    errors: list[dict],
+    acquired: set[str]
+) -> dict[str, str]:
+  """
+  Store the images of an archive as content addressed blog images. The archive is read
+  in a thread while IMPORT_IMAGE_WORKERS workers hash and write the files in parallel.
+  Each stored image holds one provisional reference, counted before its file is written
+  and dropped by release_archive_images.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      namespace (str): The namespace of the blogs.
+      archive (UploadFile): A zip or tar archive of images.
+      kind (str): ARCHIVE_ZIP or ARCHIVE_TAR, see detect_archive.
+      errors (list[dict]): Receives the name and error of each file that was not stored.
+      acquired (set[str]): Receives the file names holding a provisional reference, also
+          when the storage fails part way.
+
+  Returns:
+      dict[str, str]: The stored file name by path of the file in the archive, and by
+      file name, the first file of a name wins.
+
+  Raises:
+      PyMongoError: If a reference could not be counted, the archive is not read further.
+  """
+  storage_dir = image_store.get_blog_images_dir(namespace)
+  await run_in_threadpool(storage_dir.mkdir, parents=True, exist_ok=True)
+
+  images: dict[str, str] = {}
+  failure: Optional[BaseException] = None
+  queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_IMAGE_WORKERS)
+
+  async def worker():
+    nonlocal failure
+    while (entry := await queue.get()) is not None:
+      # After a failure the queue is only drained, so the reader never blocks on it
+      if failure is not None:
+        continue
+
+      name, data = entry
+      try:
+        filename = await run_in_threadpool(_image_filename, data)
+        # Held until the blogs are written, so a concurrent release cannot remove the file
+        if filename not in acquired:
+          acquired.add(filename)
+          await crud_image_ref.acquire_image_ref(db, filename, len(data))
+        await run_in_threadpool(_write_image, storage_dir / filename, data)
+      except (ValueError, OSError) as e:
+        errors.append({"image": name, "error": str(e)})
+        continue
+      except Exception as e:
+        failure = e
+        continue
+
+      images[name] = filename
+      images.setdefault(Path(name).name, filename)
+
+  workers = [asyncio.create_task(worker()) for _ in range(max(IMPORT_IMAGE_WORKERS, 1))]
+  try:
+    files = _read_archive(archive.file, kind)
+    while failure is None and (entry := await run_in_threadpool(next, files, None)) is not None:
+      name, data, error = entry
+      if error is not None:
+        errors.append({"image": name, "error": error})
+      else:
+        await queue.put((name, data))
+  except (tarfile.TarError, zipfile.BadZipFile, EOFError, OSError) as e:
+    errors.append({"image": None, "error": f"Invalid archive: {e}"})
+  finally:
+    for _ in workers:
+      await queue.put(None)
+    await asyncio.gather(*workers)
+
+  if failure is not None:
+    raise failure
+  return images
+
+
+async def release_archive_images(db: AsyncIOMotorDatabase, namespace: str, acquired: set[str]):
+  """
+  Drop the provisional references of store_archive_images. Images no blog points to are
+  removed with them.
+  """
+  for filename in acquired:
+    await image_store.release_blog_image(db, namespace, f'{namespace}/images/blogs/{filename}')
+
+
+def resolve_image_urls(namespace: str, image_urls: list[Optional[str]], images: dict[str, str]) -> list[Optional[str]]:
+  """
+  URLs in `namespace` of the images of imported blogs. An image is looked up by its path
+  in the archive, then by file name in the archive and in the stored images, so URLs of
+  an export from another namespace resolve. Checks the files, run it in a threadpool.
+
+  Returns:
+      list[Optional[str]]: The image URLs, empty if a blog has none, None if it is not found.
+  """
+  storage_dir = image_store.get_blog_images_dir(namespace)
+  resolved = []
+  for image_url in image_urls:
+    if not image_url:
+      resolved.append(image_url)
+      continue
+
+    filename = image_url.split('/')[-1]
+    filename = images.get(image_url.removeprefix("./")) or images.get(filename) or filename
+    resolved.append(f'{namespace}/images/blogs/{filename}' if (storage_dir / filename).exists() else None)
+  return resolved
+
+
+def build_import_documents(elements: list, models: list, results: list) -> list[Optional[dict]]:
+  """
+  Documents to write for the validated records, with the _id, created_at and updated_at
+  of the record when it has them. A record without an _id gets a new one.
+  """
+  documents: list[Optional[dict]] = [None] * len(models)
+  for index, model in enumerate(models):
+    if model is None:
+      continue
+
+    try:
+      record = ImportedRecord(**elements[index])
+      object_id = ObjectId(record.id) if record.id else ObjectId()
+    except (ValidationError, InvalidId) as e:
+      bulk.reject_bulk_element(models, results, index, str(e), ordered=False)
+      continue
+
+    document = {**model.model_dump(), "_id": object_id}
+    if record.created_at is not None:
+      document["created_at"] = record.created_at
+    if record.updated_at is not None:
+      document["updated_at"] = record.updated_at
+    documents[index] = document
+  return documents
+
+
+async def _acquire_blog_images(
+    db: AsyncIOMotorDatabase,
+    namespace: str,
+    documents: list[Optional[dict]],
+    results: list,
+    archive_images: dict[str, str]
+) -> dict[int, str]:
+  # Resolve the images of a batch of blogs and count their references before the write
+  indexes = [index for index, document in enumerate(documents) if document is not None and document["image_url"]]
+  resolved = await run_in_threadpool(
+    resolve_image_urls, namespace, [documents[index]["image_url"] for index in indexes], archive_images
+  )
+
+  acquired: dict[int, str] = {}
+  for index, image_url in zip(indexes, resolved):
+    if image_url is None:
+      bulk.reject_bulk_element(documents, results, index, "Image not found", ordered=False)
+    elif not image_store.is_content_addressed(image_url.split('/')[-1]):
+      bulk.reject_bulk_element(documents, results, index, "Image must be a content addressed blog image", ordered=False)
+    else:
+      documents[index]["image_url"] = image_url
+      acquired[index] = image_url
+
+  rejected = await image_store.acquire_blog_images(db, namespace, acquired.values())
+  for index, image_url in list(acquired.items()):
+    if image_url in rejected:
+      bulk.reject_bulk_element(documents, results, index, "Image not found", ordered=False)
+      del acquired[index]
+  return acquired
+
+
+def _open_documents(documents: UploadFile) -> IO[bytes]:
+  documents.file.seek(0)
+  head = documents.file.read(2)
+  documents.file.seek(0)
+  return gzip.GzipFile(fileobj=documents.file, mode="rb") if head == GZIP_MAGIC else documents.file
+
+
+def _read_lines(file: IO[bytes], count: int) -> list[bytes]:
+  lines = []
+  while len(lines) < count and (line := file.readline()):
+    lines.append(line)
+  return lines
+
+
+def _event(event: str, **fields) -> bytes:
+  return dumps({"event": event, **fields}) + b"\n"
+
+
+async def import_documents(
+    db: AsyncIOMotorDatabase,
+    namespace: str,
+    collection: str,
+    documents: UploadFile,
+    images: Optional[UploadFile] = None,
+    archive_kind: Optional[str] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    background_tasks: Optional[BackgroundTasks] = None
+) -> AsyncIterator[bytes]:
+  """
+  Import NDJSON records, optionally gzip compressed, into a collection. Records are read,
+  validated and written one batch at a time, a failing record is reported and the
+  import goes on. Records keep their _id, created_at and updated_at: a record replaces
+  the document with the same _id, so importing an export again updates it rather than
+  duplicating it, and the keyset order of the export is kept.
+
+  With an image archive, blogs point to its images by their path or file name in it, see
+  resolve_image_urls. The archive is stored first, the references of the blogs to their
+  images are counted before the blogs are written and dropped for those that failed or
+  for the image of a replaced blog.
+
+  Args:
+      db (AsyncIOMotorDatabase): The namespace database.
+      namespace (str): The namespace to import into.
+      collection (str): A key of IMPORT_TARGETS.
+      documents (UploadFile): The NDJSON records.
+      images (Optional[UploadFile]): The archive of the blog images.
+      archive_kind (Optional[str]): The kind of `images`, see detect_archive.
+      batch_size (int): The number of records per batch, and of writes running at once.
+      background_tasks (Optional[BackgroundTasks]): Renders the variants of the imported images.
+
+  Yields:
+      bytes: NDJSON progress events: "error" for each record or image that failed, or
+      when a database error stops the import, "images" once the archive is stored,
+      "progress" after each batch and "done" last.
+  """
+  model, write = IMPORT_TARGETS[collection]
+  counts = {"processed": 0, "created": 0, "replaced": 0, "failed": 0}
+
+  archive_images: dict[str, str] = {}
+  acquired_archive: set[str] = set()
+  rendered: set[str] = set()
+  line_number = 0
+  try:
+    if images is not None:
+      image_errors: list[dict] = []
+      try:
+        archive_images = await store_archive_images(db, namespace, images, archive_kind, image_errors, acquired_archive)
+      except PyMongoError:
+        for error in image_errors:
+          yield _event("error", **error)
+        raise
+
+      for error in image_errors:
+        yield _event("error", **error)
+      yield _event("images", stored=len(set(archive_images.values())), failed=len(image_errors))
+
+    file = await run_in_threadpool(_open_documents, documents)
+    while lines := await run_in_threadpool(_read_lines, file, batch_size):
+      elements, line_numbers = [], []
+      for line in lines:
+        line_number += 1
+        if not line.strip():
+          continue
+        line_numbers.append(line_number)
+        try:
+          elements.append(json.loads(line))
+        except ValueError as e:
+          elements.append(bulk.InvalidElement(f"Invalid JSON: {e}"))
+
+      models, results = bulk.validate_bulk_elements(elements, model, ordered=False)
+      records = build_import_documents(elements, models, results)
+
+      acquired: dict[int, str] = {}
+      if collection == "blogs":
+        acquired = await _acquire_blog_images(db, namespace, records, results, archive_images)
+
+      written = await write(db, records, results, batch_size)
+
+      if collection == "blogs":
+        # References of the blogs that were not written, and of the images replaced blogs pointed to
+        await image_store.release_blog_images(db, namespace, [
+          *(image_url for index, image_url in acquired.items() if results[index].status not in bulk.BULK_WRITTEN),
+          *(previous.get("image_url") for _, previous in written if previous is not None),
+        ])
+
+        for image_url in set(acquired.values()):
+          filename = image_url.split('/')[-1]
+          if background_tasks is not None and filename not in rendered:
+            rendered.add(filename)
+            background_tasks.add_task(
+              image_variants.generate_blog_image_variants,
+              image_store.get_blog_images_dir(namespace) / filename,
+              image_variants.get_variants_dir(namespace, filename),
+            )
+
+      for index, result in enumerate(results):
+        if result.status not in bulk.BULK_WRITTEN:
+          yield _event("error", line=line_numbers[index], error=result.error)
+
+      counts["processed"] += len(results)
+      counts["created"] += sum(result.status == bulk.BULK_CREATED for result in results)
+      counts["replaced"] += sum(result.status == bulk.BULK_REPLACED for result in results)
+      counts["failed"] = counts["processed"] - counts["created"] - counts["replaced"]
+      yield _event("progress", **counts)
+  except PyMongoError as e:
+    # The records of the batches before are kept
+    yield _event("error", line=line_number, error=f"Import stopped: {e}")
+  except (OSError, EOFError) as e:
+    # A corrupt gzip stream stops the import, the records before it are kept
+    yield _event("error", line=line_number, error=f"Invalid documents file: {e}")
+  finally:
+    await release_archive_images(db, namespace, acquired_archive)
+
+  logger.info(f"Imported {counts['created'] + counts['replaced']} of {counts['processed']} {collection} into {namespace}")
+  yield _event("done", **counts)
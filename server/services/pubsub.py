@@ -0,0 +1,148 @@
+import abc
+import asyncio
+import contextlib
+
+from collections import defaultdict
+from typing import Any, Callable
+
+from core.config import WS_PUBSUB_BACKEND, WS_PUBSUB_URL
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Called with each message published on a subscribed channel. Handlers must not block,
+# they only hand the message over to local queues.
+MessageHandler = Callable[[str], None]
+
+
+class PubSubBackend(abc.ABC):
+  """
+  Delivers messages published on a channel to every subscriber of that channel, in this
+  worker and, depending on the backend, in the other workers.
+  """
+
+  def __init__(self):
+    self._handlers: dict[str, list[MessageHandler]] = defaultdict(list)
+
+  async def start(self):
+    pass
+
+  async def stop(self):
+    pass
+
+  async def subscribe(self, channel: str, handler: MessageHandler):
+    self._handlers[channel].append(handler)
+
+  @abc.abstractmethod
+  async def publish(self, channel: str, message: str):
+    pass
+
+  def _dispatch(self, channel: str, message: str):
+    for handler in list(self._handlers.get(channel, ())):
+      try:
+        handler(message)
+      except Exception as e:
+        logger.error(f"Error handling pub/sub message on {channel}: {e!r}")
+
+
+class InProcessPubSub(PubSubBackend):
+  """
+  Single worker backend, publish calls the subscribers directly. Several managers can
+  share one instance to stand in for several workers.
+  """
+
+  async def publish(self, channel: str, message: str):
+    self._dispatch(channel, message)
+
+
+class RedisPubSub(PubSubBackend):
+  """
+  Redis backed backend, every worker subscribed to a channel receives what any worker
+  publishes on it. Needs the `redis` package unless a client is given, any object with
+  the redis.asyncio `publish`/`pubsub`/`aclose` API works.
+  """
+
+  def __init__(self, url: str = WS_PUBSUB_URL, client: Any = None, retry_seconds: float = 1.0):
+    super().__init__()
+    self.url = url
+    self.retry_seconds = retry_seconds
+    self._client = client
+    self._pubsub = None
+    self._reader: asyncio.Task = None
+
+  async def start(self):
+    if self._client is None:
+      try:
+        import redis.asyncio as redis
+      except ImportError as e:
+        raise RuntimeError("The redis pub/sub backend needs the redis package") from e
+      self._client = redis.from_url(self.url, decode_responses=True)
+
+    self._pubsub = self._client.pubsub()
+    if self._handlers:
+      await self._pubsub.subscribe(*self._handlers)
+    self._reader = asyncio.create_task(self._read())
+
+  async def stop(self):
+    if self._reader:
+      # Wait for the reader to be done with the connection before closing it
+      self._reader.cancel()
+      with contextlib.suppress(asyncio.CancelledError):
+        await self._reader
+      self._reader = None
+    if self._pubsub:
+      await self._pubsub.aclose()
+      self._pubsub = None
+    if self._client:
+      await self._client.aclose()
+      self._client = None
+
+  async def subscribe(self, channel: str, handler: MessageHandler):
+    first = channel not in self._handlers
+    await super().subscribe(channel, handler)
+    if first and self._pubsub is not None:
+      await self._pubsub.subscribe(channel)
+
+  async def publish(self, channel: str, message: str):
+    await self._client.publish(channel, message)
+
+  async def _read(self):
+    while True:
+      try:
+        # Nothing to listen to until the first subscription
+        if not self._handlers:
+          await asyncio.sleep(self.retry_seconds)
+          continue
+
+        async for message in self._pubsub.listen():
+          if message.get("type") == "message":
+            channel, data = message["channel"], message["data"]
+            self._dispatch(
+              channel.decode() if isinstance(channel, bytes) else channel,
+              data.decode() if isinstance(data, bytes) else data,
+            )
+      except Exception as e:
+        logger.error(f"Redis pub/sub connection lost, retrying: {e!r}")
+        await asyncio.sleep(self.retry_seconds)
+        try:
+          await self._pubsub.subscribe(*self._handlers)
+        except Exception:
+          pass
+
+
+def create_pubsub_backend(name: str = WS_PUBSUB_BACKEND) -> PubSubBackend:
+  """
+  Args:
+      name (str): "memory" for a single worker, "redis" to span workers.
+
+  Returns:
+      PubSubBackend: The backend, not started yet.
+  """
+  if name == "memory":
+    return InProcessPubSub()
+  if name == "redis":
+    return RedisPubSub()
+  raise ValueError(f"Unknown pub/sub backend: {name}")
+
+
+pubsub = create_pubsub_backend()
@@ -0,0 +1,86 @@
+import hashlib
+
+from typing import Any, Callable, Optional
+
+from fastapi import Request, status
+from starlette.responses import Response
+
+from utils.cache import TTLCache
+from utils.responses import MongoJSONResponse
+
+from core.config import RESPONSE_CACHE_MAX_SIZE, RESPONSE_CACHE_MAX_BODY_BYTES
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Clients may reuse a response only after revalidating it with its ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+
+class ResponseCache:
+  """
+  Serialized JSON bodies of public reads, keyed by request and tagged with the content
+  version they were built from. Entries of an older version are never served, so a
+  write only has to bump the version.
+  """
+
+  def __init__(self, maxsize: int, max_body_bytes: int):
+    self.max_body_bytes = max_body_bytes
+    self._entries = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+  @staticmethod
+  def make_key(request: Request) -> str:
+    query = "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+  @staticmethod
+  def make_etag(version: int, key: str) -> str:
+    digest = hashlib.sha256(f"{version}:{key}".encode()).hexdigest()[:20]
+    return f'"{version}-{digest}"'
+
+  @staticmethod
+  def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+      return False
+    if if_none_match.strip() == "*":
+      return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+  async def respond(self, request: Request, version: int, build: Callable[[], Any]) -> Response:
+    """
+    Answer a read from the cache when possible.
+
+    Args:
+        request (Request): The read request.
+        version (int): The current content version of what the response shows.
+        build (Callable[[], Any]): Coroutine function returning the content and the extra
+            response headers, called on a cache miss. The content is serialized as is
+            with MongoJSONResponse.
+
+    Returns:
+        Response: 304 if the client copy is current, else the JSON body with its ETag.
+    """
+    key = self.make_key(request)
+    etag = self.make_etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL}
+
+    if self.etag_matches(request.headers.get("If-None-Match"), etag):
+      return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    entry = self._entries.get(key)
+    if entry is not None and entry[0] == etag:
+      _, body, extra_headers = entry
+      return Response(body, headers={**extra_headers, **headers}, media_type="application/json")
+
+    content, extra_headers = await build()
+    response = MongoJSONResponse(content, headers={**extra_headers, **headers})
+    if len(response.body) <= self.max_body_bytes:
+      self._entries.set(key, (etag, response.body, extra_headers))
+
+    return response
+
+  def clear(self):
+    self._entries.clear()
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_SIZE, RESPONSE_CACHE_MAX_BODY_BYTES)
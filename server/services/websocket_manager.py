@@ -1,23 +1,233 @@
-from fastapi import WebSocket
+import asyncio
+import json
+import re
+
+from typing import Optional
+
+from fastapi import WebSocket, status
+from starlette.websockets import WebSocketState
+
+from core.config import (
+    WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT_SECONDS, WS_SLOW_CONSUMER_POLICY, WS_PUBSUB_CHANNEL,
+    WS_MAX_ROOMS_PER_CLIENT,
+)
+from services.pubsub import PubSubBackend, InProcessPubSub, pubsub
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+# What happens to a client whose send queue is full
+SLOW_CONSUMER_DROP = "drop"
+SLOW_CONSUMER_DISCONNECT = "disconnect"
+
+# Rooms a client can join: a namespace, a blog post, a user or a chat
+ROOM_PATTERN = re.compile(r"^(namespace|blog|user|chat):[\w.\-]{1,100}$")
+
+# Rooms of a single user, only joined by that user once signed in
+USER_ROOM_PREFIX = "user:"
+
+# Rooms carrying the blog events of the server, clients only receive in them
+EVENT_ROOM_PREFIXES = ("namespace:", "blog:")
+
+
+def is_event_room(room: str) -> bool:
+    return room.startswith(EVENT_ROOM_PREFIXES)
+
 
 class Client:
-    def __init__(self, websocket: WebSocket, username: str):
+    """
+    A connected socket with its own bounded send queue, drained by a writer task so a
+    slow client never holds up the others.
+    """
+
+    def __init__(self, websocket: WebSocket, username: str, queue_size: int = WS_SEND_QUEUE_SIZE, user: Optional[str] = None):
         self.websocket = websocket
         self.username = username
-        
+        # The username verified from the access token, None for an anonymous client
+        self.user = user
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.writer: asyncio.Task = None
+        self.dropped = 0
+        self.rooms: set[str] = set()
+
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[Client] = []
+    """
+    Sockets connected to this worker. Broadcasts go through the pub/sub backend, and each
+    worker only writes the messages it receives from it to its own sockets.
+    """
+
+    def __init__(
+        self,
+        backend: PubSubBackend = None,
+        channel: str = WS_PUBSUB_CHANNEL,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+        send_timeout: float = WS_SEND_TIMEOUT_SECONDS,
+        slow_consumer_policy: str = WS_SLOW_CONSUMER_POLICY,
+    ):
+        if slow_consumer_policy not in (SLOW_CONSUMER_DROP, SLOW_CONSUMER_DISCONNECT):
+            raise ValueError(f"Unknown slow consumer policy: {slow_consumer_policy}")
 
-    async def connect(self, websocket: WebSocket, username: str):
-        await websocket.accept()
-        self.active_connections.append(Client(websocket, username))
+        self.backend = backend or InProcessPubSub()
+        self.channel = channel
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.slow_consumer_policy = slow_consumer_policy
+        self.active_connections: dict[WebSocket, Client] = {}
+        self.rooms: dict[str, set[Client]] = {}
+        self._closing: set[asyncio.Task] = set()
+
+    async def start(self):
+        await self.backend.subscribe(self.channel, self._deliver)
+
+    async def connect(self, websocket: WebSocket, username: str, user: Optional[str] = None) -> Client:
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+
+        client = Client(websocket, username, self.queue_size, user)
+        client.writer = asyncio.create_task(self._write(client))
+        self.active_connections[websocket] = client
+        return client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections = [
-            client for client in self.active_connections if client.websocket != websocket
-        ]
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+
+        for room in list(client.rooms):
+            self.unsubscribe(client, room)
+        if client.writer is not asyncio.current_task():
+            client.writer.cancel()
+
+    def subscribe(self, client: Client, room: str):
+        """
+        Args:
+            client (Client): The subscriber.
+            room (str): A ROOM_PATTERN room, such as "namespace:blog" or "blog:<id>".
+
+        Raises:
+            ValueError: If the room name is invalid, is the room of another user or the
+                client joined too many rooms.
+        """
+        if not ROOM_PATTERN.match(room):
+            raise ValueError(f"Invalid room: {room}")
+        if room.startswith(USER_ROOM_PREFIX) and room != f"{USER_ROOM_PREFIX}{client.user}":
+            raise ValueError(f"Not allowed to join {room}")
+        if room not in client.rooms and len(client.rooms) >= WS_MAX_ROOMS_PER_CLIENT:
+            raise ValueError(f"Too many rooms, at most {WS_MAX_ROOMS_PER_CLIENT}")
+
+        client.rooms.add(room)
+        self.rooms.setdefault(room, set()).add(client)
+
+    def unsubscribe(self, client: Client, room: str):
+        client.rooms.discard(room)
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(client)
+            if not members:
+                del self.rooms[room]
+
+    def member_count(self, room: str) -> int:
+        """
+        Number of clients of this worker subscribed to a room.
+        """
+        return len(self.rooms.get(room, ()))
+
+    def room_counts(self, user: Optional[str] = None) -> dict[str, int]:
+        """
+        Number of clients of this worker subscribed to each room. User rooms are left
+        out, except the one of `user`, they would tell who is online.
+        """
+        return {
+            room: len(members) for room, members in self.rooms.items()
+            if not room.startswith(USER_ROOM_PREFIX) or room == f"{USER_ROOM_PREFIX}{user}"
+        }
+
+    def send(self, client: Client, message: str) -> bool:
+        """
+        Queue a message for one client without waiting for the socket.
+
+        Args:
+            client (Client): The recipient.
+            message (str): The text frame to send.
+
+        Returns:
+            bool: False if the client is too slow and the message or the client was dropped.
+        """
+        try:
+            client.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == SLOW_CONSUMER_DISCONNECT:
+            logger.warning(f"Disconnecting slow websocket client {client.username}")
+            self.disconnect(client.websocket)
+            task = asyncio.create_task(self._close(client, status.WS_1013_TRY_AGAIN_LATER))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+            return False
+
+        # Keep the most recent messages, the oldest queued one is dropped
+        client.queue.get_nowait()
+        client.queue.put_nowait(message)
+        client.dropped += 1
+        return False
+
+    async def send_to_room(self, room: str, data: dict, local: bool = False):
+        """
+        Send a JSON message to the subscribers of a room, on every worker.
+
+        Args:
+            room (str): The room.
+            data (dict): The message.
+            local (bool): Only send to the subscribers connected to this worker.
+        """
+        await self.send_to_rooms([(room, data)], local)
+
+    async def send_to_rooms(self, messages: list[tuple[str, dict]], local: bool = False):
+        """
+        Send JSON messages to the subscribers of their room, on every worker, as a single
+        pub/sub message.
+
+        Args:
+            messages (list[tuple[str, dict]]): The room and message of each message.
+            local (bool): Only send to the subscribers connected to this worker.
+        """
+        payload = json.dumps([{"room": room, "text": json.dumps(data, default=str)} for room, data in messages])
+        if local:
+            self._deliver(payload)
+        else:
+            await self._publish(payload)
+
+    async def _publish(self, payload: str):
+        try:
+            await self.backend.publish(self.channel, payload)
+        except Exception as e:
+            # Clients of this worker still get the message
+            logger.error(f"Could not publish websocket message: {e!r}")
+            self._deliver(payload)
+
+    def _deliver(self, payload: str):
+        for data in json.loads(payload):
+            for client in list(self.rooms.get(data["room"], ())):
+                self.send(client, data["text"])
+
+    async def _write(self, client: Client):
+        try:
+            while True:
+                message = await client.queue.get()
+                await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+        except Exception as e:
+            logger.info(f"Dropping websocket client {client.username}: {e!r}")
+            self.disconnect(client.websocket)
+            await self._close(client, status.WS_1011_INTERNAL_ERROR)
+
+    async def _close(self, client: Client, code: int):
+        try:
+            await asyncio.wait_for(client.websocket.close(code=code), self.send_timeout)
+        except Exception:
+            pass
+
 
-    async def broadcast(self, message: str, sender: str):
-        for client in self.active_connections:
-            await client.websocket.send_text(f"{sender}: {message}")
\ No newline at end of file
+manager = ConnectionManager(pubsub)
@@ -0,0 +1,119 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Settings are read when core.config is imported, the tests only need them to be set
+for name, value in {
+  "APP_NAME": "my-blog",
+  "APP_DESCRIPTION": "my-blog tests",
+  "APP_VERSION": "test",
+  "ENV": "test",
+  "API_KEY": "test",
+  "MONGO_DB_URL": "mongodb://localhost:27017",
+  "MONGO_NAMESPACE_DEFAULT": "test",
+  "JWT_SECRET_KEY": "test-secret",
+  "JWT_ACCESS_TOKEN_EXPIRE_MINUTES": "300",
+  "JWT_REFRESH_SECRET_KEY": "test-refresh-secret",
+  "JWT_REFRESH_TOKEN_EXPIRE_MINUTES": "600",
+  "JWT_ALGORITHM": "HS256",
+  "FERNET_KEY": "wHtpRxBBhrM4CnY0PYTKr82-lyJc53mcXXunUKcUgOY=",
+  "BCRYPT_ROUNDS": "4",
+  "IMAGE_CACHE_DIR": tempfile.mkdtemp(prefix="my-blog-image-cache-"),
+}.items():
+  os.environ.setdefault(name, value)
+
+sys.path.insert(0, str(SERVER_DIR))
+# The app mounts ./static
+os.chdir(SERVER_DIR)
+
+
+def _ignore_sort(add):
+  def add_without_sort(self, *args, sort=None, **kwargs):
+    return add(self, *args, **kwargs)
+  return add_without_sort
+
+
+# pymongo 4.11+ passes a sort to the bulk builders, which mongomock does not take yet
+import mongomock.collection  # noqa: E402
+
+for name in ("add_replace", "add_update"):
+  add = getattr(mongomock.collection.BulkOperationBuilder, name)
+  if "sort" not in add.__code__.co_varnames:
+    setattr(mongomock.collection.BulkOperationBuilder, name, _ignore_sort(add))
+
+
+def png_bytes(size: tuple[int, int] = (64, 48), color: tuple[int, int, int] = (200, 10, 10), image_format: str = "PNG") -> bytes:
+  from PIL import Image
+
+  data = io.BytesIO()
+  Image.new("RGB", size, color).save(data, image_format)
+  return data.getvalue()
+
+
+@pytest.fixture(scope="session")
+def client():
+  """
+  The app on an in-memory Mongo, started once for the whole session. Tests keep apart
+  by using a namespace of their own.
+  """
+  from fastapi.testclient import TestClient
+  from mongomock_motor import AsyncMongoMockClient
+
+  import main
+  from core.config import MONGO_NAMESPACE_DEFAULT
+  from db import mongodb
+
+  async def connect_to_mongo() -> bool:
+    if mongodb.client is None:
+      mongodb.client = AsyncMongoMockClient()
+      mongodb.db = mongodb.client[MONGO_NAMESPACE_DEFAULT]
+    return True
+
+  with pytest.MonkeyPatch.context() as monkeypatch:
+    monkeypatch.setattr(mongodb, "connect_to_mongo", connect_to_mongo)
+    monkeypatch.setattr(main, "connect_to_mongo", connect_to_mongo)
+    with TestClient(main.app) as test_client:
+      yield test_client
+
+
+@pytest.fixture
+def namespace():
+  namespace = f"test{uuid.uuid4().hex[:12]}"
+  yield namespace
+  shutil.rmtree(SERVER_DIR / "storage" / namespace, ignore_errors=True)
+
+
+@pytest.fixture
+def mongo(client, namespace):
+  """
+  Runs a coroutine function on the namespace database, in the loop of the app.
+  """
+  from db import mongodb
+
+  def run(function):
+    async def call():
+      return await function(mongodb.client[namespace])
+    return client.portal.call(call)
+
+  return run
+
+
+@pytest.fixture
+def admin_headers(client, namespace, mongo) -> dict:
+  response = client.post(f"/api/v1/{namespace}/register", data={"username": "admin", "password": "secret"})
+  assert response.status_code == 201, response.text
+
+  mongo(lambda db: db["users"].update_one({"username": "admin"}, {"$set": {"role": "admin"}}))
+
+  response = client.post(f"/api/v1/{namespace}/login", data={"username": "admin", "password": "secret"})
+  assert response.status_code == 200, response.text
+  return {"Authorization": f"Bearer {response.json()['access_token']}"}
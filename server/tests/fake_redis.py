@@ -0,0 +1,42 @@
+import asyncio
+
+
+class InMemoryRedis:
+  """
+  Stand-in for a redis.asyncio client, to run RedisPubSub without a server. Clients
+  built on the same broker list see each other's messages, like workers sharing Redis.
+  """
+
+  def __init__(self, broker: list = None):
+    self.broker = broker if broker is not None else []
+
+  def pubsub(self) -> "_InMemoryRedisPubSub":
+    return _InMemoryRedisPubSub(self.broker)
+
+  async def publish(self, channel: str, message: str) -> int:
+    receivers = [connection for connection in self.broker if channel in connection.channels]
+    for connection in receivers:
+      connection.queue.put_nowait({"type": "message", "channel": channel, "data": message})
+    return len(receivers)
+
+  async def aclose(self):
+    pass
+
+
+class _InMemoryRedisPubSub:
+  def __init__(self, broker: list):
+    self.broker = broker
+    self.channels: set[str] = set()
+    self.queue: asyncio.Queue[dict] = asyncio.Queue()
+    broker.append(self)
+
+  async def subscribe(self, *channels: str):
+    self.channels.update(channels)
+
+  async def listen(self):
+    while True:
+      yield await self.queue.get()
+
+  async def aclose(self):
+    if self in self.broker:
+      self.broker.remove(self)
@@ -0,0 +1,18 @@
+from crud import user as user_crud
+
+
+def test_logout_clears_the_session_of_the_namespace(client, namespace, mongo):
+  assert client.post(f"/api/v1/{namespace}/register", data={"username": "reader", "password": "secret"}).status_code == 201
+  response = client.post(f"/api/v1/{namespace}/login", data={"username": "reader", "password": "secret"})
+  headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+  # Signed in requests go through the user cache
+  assert client.get(f"/api/v1/{namespace}/me", headers=headers).status_code == 200
+  assert user_crud._user_cache.get((namespace, "reader")) is not None
+  assert mongo(lambda db: db["users"].find_one({"username": "reader"}))["refresh_token"]
+
+  response = client.post(f"/api/v1/{namespace}/logout", headers=headers)
+
+  assert response.status_code == 200
+  assert user_crud._user_cache.get((namespace, "reader")) is None
+  assert mongo(lambda db: db["users"].find_one({"username": "reader"}))["refresh_token"] is None
@@ -0,0 +1,95 @@
+import json
+
+from bson import ObjectId
+
+
+def _statuses(response) -> list[str]:
+  return [result["status"] for result in response.json()["results"]]
+
+
+def test_bulk_requires_admin(client, namespace):
+  response = client.post(f"/api/v1/{namespace}/items/bulk", json=[{"name": "item", "price": 1}])
+  assert response.status_code == 401
+
+
+def test_ordered_bulk_create_stops_at_first_invalid_record(client, namespace, admin_headers):
+  items = [{"name": f"item{i}", "price": i} for i in range(5)]
+  items[2] = {"name": "no price"}
+
+  response = client.post(f"/api/v1/{namespace}/items/bulk?chunk_size=2", headers=admin_headers, json=items)
+
+  assert response.status_code == 200
+  assert _statuses(response) == ["created", "created", "error", "skipped", "skipped"]
+  assert response.json()["succeeded"] == 2
+  assert len(client.get(f"/api/v1/{namespace}/items/").json()) == 2
+
+
+def test_unordered_bulk_create_writes_every_valid_record(client, namespace, admin_headers):
+  items = [{"name": f"item{i}", "price": i} for i in range(5)]
+  items[2] = {"name": "no price"}
+
+  response = client.post(f"/api/v1/{namespace}/items/bulk?chunk_size=2&ordered=false", headers=admin_headers, json=items)
+
+  assert _statuses(response) == ["created", "created", "error", "created", "created"]
+  assert response.json()["succeeded"] == 4
+  assert sorted(item["name"] for item in client.get(f"/api/v1/{namespace}/items/").json()) == ["item0", "item1", "item3", "item4"]
+
+
+def test_bulk_create_accepts_ndjson(client, namespace, admin_headers):
+  body = "\n".join(json.dumps({"name": f"category{i}", "color": "red"}) for i in range(3)) + "\n{broken\n"
+
+  response = client.post(
+    f"/api/v1/{namespace}/categories/bulk?ordered=false",
+    headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    content=body,
+  )
+
+  assert response.status_code == 200
+  assert _statuses(response) == ["created", "created", "created", "error"]
+
+
+def test_bulk_delete_reports_each_id(client, namespace, admin_headers):
+  response = client.post(
+    f"/api/v1/{namespace}/categories/bulk",
+    headers=admin_headers,
+    json=[{"name": f"category{i}", "color": "red"} for i in range(2)],
+  )
+  ids = [result["id"] for result in response.json()["results"]]
+
+  response = client.post(
+    f"/api/v1/{namespace}/categories/bulk-delete",
+    headers=admin_headers,
+    json={"ids": ids + [ids[0], "not-an-id", str(ObjectId())]},
+  )
+
+  assert response.status_code == 200
+  assert _statuses(response) == ["deleted", "deleted", "skipped", "error", "not_found"]
+  assert response.json()["results"][2]["error"] == "Duplicate id"
+  assert client.get(f"/api/v1/{namespace}/categories/list").json() == []
+
+
+def test_ndjson_lines_may_span_body_chunks(client, namespace, admin_headers):
+  body = "\n".join(json.dumps({"name": f"item{i}", "price": i}) for i in range(4)).encode()
+
+  def chunks():
+    for start in range(0, len(body), 7):
+      yield body[start:start + 7]
+
+  response = client.post(
+    f"/api/v1/{namespace}/items/bulk",
+    headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    content=chunks(),
+  )
+
+  assert response.status_code == 200, response.text
+  assert _statuses(response) == ["created"] * 4
+
+
+def test_bulk_body_may_exceed_the_upload_limit(client, namespace, admin_headers):
+  from core.config import UPLOAD_MAX_BYTES
+
+  items = [{"name": "item", "price": 1, "description": "x" * (UPLOAD_MAX_BYTES + 1)}]
+  response = client.post(f"/api/v1/{namespace}/items/bulk", headers=admin_headers, json=items)
+
+  assert response.status_code == 200, response.text
+  assert _statuses(response) == ["created"]
@@ -0,0 +1,71 @@
+from conftest import png_bytes
+
+BLOG_FORM = {"content": "content", "author": "author", "category": "category", "tags": ["tag"]}
+
+
+def _create_blog(client, namespace, headers, title: str) -> dict:
+  response = client.post(
+    f"/api/v1/{namespace}/blogs/create",
+    headers=headers,
+    data={"title": title, **BLOG_FORM},
+    files={"image": ("image.png", png_bytes(), "image/png")},
+  )
+  assert response.status_code == 201, response.text
+  return response.json()
+
+
+def test_blog_list_answers_304_to_its_etag(client, namespace, admin_headers):
+  for i in range(3):
+    _create_blog(client, namespace, admin_headers, f"blog{i}")
+
+  response = client.get(f"/api/v1/{namespace}/blogs/list?limit=2")
+  etag = response.headers["ETag"]
+  assert response.status_code == 200
+  assert len(response.json()) == 2
+  assert response.headers.get("X-Next-Cursor")
+
+  response = client.get(f"/api/v1/{namespace}/blogs/list?limit=2", headers={"If-None-Match": etag})
+  assert response.status_code == 304
+  assert response.content == b""
+  assert response.headers["ETag"] == etag
+
+
+def test_blog_etag_changes_after_an_update(client, namespace, admin_headers):
+  blog = _create_blog(client, namespace, admin_headers, "before")
+
+  response = client.get(f"/api/v1/{namespace}/blogs/{blog['_id']}")
+  etag = response.headers["ETag"]
+  assert client.get(f"/api/v1/{namespace}/blogs/{blog['_id']}", headers={"If-None-Match": etag}).status_code == 304
+
+  response = client.put(
+    f"/api/v1/{namespace}/blogs/{blog['_id']}/update",
+    headers=admin_headers,
+    data={"title": "after", **BLOG_FORM},
+    files={"image": ("image.png", png_bytes(), "image/png")},
+  )
+  assert response.status_code == 201, response.text
+
+  response = client.get(f"/api/v1/{namespace}/blogs/{blog['_id']}", headers={"If-None-Match": etag})
+  assert response.status_code == 200
+  assert response.headers["ETag"] != etag
+  assert response.json()["title"] == "after"
+
+
+def test_missing_blog_has_no_etag(client, namespace):
+  response = client.get(f"/api/v1/{namespace}/blogs/000000000000000000000000")
+  assert response.status_code == 404
+  assert "ETag" not in response.headers
+
+
+def test_deleting_a_missing_blog_keeps_the_etags(client, namespace, admin_headers, mongo):
+  from bson import ObjectId
+
+  from crud import blog as blog_crud
+
+  _create_blog(client, namespace, admin_headers, "blog")
+  etag = client.get(f"/api/v1/{namespace}/blogs/list").headers["ETag"]
+
+  assert mongo(lambda db: blog_crud.delete_blog(db, str(ObjectId()))) is False
+
+  response = client.get(f"/api/v1/{namespace}/blogs/list", headers={"If-None-Match": etag})
+  assert response.status_code == 304
@@ -0,0 +1,102 @@
+import os
+
+from conftest import SERVER_DIR, png_bytes
+
+BLOG_FORM = {"content": "content", "author": "author", "category": "category", "tags": ["tag"]}
+
+
+def _create_blog(client, namespace, headers, title: str, image: bytes) -> dict:
+  response = client.post(
+    f"/api/v1/{namespace}/blogs/create",
+    headers=headers,
+    data={"title": title, **BLOG_FORM},
+    files={"image": ("image.png", image, "image/png")},
+  )
+  assert response.status_code == 201, response.text
+  return response.json()
+
+
+def _image_refs(mongo) -> dict[str, int]:
+  image_refs = mongo(lambda db: db["image_refs"].find().to_list(None))
+  return {image_ref["_id"]: image_ref["refs"] for image_ref in image_refs}
+
+
+def _stored_images(namespace) -> list[str]:
+  images_dir = SERVER_DIR / "storage" / namespace / "blogs"
+  return sorted(path.name for path in images_dir.iterdir() if path.is_file()) if images_dir.exists() else []
+
+
+def test_identical_uploads_share_one_file(client, namespace, admin_headers, mongo):
+  image = png_bytes()
+  first = _create_blog(client, namespace, admin_headers, "first", image)
+  second = _create_blog(client, namespace, admin_headers, "second", image)
+
+  assert first["image_url"] == second["image_url"]
+  filename = first["image_url"].rsplit("/", 1)[-1]
+  assert _image_refs(mongo) == {filename: 2}
+  assert _stored_images(namespace) == [filename]
+
+
+def test_file_is_removed_with_its_last_reference(client, namespace, admin_headers, mongo):
+  image = png_bytes()
+  first = _create_blog(client, namespace, admin_headers, "first", image)
+  second = _create_blog(client, namespace, admin_headers, "second", image)
+  filename = first["image_url"].rsplit("/", 1)[-1]
+
+  assert client.delete(f"/api/v1/{namespace}/blogs/{first['_id']}/delete", headers=admin_headers).is_success
+  assert _image_refs(mongo) == {filename: 1}
+  assert _stored_images(namespace) == [filename]
+
+  assert client.delete(f"/api/v1/{namespace}/blogs/{second['_id']}/delete", headers=admin_headers).is_success
+  assert _image_refs(mongo) == {}
+  assert _stored_images(namespace) == []
+
+
+def test_replacing_an_image_releases_the_old_one(client, namespace, admin_headers, mongo):
+  blog = _create_blog(client, namespace, admin_headers, "blog", png_bytes((10, 10)))
+  old_filename = blog["image_url"].rsplit("/", 1)[-1]
+
+  response = client.put(
+    f"/api/v1/{namespace}/blogs/{blog['_id']}/update",
+    headers=admin_headers,
+    data={"title": "blog", **BLOG_FORM},
+    files={"image": ("image.png", png_bytes((20, 10)), "image/png")},
+  )
+  assert response.status_code == 201, response.text
+  new_filename = response.json()["image_url"].rsplit("/", 1)[-1]
+
+  assert new_filename != old_filename
+  assert _image_refs(mongo) == {new_filename: 1}
+  assert _stored_images(namespace) == [new_filename]
+
+
+def test_bulk_create_counts_references_and_rejects_unknown_images(client, namespace, admin_headers, mongo):
+  blog = _create_blog(client, namespace, admin_headers, "blog", png_bytes())
+  filename = blog["image_url"].rsplit("/", 1)[-1]
+  records = [{"title": f"copy{i}", **BLOG_FORM, "image_url": blog["image_url"]} for i in range(2)]
+  records.append({"title": "missing", **BLOG_FORM, "image_url": f"{namespace}/images/blogs/missing.png"})
+
+  response = client.post(f"/api/v1/{namespace}/blogs/bulk?ordered=false", headers=admin_headers, json=records)
+
+  assert [result["status"] for result in response.json()["results"]] == ["created", "created", "error"]
+  assert _image_refs(mongo) == {filename: 3}
+
+  ids = [result["id"] for result in response.json()["results"] if result["id"]] + [blog["_id"]]
+  response = client.post(f"/api/v1/{namespace}/blogs/bulk-delete", headers=admin_headers, json={"ids": ids})
+
+  assert [result["status"] for result in response.json()["results"]] == ["deleted"] * 3
+  assert _image_refs(mongo) == {}
+  assert _stored_images(namespace) == []
+
+
+def test_identical_upload_keeps_the_stored_file(client, namespace, admin_headers):
+  image = png_bytes()
+  first = _create_blog(client, namespace, admin_headers, "first", image)
+  file_path = SERVER_DIR / "storage" / namespace / "blogs" / first["image_url"].rsplit("/", 1)[-1]
+  os.utime(file_path, (1_000_000_000, 1_000_000_000))
+
+  _create_blog(client, namespace, admin_headers, "second", image)
+
+  # The image cache and the variants are keyed on the mtime
+  assert file_path.stat().st_mtime == 1_000_000_000
+  assert _stored_images(namespace) == [file_path.name]
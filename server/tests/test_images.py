@@ -0,0 +1,33 @@
+import time
+
+from conftest import png_bytes
+from services import image_variants
+from utils import func
+
+
+def _wait_for_variants(variants_dir):
+  for _ in range(100):
+    if variants_dir.exists():
+      return
+    time.sleep(0.05)
+  raise AssertionError(f"{variants_dir} was not rendered")
+
+
+def test_rendered_variant_is_served_without_opening_the_original(client, namespace, admin_headers, monkeypatch):
+  response = client.post(
+    f"/api/v1/{namespace}/blogs/create",
+    headers=admin_headers,
+    data={"title": "blog", "content": "content", "author": "author", "category": "category", "tags": ["tag"]},
+    files={"image": ("image.png", png_bytes((400, 300)), "image/png")},
+  )
+  image_url = response.json()["image_url"]
+  _wait_for_variants(image_variants.get_variants_dir(namespace, image_url.rsplit("/", 1)[-1]))
+
+  def get_image_format(image_path):
+    raise AssertionError(f"{image_path} was opened")
+
+  monkeypatch.setattr(func, "get_image_format", get_image_format)
+
+  response = client.get(f"/{image_url}?w=100", headers={"Accept": "image/png,*/*"})
+  assert response.status_code == 200
+  assert response.headers["content-type"] == "image/png"
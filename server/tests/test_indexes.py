@@ -0,0 +1,28 @@
+from db.indexes import TEXT_SEARCH_INDEX, USERNAME_INDEX, ensure_indexes
+
+
+def test_a_failing_index_leaves_the_others_in_place(client, namespace, mongo):
+  # Duplicate usernames, such as a check-then-insert race left them, keep the unique index out
+  mongo(lambda db: db["users"].insert_many([{"username": "twin"}, {"username": "twin"}]))
+
+  failed = mongo(ensure_indexes)
+
+  assert failed == {USERNAME_INDEX}
+  assert "created_at_id" in mongo(lambda db: db["users"].index_information())
+  assert "text_search" in mongo(lambda db: db["blogs"].index_information())
+  assert "created_at_id" in mongo(lambda db: db["items"].index_information())
+
+
+def test_register_only_waits_for_the_username_index(client, namespace, mongo):
+  mongo(lambda db: db["blogs"].create_index([("title", "text")], name="text_search"))
+  assert mongo(ensure_indexes) == {TEXT_SEARCH_INDEX}
+
+  response = client.post(f"/api/v1/{namespace}/register", data={"username": "reader", "password": "secret"})
+  assert response.status_code == 201, response.text
+
+
+def test_register_is_unavailable_without_the_username_index(client, namespace, mongo):
+  mongo(lambda db: db["users"].insert_many([{"username": "twin"}, {"username": "twin"}]))
+
+  response = client.post(f"/api/v1/{namespace}/register", data={"username": "reader", "password": "secret"})
+  assert response.status_code == 503
@@ -0,0 +1,23 @@
+def test_keyset_pagination_walks_every_item_once(client, namespace):
+  for i in range(7):
+    assert client.post(f"/api/v1/{namespace}/items", json={"name": f"item{i}", "price": i}).status_code == 201
+
+  pages = []
+  params = {"limit": 3}
+  while True:
+    response = client.get(f"/api/v1/{namespace}/items/", params=params)
+    assert response.status_code == 200
+    pages.append([item["name"] for item in response.json()])
+    cursor = response.headers.get("X-Next-Cursor")
+    if not cursor:
+      break
+    params = {"limit": 3, "cursor": cursor}
+
+  assert [len(page) for page in pages] == [3, 3, 1]
+  names = [name for page in pages for name in page]
+  assert sorted(names) == [f"item{i}" for i in range(7)]
+
+
+def test_invalid_cursor_is_rejected(client, namespace):
+  response = client.get(f"/api/v1/{namespace}/items/", params={"cursor": "garbage"})
+  assert response.status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from starlette.websockets import WebSocketState
+
+from fake_redis import InMemoryRedis
+from services.pubsub import InProcessPubSub, PubSubBackend, RedisPubSub, create_pubsub_backend
+from services.websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+  def __init__(self):
+    self.client_state = WebSocketState.CONNECTED
+    self.sent: list[str] = []
+
+  async def send_text(self, text: str):
+    self.sent.append(text)
+
+  async def close(self, code: int):
+    pass
+
+
+async def _deliver_across(backends: list[PubSubBackend]) -> list[list[str]]:
+  # One manager per backend stands in for one worker, each with a socket in room blog:1
+  managers = [ConnectionManager(backend) for backend in backends]
+  for backend in dict.fromkeys(backends):
+    await backend.start()
+  for manager in managers:
+    await manager.start()
+
+  sockets = []
+  for manager in managers:
+    websocket = FakeWebSocket()
+    client = await manager.connect(websocket, "user")
+    manager.subscribe(client, "blog:1")
+    sockets.append(websocket)
+
+  try:
+    await managers[0].send_to_room("blog:1", {"message": "hello"})
+    await asyncio.sleep(0.05)
+  finally:
+    for backend in dict.fromkeys(backends):
+      await backend.stop()
+  return [websocket.sent for websocket in sockets]
+
+
+def test_backend_must_implement_publish():
+  with pytest.raises(TypeError):
+    PubSubBackend()
+
+
+def test_in_process_backend_reaches_managers_sharing_it():
+  backend = InProcessPubSub()
+  received = asyncio.run(_deliver_across([backend, backend]))
+  assert received == [['{"message": "hello"}']] * 2
+
+
+def test_redis_backend_reaches_every_worker():
+  broker = []
+  backends = [RedisPubSub(client=InMemoryRedis(broker)) for _ in range(3)]
+  received = asyncio.run(_deliver_across(backends))
+  assert received == [['{"message": "hello"}']] * 3
+
+
+def test_create_pubsub_backend():
+  assert isinstance(create_pubsub_backend("memory"), InProcessPubSub)
+  assert isinstance(create_pubsub_backend("redis"), RedisPubSub)
+  with pytest.raises(ValueError):
+    create_pubsub_backend("kafka")
+
+
+def test_redis_backend_stop_waits_for_its_reader():
+  async def start_and_stop():
+    backend = RedisPubSub(client=InMemoryRedis([]))
+    await backend.start()
+    reader = backend._reader
+    await backend.stop()
+    return reader.done()
+
+  assert asyncio.run(start_and_stop())
@@ -0,0 +1,33 @@
+import datetime
+
+import pytest
+
+from bson import ObjectId
+from pydantic import ValidationError
+
+from crud.item import item_repository
+
+
+def test_to_document_matches_the_model_dump():
+  now = datetime.datetime(2020, 1, 2, 3, 4, 5)
+  _id = ObjectId()
+  data = {"_id": _id, "name": "item", "price": 1.5, "created_at": now, "updated_at": now, "unknown": True}
+
+  document = item_repository.to_document(dict(data))
+
+  assert document == {**item_repository.to_model(dict(data)).model_dump(by_alias=True), "_id": _id}
+  assert "unknown" not in document
+
+
+def test_to_document_coerces_through_the_model():
+  _id = ObjectId()
+
+  document = item_repository.to_document({"_id": _id, "name": "item", "price": "2.5"})
+
+  assert document["price"] == 2.5
+  assert document["_id"] == str(_id)
+
+
+def test_to_document_rejects_a_document_missing_required_fields():
+  with pytest.raises(ValidationError):
+    item_repository.to_document({"_id": ObjectId(), "name": "item"})
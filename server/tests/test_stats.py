@@ -0,0 +1,10 @@
+def test_stats_require_admin(client, namespace):
+  assert client.get(f"/api/v1/{namespace}/stats").status_code == 401
+
+
+def test_stats_report_the_log_queue_and_image_cache(client, namespace, admin_headers):
+  response = client.get(f"/api/v1/{namespace}/stats", headers=admin_headers)
+
+  assert response.status_code == 200
+  assert set(response.json()["log_queue"]) == {"queued", "dropped"}
+  assert {"hits", "misses", "bytes", "max_bytes"} <= set(response.json()["image_cache"])
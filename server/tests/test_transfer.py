@@ -0,0 +1,138 @@
+import gzip
+import io
+import json
+import zipfile
+
+from conftest import SERVER_DIR, png_bytes
+
+BLOG_RECORD = {"content": "content", "author": "author", "category": "category", "tags": ["tag"]}
+
+
+def _images_zip(**images: bytes) -> bytes:
+  data = io.BytesIO()
+  with zipfile.ZipFile(data, "w") as archive:
+    for name, image in images.items():
+      archive.writestr(name, image)
+  return data.getvalue()
+
+
+def _import(client, namespace, headers, collection: str, documents: bytes, images: bytes = None) -> list[dict]:
+  files = {"documents": ("documents.ndjson", documents)}
+  if images is not None:
+    files["images"] = ("images.zip", images)
+  response = client.post(f"/api/v1/{namespace}/import/{collection}", headers=headers, files=files)
+  assert response.status_code == 200, response.text
+  return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _export(client, namespace, headers, collection: str) -> list[dict]:
+  response = client.get(f"/api/v1/{namespace}/export/{collection}", headers=headers)
+  assert response.status_code == 200, response.text
+  return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _image_refs(mongo) -> dict[str, int]:
+  image_refs = mongo(lambda db: db["image_refs"].find().to_list(None))
+  return {image_ref["_id"]: image_ref["refs"] for image_ref in image_refs}
+
+
+def test_transfer_requires_admin(client, namespace):
+  assert client.get(f"/api/v1/{namespace}/export/items").status_code == 401
+
+
+def test_unknown_collection(client, namespace, admin_headers):
+  assert client.get(f"/api/v1/{namespace}/export/users", headers=admin_headers).status_code == 404
+
+
+def test_export_import_round_trip_keeps_ids_and_timestamps(client, namespace, admin_headers):
+  response = client.post(f"/api/v1/{namespace}/items/bulk", headers=admin_headers, json=[{"name": f"item{i}", "price": i} for i in range(3)])
+  assert response.json()["succeeded"] == 3
+  exported = _export(client, namespace, admin_headers, "items")
+  assert [item["name"] for item in exported] == ["item0", "item1", "item2"]
+
+  edited = [{**item, "price": item["price"] + 10} for item in exported]
+  documents = gzip.compress("\n".join(json.dumps(item) for item in edited).encode())
+  events = _import(client, namespace, admin_headers, "items", documents)
+
+  assert events[-1] == {"event": "done", "processed": 3, "created": 0, "replaced": 3, "failed": 0}
+  reexported = _export(client, namespace, admin_headers, "items")
+  assert [(item["_id"], item["created_at"], item["updated_at"]) for item in reexported] == [
+    (item["_id"], item["created_at"], item["updated_at"]) for item in exported
+  ]
+  assert [item["price"] for item in reexported] == [10, 11, 12]
+
+
+def test_import_into_another_namespace_creates_the_documents(client, namespace, admin_headers):
+  exported = [{"_id": "6ad5377a5e64017ff4859200", "name": "category", "color": "red", "created_at": "2020-01-02T03:04:05"}]
+  events = _import(client, namespace, admin_headers, "categories", json.dumps(exported[0]).encode())
+
+  assert events[-1]["created"] == 1
+  imported = _export(client, namespace, admin_headers, "categories")
+  assert imported[0]["_id"] == exported[0]["_id"]
+  assert imported[0]["created_at"].startswith("2020-01-02T03:04:05")
+
+
+def test_blog_images_are_counted_once_per_blog(client, namespace, admin_headers, mongo):
+  records = [{"title": f"blog{i}", **BLOG_RECORD, "image_url": "cover.png"} for i in range(3)]
+  documents = "\n".join(json.dumps(record) for record in records).encode()
+  events = _import(client, namespace, admin_headers, "blogs", documents, _images_zip(**{"cover.png": png_bytes()}))
+
+  assert events[-1]["created"] == 3
+  image_refs = _image_refs(mongo)
+  assert list(image_refs.values()) == [3]
+
+  # Importing the export again replaces the blogs without counting their images twice
+  exported = _export(client, namespace, admin_headers, "blogs")
+  documents = "\n".join(json.dumps(blog) for blog in exported).encode()
+  events = _import(client, namespace, admin_headers, "blogs", documents)
+
+  assert events[-1] == {"event": "done", "processed": 3, "created": 0, "replaced": 3, "failed": 0}
+  assert _image_refs(mongo) == image_refs
+  assert [blog["_id"] for blog in _export(client, namespace, admin_headers, "blogs")] == [blog["_id"] for blog in exported]
+
+
+def test_replaced_blog_releases_its_previous_image(client, namespace, admin_headers, mongo):
+  record = {"title": "blog", **BLOG_RECORD, "image_url": "first.png"}
+  _import(client, namespace, admin_headers, "blogs", json.dumps(record).encode(), _images_zip(**{"first.png": png_bytes((10, 10))}))
+  blog = _export(client, namespace, admin_headers, "blogs")[0]
+  first_filename = next(iter(_image_refs(mongo)))
+
+  blog["image_url"] = "second.png"
+  events = _import(client, namespace, admin_headers, "blogs", json.dumps(blog).encode(), _images_zip(**{"second.png": png_bytes((20, 10))}))
+
+  assert events[-1]["replaced"] == 1
+  image_refs = _image_refs(mongo)
+  assert first_filename not in image_refs
+  assert list(image_refs.values()) == [1]
+  assert sorted(path.name for path in (SERVER_DIR / "storage" / namespace / "blogs").iterdir() if path.is_file()) == list(image_refs)
+
+
+def test_blog_without_its_image_fails(client, namespace, admin_headers, mongo):
+  record = {"title": "blog", **BLOG_RECORD, "image_url": "missing.png"}
+  events = _import(client, namespace, admin_headers, "blogs", json.dumps(record).encode(), _images_zip(**{"other.png": png_bytes()}))
+
+  assert events[-1]["failed"] == 1
+  assert _export(client, namespace, admin_headers, "blogs") == []
+  assert _image_refs(mongo) == {}
+
+
+def test_import_writes_one_bulk_write_per_batch(client, namespace, admin_headers, monkeypatch):
+  from motor.motor_asyncio import AsyncIOMotorCollection
+  from mongomock_motor import AsyncMongoMockCollection
+
+  calls = []
+  for collection_class in (AsyncIOMotorCollection, AsyncMongoMockCollection):
+    bulk_write = collection_class.bulk_write
+
+    async def counting_bulk_write(self, requests, *args, bulk_write=bulk_write, **kwargs):
+      calls.append(len(requests))
+      return await bulk_write(self, requests, *args, **kwargs)
+
+    monkeypatch.setattr(collection_class, "bulk_write", counting_bulk_write)
+
+  documents = "\n".join(json.dumps({"name": f"item{i}", "price": i}) for i in range(5)).encode()
+  files = {"documents": ("documents.ndjson", documents)}
+  response = client.post(f"/api/v1/{namespace}/import/items?batch_size=2", headers=admin_headers, files=files)
+
+  assert json.loads(response.text.splitlines()[-1])["created"] == 5
+  assert calls == [2, 2, 1]
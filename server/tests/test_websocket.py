@@ -0,0 +1,36 @@
+import json
+
+
+def _receive(websocket) -> dict:
+  return json.loads(websocket.receive_text())
+
+
+def test_event_rooms_are_receive_only(client):
+  with client.websocket_connect("/api/v1/ws/socket") as websocket:
+    websocket.send_text(json.dumps({"username": "guest", "rooms": ["blog:1"]}))
+    assert _receive(websocket)["type"] == "subscribed"
+
+    websocket.send_text(json.dumps({"action": "send", "room": "blog:1", "message": "spoofed"}))
+    assert _receive(websocket) == {"type": "error", "error": "blog:1 is receive-only"}
+
+    websocket.send_text("hello")
+    assert _receive(websocket)["error"] == "Join a chat room before sending messages"
+
+
+def test_anonymous_senders_are_not_verified(client, namespace, admin_headers):
+  token = admin_headers["Authorization"].split(" ", 1)[1]
+
+  with client.websocket_connect("/api/v1/ws/socket") as guest, client.websocket_connect(f"/api/v1/ws/socket?access_token={token}") as admin:
+    guest.send_text(json.dumps({"username": "admin", "rooms": ["chat:lobby"]}))
+    admin.send_text(json.dumps({"rooms": ["chat:lobby"]}))
+    assert _receive(guest)["type"] == "subscribed"
+    assert _receive(admin)["type"] == "subscribed"
+
+    guest.send_text("from the guest")
+    message = _receive(admin)
+    assert (message["sender"], message["verified"]) == ("admin", False)
+    _receive(guest)
+
+    admin.send_text("from the admin")
+    message = _receive(guest)
+    assert (message["sender"], message["verified"]) == ("admin", True)
@@ -0,0 +1,334 @@
+import asyncio
+import json
+
+from typing import Any, Optional, Type
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel, ValidationError
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from schemas.bulk import BulkItemResult, BulkResponse
+
+from core.config import BULK_MAX_ITEMS, BULK_MAX_BYTES
+
+BULK_CREATED = "created"
+BULK_REPLACED = "replaced"
+BULK_DELETED = "deleted"
+BULK_NOT_FOUND = "not_found"
+BULK_ERROR = "error"
+BULK_SKIPPED = "skipped"
+
+# Statuses of the elements that were written
+BULK_WRITTEN = (BULK_CREATED, BULK_REPLACED)
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class InvalidElement:
+  """
+  Placeholder for an NDJSON line that is not valid JSON, reported in its result.
+  """
+
+  def __init__(self, error: str):
+    self.error = error
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+  try:
+    return json.loads(line)
+  except ValueError as e:
+    return InvalidElement(f"Invalid JSON: {e}")
+
+
+def _too_many_elements() -> HTTPException:
+  return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {BULK_MAX_ITEMS} elements per request")
+
+
+async def _read_body_chunks(request: Request):
+  # The middleware only sees the declared length, a chunked body is counted here
+  size = 0
+  async for chunk in request.stream():
+    size += len(chunk)
+    if size > BULK_MAX_BYTES:
+      raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="Request body is too large")
+    yield chunk
+
+
+async def read_bulk_elements(request: Request) -> list[Any]:
+  """
+  Read the elements of a bulk request: a JSON array, or one JSON value per line when the
+  content type is NDJSON. NDJSON is parsed line by line as the body streams in.
+
+  Args:
+      request (Request): The request.
+
+  Returns:
+      list[Any]: The elements, malformed NDJSON lines as InvalidElement.
+
+  Raises:
+      HTTPException: 400 if the body is not a JSON array, or has more than BULK_MAX_ITEMS
+      elements, 413 if it is larger than BULK_MAX_BYTES.
+  """
+  content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+  if content_type not in NDJSON_MEDIA_TYPES:
+    body = b"".join([chunk async for chunk in _read_body_chunks(request)])
+    try:
+      elements = json.loads(body)
+    except ValueError as e:
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+    if not isinstance(elements, list):
+      raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array")
+    if len(elements) > BULK_MAX_ITEMS:
+      raise _too_many_elements()
+    return elements
+
+  elements = []
+  pending = b""
+  async for chunk in _read_body_chunks(request):
+    *lines, pending = (pending + chunk).split(b"\n")
+    for line in lines:
+      if line.strip():
+        elements.append(_parse_ndjson_line(line))
+    if len(elements) > BULK_MAX_ITEMS:
+      raise _too_many_elements()
+
+  if pending.strip():
+    elements.append(_parse_ndjson_line(pending))
+  if len(elements) > BULK_MAX_ITEMS:
+    raise _too_many_elements()
+
+  return elements
+
+
+def validate_bulk_elements(
+    elements: list[Any],
+    model: Type[BaseModel],
+    ordered: bool = True
+) -> tuple[list[Optional[BaseModel]], list[BulkItemResult]]:
+  """
+  Validate each element against `model`. Invalid elements get an error result, and with
+  `ordered` every element after the first invalid one is skipped.
+
+  Returns:
+      tuple: The models, None where an element is not to be written, and the results.
+  """
+  models: list[Optional[BaseModel]] = []
+  results = [BulkItemResult(index=index, status=BULK_SKIPPED) for index in range(len(elements))]
+
+  for element in elements:
+    try:
+      if isinstance(element, InvalidElement):
+        raise ValueError(element.error)
+      if not isinstance(element, dict):
+        raise ValueError("Expected a JSON object")
+      models.append(model(**element))
+    except (ValueError, ValidationError) as e:
+      models.append(e)
+
+  for index, model_or_error in enumerate(models):
+    if isinstance(model_or_error, Exception):
+      reject_bulk_element(models, results, index, str(model_or_error), ordered)
+
+  return models, results
+
+
+def reject_bulk_element(models: list, results: list[BulkItemResult], index: int, error: str, ordered: bool = True):
+  """
+  Leave an element out of a bulk write with an error, and with `ordered` every element after it.
+  """
+  if models[index] is None:
+    return
+
+  results[index].status = BULK_ERROR
+  results[index].error = error
+  models[index] = None
+  if ordered:
+    models[index + 1:] = [None] * (len(models) - index - 1)
+
+
+def _chunks(items: list, chunk_size: int):
+  for start in range(0, len(items), max(chunk_size, 1)):
+    yield items[start:start + chunk_size]
+
+
+async def insert_bulk(
+    collection: AsyncIOMotorCollection,
+    documents: list[Optional[dict]],
+    results: list[BulkItemResult],
+    ordered: bool = True,
+    chunk_size: int = 500
+) -> list[dict]:
+  """
+  Insert documents with one insert_many per chunk and record the outcome of each in
+  `results`. With `ordered` the first failure stops the insert, like Mongo does.
+
+  Args:
+      collection (AsyncIOMotorCollection): The collection.
+      documents (list[Optional[dict]]): The documents by element index, None to leave one out.
+      results (list[BulkItemResult]): The results by element index, updated in place.
+      ordered (bool): Stop at the first failure.
+      chunk_size (int): The number of documents per insert_many.
+
+  Returns:
+      list[dict]: The inserted documents, with their _id.
+  """
+  pending = [(index, document) for index, document in enumerate(documents) if document is not None]
+  inserted = []
+
+  for chunk in _chunks(pending, chunk_size):
+    failed: dict[int, str] = {}
+    try:
+      await collection.insert_many([document for _, document in chunk], ordered=ordered)
+    except BulkWriteError as e:
+      failed = {error["index"]: error.get("errmsg", "Write error") for error in e.details.get("writeErrors", [])}
+    except PyMongoError as e:
+      failed = {position: str(e) for position in range(len(chunk))}
+
+    for position, (index, document) in enumerate(chunk):
+      if position in failed:
+        results[index].status = BULK_ERROR
+        results[index].error = failed[position]
+      elif ordered and failed and position > min(failed):
+        results[index].status = BULK_SKIPPED
+      else:
+        results[index].status = BULK_CREATED
+        results[index].id = str(document["_id"])
+        inserted.append(document)
+
+    if ordered and failed:
+      break
+
+  return inserted
+
+
+async def upsert_bulk(
+    collection: AsyncIOMotorCollection,
+    documents: list[Optional[dict]],
+    results: list[BulkItemResult],
+    chunk_size: int = 500,
+    projection: Optional[dict] = None
+) -> list[tuple[dict, Optional[dict]]]:
+  """
+  Write documents that carry their _id with one unordered bulk_write of ReplaceOne
+  upserts per chunk, so writing the same documents again replaces them instead of
+  duplicating them. Each result is "created" or "replaced", a failure does not stop the
+  others.
+
+  Args:
+      collection (AsyncIOMotorCollection): The collection.
+      documents (list[Optional[dict]]): The documents by element index, None to leave one out.
+      results (list[BulkItemResult]): The results by element index, updated in place.
+      chunk_size (int): The number of documents per bulk_write.
+      projection (Optional[dict]): Fields of the replaced documents to return, read with
+          one find per chunk before the write.
+
+  Returns:
+      list[tuple[dict, Optional[dict]]]: Each written document, with the document it
+      replaced, None if it was created.
+  """
+  pending = [(index, document) for index, document in enumerate(documents) if document is not None]
+  written = []
+
+  for chunk in _chunks(pending, chunk_size):
+    ids = [document["_id"] for _, document in chunk]
+    failed: dict[int, str] = {}
+    upserted: dict[int, Any] = {}
+    previous: dict[Any, dict] = {}
+    try:
+      if projection:
+        async for found in collection.find({"_id": {"$in": ids}}, {**projection, "_id": 1}):
+          previous[found["_id"]] = found
+
+      result = await collection.bulk_write(
+        [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for _, document in chunk],
+        ordered=False,
+      )
+      upserted = result.upserted_ids or {}
+    except BulkWriteError as e:
+      failed = {error["index"]: error.get("errmsg", "Write error") for error in e.details.get("writeErrors", [])}
+      upserted = {upsert["index"]: upsert["_id"] for upsert in e.details.get("upserted", [])}
+    except PyMongoError as e:
+      failed = {position: str(e) for position in range(len(chunk))}
+
+    for position, (index, document) in enumerate(chunk):
+      if position in failed:
+        results[index].status = BULK_ERROR
+        results[index].error = failed[position]
+        continue
+
+      created = position in upserted
+      results[index].status = BULK_CREATED if created else BULK_REPLACED
+      results[index].id = str(document["_id"])
+      written.append((document, None if created else previous.get(document["_id"], {"_id": document["_id"]})))
+
+  return written
+
+
+async def delete_bulk(
+    collection: AsyncIOMotorCollection,
+    ids: list[str],
+    chunk_size: int = 500,
+    projection: Optional[dict] = None
+) -> tuple[list[BulkItemResult], list[dict]]:
+  """
+  Delete documents by id with one find_one_and_delete each, chunk_size of them at a
+  time. A document is only reported deleted, and returned, by the call that removed it,
+  so a concurrent delete of the same document is never counted twice. Repeated ids are
+  skipped after their first occurrence.
+
+  Args:
+      collection (AsyncIOMotorCollection): The collection.
+      ids (list[str]): The ids to delete.
+      chunk_size (int): The number of deletes running at once.
+      projection (Optional[dict]): Fields of the deleted documents to return.
+
+  Returns:
+      tuple: The results by index of `ids`, and the deleted documents.
+  """
+  results = [BulkItemResult(index=index, status=BULK_NOT_FOUND, id=str(_id)) for index, _id in enumerate(ids)]
+  object_ids: list[tuple[int, ObjectId]] = []
+  seen: set[ObjectId] = set()
+  for index, _id in enumerate(ids):
+    try:
+      object_id = ObjectId(_id)
+    except (InvalidId, TypeError):
+      results[index].status = BULK_ERROR
+      results[index].error = "Invalid id"
+      continue
+
+    if object_id in seen:
+      results[index].status = BULK_SKIPPED
+      results[index].error = "Duplicate id"
+      continue
+    seen.add(object_id)
+    object_ids.append((index, object_id))
+
+  deleted = []
+  for chunk in _chunks(object_ids, chunk_size):
+    found = await asyncio.gather(
+      *(collection.find_one_and_delete({"_id": object_id}, projection or {"_id": 1}) for _, object_id in chunk),
+      return_exceptions=True,
+    )
+
+    for (index, _), document in zip(chunk, found):
+      if isinstance(document, PyMongoError):
+        results[index].status = BULK_ERROR
+        results[index].error = str(document)
+      elif isinstance(document, BaseException):
+        raise document
+      elif document is not None:
+        results[index].status = BULK_DELETED
+        deleted.append(document)
+
+  return results, deleted
+
+
+def summarize_bulk(results: list[BulkItemResult]) -> BulkResponse:
+  succeeded = sum(result.status in (BULK_CREATED, BULK_REPLACED, BULK_DELETED) for result in results)
+  skipped = sum(result.status == BULK_SKIPPED for result in results)
+  return BulkResponse(succeeded=succeeded, failed=len(results) - succeeded - skipped, skipped=skipped, results=results)
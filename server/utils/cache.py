@@ -0,0 +1,62 @@
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+  """
+  Size bounded in-memory cache whose entries expire after a time to live.
+  Least recently used entries are dropped first when the cache is full.
+  """
+
+  def __init__(self, maxsize: int, ttl: float):
+    self.maxsize = maxsize
+    self.ttl = ttl
+
+    self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key: Hashable, default: Any = None) -> Any:
+    with self._lock:
+      entry = self._data.get(key)
+      if entry is None:
+        return default
+
+      expires_at, value = entry
+      if expires_at <= time.monotonic():
+        del self._data[key]
+        return default
+
+      self._data.move_to_end(key)
+      return value
+
+  def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+    """
+    Args:
+        key (Hashable): The cache key.
+        value (Any): The value to cache.
+        ttl (Optional[float]): Overrides the cache ttl for this entry, in seconds.
+    """
+    if self.maxsize <= 0:
+      return
+
+    expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+    with self._lock:
+      self._data[key] = (expires_at, value)
+      self._data.move_to_end(key)
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def pop(self, key: Hashable, default: Any = None) -> Any:
+    with self._lock:
+      entry = self._data.pop(key, None)
+    return default if entry is None else entry[1]
+
+  def clear(self):
+    with self._lock:
+      self._data.clear()
+
+  def __len__(self) -> int:
+    return len(self._data)
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+from concurrent.futures import Executor, BrokenExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException, status
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class BoundedExecutor:
+  """
+  Dedicated executor for CPU heavy work, with a cap on queued jobs and a timeout.
+
+  When more than `max_pending` jobs are queued or running, or a job exceeds `timeout`,
+  callers get a 503 instead of piling up behind the pool and starving the API workers.
+  """
+
+  def __init__(self, name: str, executor_factory: Callable[[], Executor], max_pending: int, timeout: float):
+    """
+    Args:
+        name (str): Shown in the 503 details, e.g. "Image".
+        executor_factory (Callable[[], Executor]): Builds the executor on first use.
+        max_pending (int): Maximum number of queued plus running jobs.
+        timeout (float): Seconds a caller waits for its job.
+    """
+    self.name = name
+    self.max_pending = max_pending
+    self.timeout = timeout
+
+    self.pending = 0
+
+    self._executor_factory = executor_factory
+    self._executor: Executor = None
+    self._lock = threading.Lock()
+
+  def _get_executor(self) -> Executor:
+    if self._executor is None:
+      self._executor = self._executor_factory()
+    return self._executor
+
+  def _release(self, _future=None):
+    with self._lock:
+      self.pending -= 1
+
+  @staticmethod
+  def _unavailable(detail: str) -> HTTPException:
+    return HTTPException(
+      status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+      detail=detail,
+      headers={"Retry-After": "1"},
+    )
+
+  async def run(self, fn: Callable, *args, timeout: float = None) -> Any:
+    """
+    Run `fn(*args)` in the pool. With a process pool, `fn` and its arguments must be picklable.
+
+    Args:
+        fn (Callable): The function to run.
+        timeout (float, optional): Overrides the pool timeout for this job.
+
+    Raises:
+        HTTPException: 503 if the pool is saturated or the job times out.
+    """
+    with self._lock:
+      if self.pending >= self.max_pending:
+        raise self._unavailable(f"{self.name} workers are busy, try again later")
+      self.pending += 1
+
+    try:
+      future = self._get_executor().submit(fn, *args)
+    except BrokenExecutor:
+      self._release()
+      self._executor = None
+      logger.error(f"{self.name} pool is broken, recreating it")
+      raise self._unavailable(f"{self.name} workers are restarting, try again later")
+
+    # The slot is freed when the job really finishes, not when the caller gives up on it
+    future.add_done_callback(self._release)
+
+    try:
+      return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout or self.timeout)
+    except asyncio.TimeoutError:
+      future.cancel()
+      raise self._unavailable(f"{self.name} processing timed out")
+    except BrokenExecutor:
+      self._executor = None
+      logger.error(f"{self.name} pool is broken, recreating it")
+      raise self._unavailable(f"{self.name} workers are restarting, try again later")
+
+  def shutdown(self):
+    if self._executor is not None:
+      self._executor.shutdown(wait=False, cancel_futures=True)
+      self._executor = None
+
@@ -1,18 +1,19 @@
 from io import BytesIO
-from typing import Any, BinaryIO
+from typing import Any, BinaryIO, Optional
 
 from PIL.ImageFile import ImageFile
 from bson import ObjectId
 
-import io, os, re, random, unicodedata
+import io, os, re, random, shutil, hashlib, unicodedata
 from pathlib import Path
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, UploadFile, HTTPException
 from fastapi import status
 from starlette.responses import JSONResponse
 
 from PIL import Image
 
+from core.config import UPLOAD_MAX_BYTES, UPLOAD_CHUNK_SIZE
 from core.logger import get_logger
 
 logger = get_logger(__name__)
@@ -95,15 +96,175 @@ def convert_filename(filename: str) -> str:
 
   return f"{name}{ext.lower()}"
 
-def resize_image(image_path: Path, width: int, height: int) -> tuple[BytesIO, str]:
+def save_upload_file(upload_file: UploadFile, file_path: Path) -> None:
+  """
+  Write an uploaded file to disk. Blocking, run it in a threadpool from async code.
+
+  Args:
+      upload_file (UploadFile): The uploaded file.
+      file_path (Path): The destination path.
+  """
+  with open(file_path, "wb") as f:
+    shutil.copyfileobj(upload_file.file, f, UPLOAD_CHUNK_SIZE)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+  """
+  Detect the image type from the first bytes of a file.
+
+  Args:
+      head (bytes): At least the first 12 bytes of the file.
+
+  Returns:
+      Optional[str]: "jpeg", "png", "gif", "webp" or "avif", None if it is not a known image.
+  """
+  if head.startswith(b"\xff\xd8\xff"):
+    return "jpeg"
+  if head.startswith(b"\x89PNG\r\n\x1a\n"):
+    return "png"
+  if head[:6] in (b"GIF87a", b"GIF89a"):
+    return "gif"
+  if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+    return "webp"
+  if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis"):
+    return "avif"
+  return None
+
+
+def save_upload_image(upload_file: UploadFile, file_path: Path, max_bytes: int = None) -> tuple[int, str, str]:
+  """
+  Stream an uploaded image to disk in UPLOAD_CHUNK_SIZE chunks, so memory use does not
+  depend on the file size. The content hash and image type are computed on the way and
+  the file is written to a temporary name, then atomically renamed to `file_path`.
+  Blocking, run it in a threadpool from async code.
+
+  Args:
+      upload_file (UploadFile): The uploaded file.
+      file_path (Path): The destination path.
+      max_bytes (int, optional): Maximum accepted size. Defaults to UPLOAD_MAX_BYTES.
+
+  Returns:
+      tuple[int, str, str]: The size in bytes, the SHA-256 hex digest and the image type.
+
+  Raises:
+      HTTPException: 413 if the upload is too large, 415 if it is not an image.
+  """
+  max_bytes = max_bytes or UPLOAD_MAX_BYTES
+  if upload_file.size is not None and upload_file.size > max_bytes:
+    raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="Uploaded file is too large")
+
+  tmp_path = file_path.with_name(f'.{file_path.name}.{random_string(8)}.tmp')
+  digest = hashlib.sha256()
+  size = 0
+  image_type = None
+
+  upload_file.file.seek(0)
+  try:
+    with open(tmp_path, "wb") as f:
+      while chunk := upload_file.file.read(UPLOAD_CHUNK_SIZE):
+        if image_type is None:
+          image_type = sniff_image_type(chunk[:16])
+          if image_type is None:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Uploaded file is not a supported image")
+
+        size += len(chunk)
+        if size > max_bytes:
+          raise HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail="Uploaded file is too large")
+
+        digest.update(chunk)
+        f.write(chunk)
+
+    if image_type is None:
+      raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Uploaded file is empty")
+
+    os.replace(tmp_path, file_path)
+  except BaseException:
+    tmp_path.unlink(missing_ok=True)
+    raise
+
+  return size, digest.hexdigest(), image_type
+
+
+def get_image_format(image_path: Path) -> str:
+  """
+  PIL format of an image, as decoded from its header, whatever its file extension.
+  Reads the file, call it from a threadpool in async code.
+
+  Args:
+      image_path (Path): The image path.
+
+  Returns:
+      str: The PIL format name, "JPEG" if PIL cannot tell.
+  """
+  try:
+    with Image.open(image_path) as image:
+      return image.format or "JPEG"
+  except (OSError, Image.DecompressionBombError):
+    return "JPEG"
+
+
+def resize_image(image_path: Path, width: int, height: int, format_save: str = None) -> tuple[BytesIO, str]:
   size_defined = width, height
 
   image = Image.open(image_path, mode="r")
   image.thumbnail(size_defined)
 
   image_io = io.BytesIO()
-  format_save = image.format if image.format else "JPEG"
+  if not format_save:
+    format_save = image.format if image.format else "JPEG"
+  if format_save == "JPEG" and image.mode not in ("RGB", "L"):
+    image = image.convert("RGB")
   image.save(image_io, format=format_save)
   image_io.seek(0)
 
-  return image_io, format_save
\ No newline at end of file
+  return image_io, format_save
+
+
+def resize_image_bytes(image_path: Path, width: int, height: int, format_save: str = None) -> tuple[bytes, str]:
+  """
+  Same as resize_image, but returns plain bytes so it can run in a process pool.
+  """
+  image_io, format_save = resize_image(image_path, width, height, format_save)
+  return image_io.getvalue(), format_save
+
+
+def generate_image_variants(image_path: Path, variants_dir: Path, widths: list[int], formats: list[str]) -> None:
+  """
+  Render an image into fixed width buckets, one file per bucket and format
+  (`{variants_dir}/{width}.{format}`). Buckets above the original size are capped
+  at the original, so only the first of them is written.
+
+  The variants are rendered into a temporary directory and renamed into place at
+  the end, so readers see either all of them or none.
+
+  Args:
+      image_path (Path): The original image.
+      variants_dir (Path): The directory that will hold the variants.
+      widths (list[int]): The width buckets, ascending.
+      formats (list[str]): The PIL output formats, e.g. ["WEBP", "JPEG"].
+  """
+  tmp_dir = variants_dir.with_name(f'{variants_dir.name}.{random_string(8)}.tmp')
+  tmp_dir.mkdir(parents=True)
+
+  try:
+    with Image.open(image_path, mode="r") as original:
+      original.load()
+      longest_edge = max(original.size)
+
+      for width in widths:
+        image = original.copy()
+        image.thumbnail((width, width))
+
+        for format_save in formats:
+          variant = image
+          if format_save == "JPEG" and variant.mode not in ("RGB", "L"):
+            variant = variant.convert("RGB")
+          variant.save(tmp_dir / f'{width}.{format_save.lower()}', format=format_save)
+
+        if width >= longest_edge:
+          break
+
+    os.rename(tmp_dir, variants_dir)
+  except BaseException:
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    raise
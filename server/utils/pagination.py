@@ -0,0 +1,86 @@
+import base64
+import binascii
+import json
+
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+from pymongo import ASCENDING
+
+# Listings are ordered by creation time, _id breaks ties between documents created in the same millisecond
+KEYSET_SORT = [("created_at", ASCENDING), ("_id", ASCENDING)]
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, _id: str) -> str:
+  """
+  Build the opaque cursor pointing right after a document.
+
+  Args:
+      created_at (datetime): The creation time of the last document of the page.
+      _id (str): The id of the last document of the page.
+
+  Returns:
+      str: The cursor.
+  """
+  raw = json.dumps({"c": created_at.isoformat(), "i": str(_id)}, separators=(",", ":"))
+  return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+  """
+  Parse a cursor built by encode_cursor.
+
+  Raises:
+      HTTPException: 400 if the cursor is malformed.
+  """
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    data = json.loads(raw)
+    return datetime.fromisoformat(data["c"]), ObjectId(data["i"])
+  except (binascii.Error, ValueError, TypeError, KeyError, InvalidId):
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_filter(cursor: Optional[str]) -> dict:
+  """
+  Mongo filter selecting the documents after `cursor` in KEYSET_SORT order.
+
+  Args:
+      cursor (Optional[str]): The cursor returned with the previous page.
+
+  Returns:
+      dict: The filter, empty for the first page.
+  """
+  if not cursor:
+    return {}
+
+  created_at, _id = decode_cursor(cursor)
+  return {
+    "$or": [
+      {"created_at": {"$gt": created_at}},
+      {"created_at": created_at, "_id": {"$gt": _id}},
+    ]
+  }
+
+
+def next_cursor(rows: list, limit: int) -> Optional[str]:
+  """
+  Cursor of the page following `rows`, or None when `rows` is the last page.
+
+  Args:
+      rows (list): The models of the current page, they need `created_at` and `id`, or
+          the raw documents, with `created_at` and `_id`.
+      limit (int): The page size that was requested.
+  """
+  if limit <= 0 or len(rows) < limit:
+    return None
+
+  last = rows[-1]
+  if isinstance(last, dict):
+    return encode_cursor(last["created_at"], last["_id"])
+  return encode_cursor(last.created_at, last.id)
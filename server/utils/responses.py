@@ -0,0 +1,40 @@
+from typing import Any
+
+import orjson
+
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+  if isinstance(obj, ObjectId):
+    return str(obj)
+  if isinstance(obj, BaseModel):
+    return obj.model_dump(by_alias=True)
+  raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+  """
+  Serialize content with orjson. datetime is written natively in ISO 8601 like
+  jsonable_encoder does, ObjectId as its hex string and models by alias.
+
+  Args:
+      content (Any): Raw Mongo documents, models, or plain JSON values.
+
+  Returns:
+      bytes: The JSON body.
+  """
+  return orjson.dumps(content, default=_default)
+
+
+class MongoJSONResponse(JSONResponse):
+  """
+  JSON response rendered with orjson, for content read straight from Mongo. Returned
+  directly from an endpoint it skips the response_model validation and jsonable_encoder,
+  so the content must already have the documented shape, see Repository.to_document.
+  """
+
+  def render(self, content: Any) -> bytes:
+    return dumps(content)
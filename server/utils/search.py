@@ -0,0 +1,76 @@
+import html
+import re
+
+from pymongo import ASCENDING
+
+from core.config import SEARCH_SNIPPET_LENGTH
+
+# Text search results are ranked by relevance, _id keeps pages stable between equal scores
+TEXT_SCORE = {"$meta": "textScore"}
+TEXT_SCORE_SORT = [("score", TEXT_SCORE), ("_id", ASCENDING)]
+
+_QUERY_TOKEN_PATTERN = re.compile(r'"([^"]+)"|(\S+)')
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+  return _SPACE_PATTERN.sub(" ", query).strip().lower()
+
+
+def get_query_terms(query: str) -> list[str]:
+  """
+  Words and quoted phrases of a $text search string, without the negated ones.
+
+  Args:
+      query (str): The search string.
+
+  Returns:
+      list[str]: The terms to highlight.
+  """
+  terms = []
+  for phrase, word in _QUERY_TOKEN_PATTERN.findall(query):
+    if phrase:
+      terms.append(phrase)
+    elif not word.startswith("-"):
+      terms.append(word.strip('"'))
+  return [term for term in terms if term]
+
+
+def highlight_snippet(text: str, terms: list[str], length: int = SEARCH_SNIPPET_LENGTH) -> str:
+  """
+  Plain text excerpt of `text` around the first matched term, HTML escaped, with the
+  matched terms wrapped in <mark>.
+
+  Args:
+      text (str): The document text, it may contain HTML.
+      terms (list[str]): The terms to highlight.
+      length (int): The length of the excerpt in characters.
+
+  Returns:
+      str: The snippet.
+  """
+  text = _SPACE_PATTERN.sub(" ", html.unescape(_TAG_PATTERN.sub(" ", text or ""))).strip()
+  if not terms:
+    return html.escape(text[:length])
+
+  pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+  match = pattern.search(text)
+  start = max(0, match.start() - length // 3) if match else 0
+  end = min(len(text), start + length)
+  excerpt = text[start:end]
+
+  parts = []
+  position = 0
+  for match in pattern.finditer(excerpt):
+    parts.append(html.escape(excerpt[position:match.start()]))
+    parts.append(f"<mark>{html.escape(match.group())}</mark>")
+    position = match.end()
+  parts.append(html.escape(excerpt[position:]))
+
+  snippet = "".join(parts)
+  if start > 0:
+    snippet = "…" + snippet
+  if end < len(text):
+    snippet += "…"
+  return snippet